@@ -6,6 +6,7 @@ import requests
 import json
 import backoff
 import os
+from tubular.utils.instrumentation import backoff_recorder, http_hooks
 
 logger = logging.getLogger(__name__)
 MAX_ATTEMPTS = int(os.environ.get("RETRY_MAX_ATTEMPTS", 5))
@@ -30,10 +31,10 @@ class AmplitudeApi:
     Amplitude API is used to handle communication with Amplitude Api's.
     """
 
-    def __init__(self, amplitude_api_key, amplitude_secret_key):
+    def __init__(self, amplitude_api_key, amplitude_secret_key, base_url=None):
         self.amplitude_api_key = amplitude_api_key
         self.amplitude_secret_key = amplitude_secret_key
-        self.base_url = "https://amplitude.com/"
+        self.base_url = base_url.rstrip("/") + "/" if base_url else "https://amplitude.com/"
         self.delete_user_path = "api/2/deletions/users"
 
     def auth(self):
@@ -50,6 +51,7 @@ class AmplitudeApi:
         backoff.expo,
         AmplitudeRecoverableException,
         max_tries = MAX_ATTEMPTS,
+        on_backoff = backoff_recorder('amplitude'),
     )
     def delete_user(self, user):
         """
@@ -74,7 +76,8 @@ class AmplitudeApi:
                 'ignore_invalid_id': 'true', # When true, the job ignores users that don't exist in the project.
                 "requester": "user-retirement-pipeline",
             },
-            auth = self.auth()
+            auth = self.auth(),
+            hooks = http_hooks('amplitude'),
         )
 
         if response.status_code == 200:
@@ -34,6 +34,7 @@ from tubular.exception import (
     JavaSocketException,
 )
 from tubular.utils import WAIT_SLEEP_TIME, DISABLE_OLD_ASG_WAIT_TIME
+from tubular.utils.instrumentation import backoff_recorder, http_hooks
 
 ASGARD_API_ENDPOINT = os.environ.get("ASGARD_API_ENDPOINTS", "http://dummy.url:8091/us-east-1")
 ASGARD_API_TOKEN = "asgardApiToken={}".format(os.environ.get("ASGARD_API_TOKEN", "dummy-token"))
@@ -91,7 +92,8 @@ def _parse_asgard_json_response(url, response):
 @backoff.on_exception(backoff.expo,
                       (RateLimitedException,
                        BackendDataError),
-                      max_tries=MAX_ATTEMPTS)
+                      max_tries=MAX_ATTEMPTS,
+                      on_backoff=backoff_recorder('asgard'))
 def clusters_for_asgs(asgs):
     """
     An autoscaling group can belong to multiple clusters potentially.
@@ -129,7 +131,8 @@ def clusters_for_asgs(asgs):
     request = requests.Request('GET', CLUSTER_LIST_URL, params=ASGARD_API_TOKEN)
     url = request.prepare().url
     LOG.debug("Getting Cluster List from: {}".format(url))
-    response = requests.get(CLUSTER_LIST_URL, params=ASGARD_API_TOKEN, timeout=REQUESTS_TIMEOUT)
+    response = requests.get(CLUSTER_LIST_URL, params=ASGARD_API_TOKEN, timeout=REQUESTS_TIMEOUT,
+                            hooks=http_hooks('asgard'))
     cluster_json = _parse_asgard_json_response(url, response)
 
     relevant_clusters = {}
@@ -152,7 +155,8 @@ def clusters_for_asgs(asgs):
 @backoff.on_exception(backoff.expo,
                       (RateLimitedException,
                        BackendDataError),
-                      max_tries=MAX_ATTEMPTS)
+                      max_tries=MAX_ATTEMPTS,
+                      on_backoff=backoff_recorder('asgard'))
 def asgs_for_cluster(cluster):
     """
     Given a named cluster, get all ASGs in the cluster.
@@ -169,7 +173,8 @@ def asgs_for_cluster(cluster):
 
     LOG.debug("URL: {}".format(CLUSTER_INFO_URL.format(cluster)))
     url = CLUSTER_INFO_URL.format(cluster)
-    response = requests.get(url, params=ASGARD_API_TOKEN, timeout=REQUESTS_TIMEOUT)
+    response = requests.get(url, params=ASGARD_API_TOKEN, timeout=REQUESTS_TIMEOUT,
+                            hooks=http_hooks('asgard'))
     LOG.debug("ASGs for Cluster: {}".format(response.text))
     asgs_json = _parse_asgard_json_response(url, response)
 
@@ -183,7 +188,8 @@ def asgs_for_cluster(cluster):
 
 @backoff.on_exception(backoff.expo,
                       (RateLimitedException, BackendError),
-                      max_tries=MAX_ATTEMPTS)
+                      max_tries=MAX_ATTEMPTS,
+                      on_backoff=backoff_recorder('asgard'))
 def wait_for_task_completion(task_url, timeout):
     """
     Arguments:
@@ -205,7 +211,8 @@ def wait_for_task_completion(task_url, timeout):
     LOG.debug("Task URL: {}".format(task_url))
     end_time = datetime.utcnow() + timedelta(seconds=timeout)
     while end_time > datetime.utcnow():
-        response = requests.get(task_url, params=ASGARD_API_TOKEN, timeout=REQUESTS_TIMEOUT)
+        response = requests.get(task_url, params=ASGARD_API_TOKEN, timeout=REQUESTS_TIMEOUT,
+                                hooks=http_hooks('asgard'))
         json_response = _parse_asgard_json_response(task_url, response)
         if json_response['status'] in ('completed', 'failed'):
             return json_response
@@ -217,7 +224,8 @@ def wait_for_task_completion(task_url, timeout):
 
 @backoff.on_exception(backoff.expo,
                       (JavaSocketException, ASGCountZeroException),
-                      max_tries=MAX_ATTEMPTS)
+                      max_tries=MAX_ATTEMPTS,
+                      on_backoff=backoff_recorder('asgard'))
 def new_asg(cluster, ami_id):
     """
     Create a new ASG in the given asgard cluster using the given AMI.
@@ -246,9 +254,10 @@ def new_asg(cluster, ami_id):
 
     response = requests.post(
         NEW_ASG_URL,
-        data=payload, params=ASGARD_API_TOKEN, timeout=REQUESTS_TIMEOUT
+        data=payload, params=ASGARD_API_TOKEN, timeout=REQUESTS_TIMEOUT, hooks=http_hooks('asgard')
     )
     LOG.debug("Sent request to create new ASG in Cluster({}).".format(cluster))
+    ec2.invalidate_asg_inventory()
 
     if response.status_code == 404:
         msg = "Can't create more ASGs for cluster {}. Please either wait " \
@@ -323,7 +332,8 @@ def _asg_is_empty(asg):
                        TimeoutException,
                        BackendError,
                        ASGCountZeroException),
-                      max_tries=MAX_ATTEMPTS)
+                      max_tries=MAX_ATTEMPTS,
+                      on_backoff=backoff_recorder('asgard'))
 def _get_asgard_resource_info(url):
     """
     A generic function for querying Asgard for inforamtion about a specific resource,
@@ -338,7 +348,8 @@ def _get_asgard_resource_info(url):
     """
 
     LOG.debug("URL: {}".format(url))
-    response = requests.get(url, params=ASGARD_API_TOKEN, timeout=REQUESTS_TIMEOUT)
+    response = requests.get(url, params=ASGARD_API_TOKEN, timeout=REQUESTS_TIMEOUT,
+                            hooks=http_hooks('asgard'))
 
     if response.status_code == 404:
         raise ResourceDoesNotExistException('Resource for url {} does not exist'.format(url))
@@ -471,7 +482,8 @@ def is_last_asg(asg):
                       (RateLimitedException,
                        TimeoutException,
                        BackendError),
-                      max_tries=MAX_ATTEMPTS)
+                      max_tries=MAX_ATTEMPTS,
+                      on_backoff=backoff_recorder('asgard'))
 def enable_asg(asg):
     """
     Enable an ASG in asgard.  This means it will have ELBs routing to it
@@ -491,7 +503,7 @@ def enable_asg(asg):
     payload = {"name": asg}
     response = requests.post(
         ASG_ACTIVATE_URL,
-        data=payload, params=ASGARD_API_TOKEN, timeout=REQUESTS_TIMEOUT
+        data=payload, params=ASGARD_API_TOKEN, timeout=REQUESTS_TIMEOUT, hooks=http_hooks('asgard')
     )
     task_url = response.url
     task_status = wait_for_task_completion(task_url, 301)
@@ -504,7 +516,8 @@ def enable_asg(asg):
                       (RateLimitedException,
                        TimeoutException,
                        BackendError),
-                      max_tries=MAX_ATTEMPTS)
+                      max_tries=MAX_ATTEMPTS,
+                      on_backoff=backoff_recorder('asgard'))
 def disable_asg(asg):
     """
     Disable an ASG using asgard.
@@ -538,7 +551,7 @@ def disable_asg(asg):
     payload = {"name": asg}
     response = requests.post(
         ASG_DEACTIVATE_URL,
-        data=payload, params=ASGARD_API_TOKEN, timeout=REQUESTS_TIMEOUT
+        data=payload, params=ASGARD_API_TOKEN, timeout=REQUESTS_TIMEOUT, hooks=http_hooks('asgard')
     )
     task_url = response.url
     task_status = wait_for_task_completion(task_url, 300)
@@ -551,7 +564,8 @@ def disable_asg(asg):
                       (RateLimitedException,
                        TimeoutException,
                        BackendError),
-                      max_tries=MAX_ATTEMPTS)
+                      max_tries=MAX_ATTEMPTS,
+                      on_backoff=backoff_recorder('asgard'))
 def delete_asg(asg, fail_if_active=True, fail_if_last=True, wait_for_deletion=True):
     """
     Delete an ASG using asgard.
@@ -600,7 +614,9 @@ def delete_asg(asg, fail_if_active=True, fail_if_last=True, wait_for_deletion=Tr
 
     payload = {"name": asg}
     response = requests.post(ASG_DELETE_URL,
-                             data=payload, params=ASGARD_API_TOKEN, timeout=REQUESTS_TIMEOUT)
+                             data=payload, params=ASGARD_API_TOKEN, timeout=REQUESTS_TIMEOUT,
+                             hooks=http_hooks('asgard'))
+    ec2.invalidate_asg_inventory()
     task_url = response.url
     if wait_for_deletion:
         task_status = wait_for_task_completion(task_url, 300)
@@ -612,7 +628,8 @@ def delete_asg(asg, fail_if_active=True, fail_if_last=True, wait_for_deletion=Tr
 @backoff.on_exception(backoff.expo,
                       (RateLimitedException,
                        BackendDataError),
-                      max_tries=MAX_ATTEMPTS)
+                      max_tries=MAX_ATTEMPTS,
+                      on_backoff=backoff_recorder('asgard'))
 def elbs_for_asg(asg):
     """
     Return the ELB(s) which are directing traffic to a particular ASG.
@@ -628,7 +645,8 @@ def elbs_for_asg(asg):
         RateLimitedException: When we are being rate limited by AWS.
     """
     url = ASG_INFO_URL.format(asg)
-    response = requests.get(url, params=ASGARD_API_TOKEN, timeout=REQUESTS_TIMEOUT)
+    response = requests.get(url, params=ASGARD_API_TOKEN, timeout=REQUESTS_TIMEOUT,
+                            hooks=http_hooks('asgard'))
     resp_json = _parse_asgard_json_response(url, response)
     try:
         elbs = resp_json['group']['loadBalancerNames']
@@ -639,6 +657,7 @@ def elbs_for_asg(asg):
     return elbs
 
 
+@ec2.cached_asg_inventory()
 def rollback(current_clustered_asgs, rollback_to_clustered_asgs, ami_id=None):
     """
     Rollback to a particular list of ASGs for one or more clusters.
@@ -723,6 +742,7 @@ def rollback(current_clustered_asgs, rollback_to_clustered_asgs, ami_id=None):
         }
 
 
+@ec2.cached_asg_inventory()
 def deploy(ami_id):
     """
     Deploys an AMI as an auto-scaling group (ASG) to AWS.
@@ -7,6 +7,8 @@ import os
 import backoff
 import requests
 
+from tubular.utils.instrumentation import backoff_recorder, http_hooks
+
 LOG = logging.getLogger(__name__)
 MAX_ATTEMPTS = int(os.environ.get('RETRY_BRAZE_MAX_ATTEMPTS', 5))
 
@@ -24,11 +26,12 @@ class BrazeApi:
     Braze API client used to make calls to Braze
     """
 
-    def __init__(self, braze_api_key, braze_instance):
+    def __init__(self, braze_api_key, braze_instance, base_url=None):
         self.api_key = braze_api_key
 
         # https://www.braze.com/docs/api/basics/#endpoints
-        self.base_url = 'https://rest.{instance}.braze.com'.format(instance=braze_instance)
+        # base_url overrides the instance's URL, e.g. to use the retirement simulator.
+        self.base_url = (base_url or 'https://rest.{instance}.braze.com'.format(instance=braze_instance)).rstrip('/')
 
     def auth_headers(self):
         """Returns authorization headers suitable for passing to the requests library"""
@@ -68,6 +71,7 @@ class BrazeApi:
         backoff.expo,
         BrazeRecoverableException,
         max_tries=MAX_ATTEMPTS,
+        on_backoff=backoff_recorder('braze'),
     )
     def delete_user(self, learner):
         """
@@ -81,5 +85,6 @@ class BrazeApi:
             json={
                 'external_ids': [learner['user']['id']],  # Braze external ids are LMS user ids
             },
+            hooks=http_hooks('braze'),
         )
         self.process_response(response, 'user deletion')
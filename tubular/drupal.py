@@ -8,6 +8,7 @@ import json
 import requests
 from tubular.utils.retry import retry
 from tubular.exception import BackendError
+from tubular.utils.instrumentation import http_hooks
 
 ACQUIA_ENDPOINT = "https://cloud.acquia.com/api"
 DATABASE = "edx"
@@ -96,7 +97,8 @@ def get_api_token(client_id, client_secret):
                                           data=data,
                                           verify=False,
                                           allow_redirects=False,
-                                          auth=(client_id, client_secret))
+                                          auth=(client_id, client_secret),
+                                          hooks=http_hooks('drupal'))
 
     tokens = json.loads(access_token_response.text)
     return tokens['access_token']
@@ -136,7 +138,7 @@ def get_acquia_v2(url, access_token):
         The Response object.
     """
     api_call_headers = {'Authorization': 'Bearer ' + access_token}
-    api_call_response = requests.get(url, headers=api_call_headers, verify=False)
+    api_call_response = requests.get(url, headers=api_call_headers, verify=False, hooks=http_hooks('drupal'))
 
     return api_call_response
 
@@ -155,7 +157,9 @@ def post_acquia_v2(url, access_token, body=None):
     """
 
     api_call_headers = {'Authorization': 'Bearer ' + access_token}
-    api_call_response = requests.post(url, headers=api_call_headers, json=body, verify=False)
+    api_call_response = requests.post(
+        url, headers=api_call_headers, json=body, verify=False, hooks=http_hooks('drupal')
+    )
     return api_call_response
 
 
@@ -6,6 +6,8 @@ when we deploy using asgard.
 import logging
 import os
 import time
+from collections import defaultdict
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 
 import backoff
@@ -23,6 +25,10 @@ ISO_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
 ASG_DELETE_TAG_KEY = 'delete_on_ts'
 MAX_ATTEMPTS = int(os.environ.get('RETRY_MAX_ATTEMPTS', 5))
 RETRY_FACTOR = os.environ.get('RETRY_FACTOR', 1.5)
+EDP_TAG_KEYS = ('environment', 'deployment', 'play')
+
+# The ASG inventory shared by the calls within cached_asg_inventory() blocks.
+_ASG_INVENTORY_CACHE = {'depth': 0, 'inventory': None}
 
 
 def giveup_if_not_throttling(ex):
@@ -71,6 +77,105 @@ def get_all_autoscale_groups(names=None):
     return total_asgs
 
 
+class AutoScalingGroupInventory:
+    """
+    All the autoscale groups in the account, indexed by EDP and by deletion time.
+
+    Arguments:
+        groups (list): The :class:`boto3 AutoScalingGroup` instances, as returned by get_all_autoscale_groups.
+    """
+
+    def __init__(self, groups):
+        self.groups = groups
+        # EDP -> [(ASG name, deletion tag value or None)]
+        self.names_by_edp = defaultdict(list)
+        # [(deletion datetime, ASG)], for the ASGs with a well-formed deletion tag.
+        self.deletion_times = []
+
+        for group in groups:
+            name = group['AutoScalingGroupName']
+            tags = {tag['Key']: tag['Value'] for tag in group['Tags']}
+            LOG.debug("Tags for asg {}: {}".format(name, tags))
+
+            if all(tag in tags for tag in EDP_TAG_KEYS):
+                edp = EDP(*(tags[tag] for tag in EDP_TAG_KEYS))
+                self.names_by_edp[edp].append((name, tags.get(ASG_DELETE_TAG_KEY)))
+
+            if ASG_DELETE_TAG_KEY in tags:
+                LOG.debug("Found {0} tag on asg {1}, deletion time: {2}".format(
+                    ASG_DELETE_TAG_KEY, name, tags[ASG_DELETE_TAG_KEY]
+                ))
+                try:
+                    self.deletion_times.append((datetime.strptime(tags[ASG_DELETE_TAG_KEY], ISO_DATE_FORMAT), group))
+                except ValueError:
+                    LOG.warning(
+                        "ASG {0} has an improperly formatted datetime string for the key {1}. Value: {2} . "
+                        "Format must match {3}".format(
+                            name, ASG_DELETE_TAG_KEY, tags[ASG_DELETE_TAG_KEY], ISO_DATE_FORMAT
+                        )
+                    )
+                except Exception as err:  # pylint: disable=broad-except
+                    LOG.warning("Error occured while building a list of ASGs to delete, continuing: {0}".format(err))
+
+    def asgs_for_edp(self, edp, filter_asgs_pending_delete=True):
+        """
+        The names of the ASGs tagged with the given EDP, optionally leaving out those tagged for deletion.
+        """
+        matching_groups = []
+        for name, delete_on in self.names_by_edp.get(edp, []):
+            if filter_asgs_pending_delete and delete_on is not None:
+                LOG.info("filtering ASG: {0} because it is tagged for deletion on: {1}".format(name, delete_on))
+                continue
+            matching_groups.append(name)
+        return matching_groups
+
+    def asgs_pending_delete(self, current_datetime):
+        """
+        The ASGs whose deletion time is before ``current_datetime``.
+        """
+        return [group for delete_on, group in self.deletion_times if delete_on < current_datetime]
+
+
+@contextmanager
+def cached_asg_inventory():
+    """
+    Reuse one listing of all the autoscale groups for the asgs_for_edp and get_asgs_pending_delete calls
+    made within the block, instead of listing them on every call.
+
+    The listing is dropped whenever an ASG is created, tagged or deleted, and when the outermost block exits.
+    """
+    _ASG_INVENTORY_CACHE['depth'] += 1
+    try:
+        yield
+    finally:
+        _ASG_INVENTORY_CACHE['depth'] -= 1
+        if not _ASG_INVENTORY_CACHE['depth']:
+            _ASG_INVENTORY_CACHE['inventory'] = None
+
+
+def invalidate_asg_inventory():
+    """
+    Drop the cached ASG inventory, after an ASG has been created, tagged or deleted.
+    """
+    _ASG_INVENTORY_CACHE['inventory'] = None
+
+
+def get_asg_inventory():
+    """
+    Get the inventory of all the autoscale groups, listing them unless a cached inventory can be reused.
+
+    Returns:
+        AutoScalingGroupInventory
+    """
+    inventory = _ASG_INVENTORY_CACHE['inventory']
+    if inventory is None:
+        inventory = AutoScalingGroupInventory(get_all_autoscale_groups())
+        LOG.info("Found {} ASGs".format(len(inventory.groups)))
+        if _ASG_INVENTORY_CACHE['depth']:
+            _ASG_INVENTORY_CACHE['inventory'] = inventory
+    return inventory
+
+
 @backoff.on_exception(backoff.expo,
                       ClientError,
                       max_tries=MAX_ATTEMPTS,
@@ -308,29 +413,7 @@ def asgs_for_edp(edp, filter_asgs_pending_delete=True):
      ]
 
     """
-    all_groups = get_all_autoscale_groups()
-    matching_groups = []
-    LOG.info("Found {} ASGs".format(len(all_groups)))
-
-    for group in all_groups:
-        LOG.debug("Checking group {}".format(group))
-        tags = {tag['Key']: tag['Value'] for tag in group['Tags']}
-        LOG.debug("Tags for asg {}: {}".format(group['AutoScalingGroupName'], tags))
-        if filter_asgs_pending_delete and ASG_DELETE_TAG_KEY in tags.keys():
-            LOG.info("filtering ASG: {0} because it is tagged for deletion on: {1}"
-                     .format(group['AutoScalingGroupName'], tags[ASG_DELETE_TAG_KEY]))
-            continue
-
-        edp_keys = ['environment', 'deployment', 'play']
-        if all([tag in tags for tag in edp_keys]):
-            group_env = tags['environment']
-            group_deployment = tags['deployment']
-            group_play = tags['play']
-
-            group_edp = EDP(group_env, group_deployment, group_play)
-
-            if group_edp == edp:
-                matching_groups.append(group['AutoScalingGroupName'])
+    matching_groups = get_asg_inventory().asgs_for_edp(edp, filter_asgs_pending_delete)
 
     LOG.info(
         "Returning %s ASGs for EDP %s-%s-%s.",
@@ -382,6 +465,7 @@ def tag_asg_for_deletion(asg_name, seconds_until_delete_delta=600):
         LOG.info("ASG {} no longer exists, will not tag".format(asg_name))
     else:
         autoscale.create_or_update_tags(Tags=[tag])
+        invalidate_asg_inventory()
 
 
 @backoff.on_exception(backoff.expo,
@@ -408,6 +492,7 @@ def remove_asg_deletion_tag(asg_name):
                 if tag['Key'] == ASG_DELETE_TAG_KEY:
                     autoscale_client = boto3.client('autoscaling')
                     autoscale_client.delete_tags(Tags=[tag])
+                    invalidate_asg_inventory()
 
 
 def get_asgs_pending_delete():
@@ -421,33 +506,7 @@ def get_asgs_pending_delete():
     Returns:
         List(<boto3 AutoScalingGroup>)
     """
-    current_datetime = datetime.utcnow()
-
-    asgs_pending_delete = []
-    asgs = get_all_autoscale_groups()
-    LOG.debug("Found {0} autoscale groups".format(len(asgs)))
-    for asg in asgs:
-        LOG.debug("Checking for {0} on asg: {1}".format(ASG_DELETE_TAG_KEY, asg['AutoScalingGroupName']))
-        for tag in asg['Tags']:
-            try:
-                if tag['Key'] == ASG_DELETE_TAG_KEY:
-                    LOG.debug("Found {0} tag, deletion time: {1}".format(ASG_DELETE_TAG_KEY, tag['Value']))
-                    if datetime.strptime(tag['Value'], ISO_DATE_FORMAT) - current_datetime < timedelta(0, 0, 0):
-                        LOG.debug("Adding ASG: {0} to the list of ASGs to delete.".format(asg['AutoScalingGroupName']))
-                        asgs_pending_delete.append(asg)
-                        break
-            except ValueError:
-                LOG.warning(
-                    "ASG {0} has an improperly formatted datetime string for the key {1}. Value: {2} . "
-                    "Format must match {3}".format(
-                        asg['AutoScalingGroupName'], tag['Key'], tag['Value'], ISO_DATE_FORMAT
-                    )
-                )
-                continue
-            except Exception as err:  # pylint: disable=broad-except
-                LOG.warning("Error occured while building a list of ASGs to delete, continuing: {0}".format(err))
-                continue
-
+    asgs_pending_delete = get_asg_inventory().asgs_pending_delete(datetime.utcnow())
     LOG.info("Number of ASGs pending delete: {0}".format(len(asgs_pending_delete)))
     return asgs_pending_delete
 
@@ -14,6 +14,7 @@ from edx_rest_api_client.client import (
 from requests.exceptions import ConnectionError, HTTPError, Timeout
 
 from tubular.exception import HttpDoesNotExistException
+from tubular.utils.instrumentation import http_hooks, record_retry
 
 LOG = logging.getLogger(__name__)
 
@@ -59,7 +60,9 @@ class BaseApiClient:
             kwargs['headers'] = {'Content-type': 'application/json'}
 
         try:
-            response = requests.request(method, url, auth=SuppliedJwtAuth(self._access_token), **kwargs)
+            response = requests.request(
+                method, url, auth=SuppliedJwtAuth(self._access_token), hooks=http_hooks('edx_api'), **kwargs
+            )
             response.raise_for_status()
 
             if response.status_code != 204:
@@ -109,7 +112,8 @@ class BaseApiClient:
                 headers={
                     'User-Agent': 'tubular',
                 },
-                timeout=(REQUEST_CONNECT_TIMEOUT, REQUEST_READ_TIMEOUT)
+                timeout=(REQUEST_CONNECT_TIMEOUT, REQUEST_READ_TIMEOUT),
+                hooks=http_hooks('edx_api'),
             )
             response.raise_for_status()
             return response.json()['access_token']
@@ -129,6 +133,7 @@ def _backoff_handler(details):
     Simple logging handler for when timeout backoff occurs.
     """
     LOG.info('Trying again in {wait:0.1f} seconds after {tries} tries calling {target}'.format(**details))
+    record_retry('edx_api', details['target'].__name__, details['wait'])
 
 
 def _wait_one_minute():
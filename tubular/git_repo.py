@@ -2,8 +2,11 @@
 Direct git commands on a GitHub repo.
 """
 
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
+import fcntl
+import hashlib
 import logging
+import os
 import re
 
 from six.moves import urllib
@@ -14,6 +17,9 @@ from git.exc import GitCommandError
 LOG = logging.getLogger(__name__)
 LOG.setLevel(logging.INFO)
 
+# Output of `git merge` when the merge stopped because of conflicts, for two-way and octopus merges.
+MERGE_CONFLICT_OUTPUT = ('CONFLICT (', 'Automatic merge failed', 'Automated merge did not work')
+
 
 class InvalidGitRepoURL(Exception):
     """
@@ -27,6 +33,16 @@ class FastForwardMergeImpossible(Exception):
     """
 
 
+class MergeConflict(Exception):
+    """
+    Raised when a commitish can't be merged without conflicts.
+    """
+
+    def __init__(self, commitish):
+        super().__init__('Merging {} conflicts with the base branch or the commits merged before it'.format(commitish))
+        self.commitish = commitish
+
+
 def extract_repo_name(repo_url):
     """
     Extract the name of a git repository from its clone url.
@@ -41,6 +57,49 @@ def extract_repo_name(repo_url):
     return match.group('name')
 
 
+@contextmanager
+def mirror_lock(mirror_path, exclusive=True):
+    """
+    Hold a lock on a mirror created by update_mirror: exclusive while updating it, shared while cloning from it.
+    """
+    with open(mirror_path + '.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+
+
+def update_mirror(repo_url, mirror_cache_dir):
+    """
+    Create a bare mirror of a remote repo in a cache directory, or fetch it incrementally if it already exists,
+    so that clones can use it as a reference repo and only fetch the objects pushed since.
+
+    A lock file keeps concurrent jobs on the same machine from updating the same mirror at once, or while it is
+    being cloned from.
+
+    Arguments:
+        repo_url (str): The full url of the repo to mirror.
+        mirror_cache_dir (str): The directory holding the mirrors, one per repo url.
+
+    Returns:
+        The path of the mirror.
+    """
+    os.makedirs(mirror_cache_dir, exist_ok=True)
+    url_hash = hashlib.sha1(repo_url.encode('utf-8')).hexdigest()[:12]
+    mirror_path = os.path.join(mirror_cache_dir, '{}-{}.git'.format(extract_repo_name(repo_url), url_hash))
+
+    with mirror_lock(mirror_path):
+        if os.path.isdir(mirror_path):
+            LOG.info('Fetching mirror of %s in %s', repo_url, mirror_path)
+            try:
+                Repo(mirror_path).git.fetch('origin', prune=True)
+                return mirror_path
+            except GitCommandError:
+                LOG.warning('Unable to fetch mirror %s, recreating it', mirror_path, exc_info=True)
+                rmtree(mirror_path)
+        LOG.info('Creating mirror of %s in %s', repo_url, mirror_path)
+        Repo.clone_from(repo_url, to_path=mirror_path, mirror=True)
+    return mirror_path
+
+
 class LocalGitAPI:
     """
     A set of helper functions for managing operations on local repos.
@@ -48,9 +107,11 @@ class LocalGitAPI:
 
     def __init__(self, repo):
         self.repo = repo
+        # The results of the merges tried by merge_bisecting_conflicts, by base SHA and merged commitishes.
+        self._merge_results = {}
 
     @classmethod
-    def clone(cls, repo_url, branch=None, reference_repo=None):
+    def clone(cls, repo_url, branch=None, reference_repo=None, mirror_cache_dir=None, filter_spec=None, depth=None):
         """
         Initialize a LocalGitAPI by cloning a remote repo.
 
@@ -59,18 +120,42 @@ class LocalGitAPI:
                 url will be used as the repository directory name.
             branch (str): The branch to clone from
             reference_repo (str): A path to a reference repo (to speed up clones)
+            mirror_cache_dir (str): A directory in which to keep a mirror of the repo between clones, which is
+                fetched incrementally and used as the reference repo, unless one is given
+            filter_spec (str): A partial clone filter, e.g. 'blob:none' to only fetch file contents when needed
+            depth (int): The number of commits of history to clone, for a shallow clone. All the branches are
+                still cloned, but merges and pushes need the history back to the merge base, so this is only
+                for callers which read the tree.
         """
         kwargs = {}
 
+        if mirror_cache_dir and not reference_repo:
+            reference_repo = update_mirror(repo_url, mirror_cache_dir)
+            # The mirror is shared with other jobs, whose fetches and gcs could drop objects the clone borrows from
+            # it, so the borrowed objects are copied into the clone.
+            kwargs['dissociate'] = True
+            clone_lock = mirror_lock(reference_repo, exclusive=False)
+        else:
+            clone_lock = nullcontext()
+
         if reference_repo:
             kwargs['reference'] = reference_repo
 
-        repo = Repo.clone_from(
-            repo_url,
-            to_path=extract_repo_name(repo_url),
-            branch=branch,
-            **kwargs
-        )
+        if filter_spec:
+            kwargs['filter'] = filter_spec
+
+        if depth:
+            kwargs['depth'] = depth
+            kwargs['no_single_branch'] = True
+
+        # Keep the mirror from being updated while it is cloned from.
+        with clone_lock:
+            repo = Repo.clone_from(
+                repo_url,
+                to_path=extract_repo_name(repo_url),
+                branch=branch,
+                **kwargs
+            )
         return cls(repo)
 
     def _is_pushed(self, push_info) -> bool:
@@ -149,6 +234,80 @@ class LocalGitAPI:
             self.repo.git.merge(*commitishes)
         return self.get_head_sha()
 
+    def _try_merge(self, base_sha, commitishes):
+        """
+        Merge ``commitishes`` into ``base_sha`` on the checked out branch, caching the result.
+
+        Returns:
+            The SHA of the merge, or None if the merge conflicted, in which case the branch is reset to ``base_sha``.
+
+        Raises:
+            GitCommandError: If the merge failed for any other reason, e.g. a commitish which doesn't exist.
+        """
+        key = (base_sha, tuple(commitishes))
+        if key not in self._merge_results:
+            self.repo.head.reset(base_sha, index=True, working_tree=True)
+            try:
+                if commitishes:
+                    self.repo.git.merge(*commitishes)
+                self._merge_results[key] = self.get_head_sha()
+            except GitCommandError as exc:
+                self.repo.head.reset(base_sha, index=True, working_tree=True)
+                output = '{}\n{}'.format(exc.stdout, exc.stderr)
+                if not any(marker in output for marker in MERGE_CONFLICT_OUTPUT):
+                    raise
+                self._merge_results[key] = None
+        return self._merge_results[key]
+
+    def merge_bisecting_conflicts(self, base_branch, commitishes, exclude_conflicts=False):
+        """
+        Merge all ``commitishes`` into ``base_branch`` in this repo, in one octopus merge like ``octopus_merge``.
+        ``base_branch`` will be checked out.
+
+        If the merge fails, the commitishes are bisected to find the first one which can't be merged on top of
+        the base branch and the commitishes before it. That one is either reported by raising MergeConflict, or
+        left out so that the merge of the others can go on, as many times as needed. The merges tried are
+        cached, so that no merge is repeated.
+
+        Arguments:
+            base_branch (str): The branch to merge into.
+            commitishes (list): The commitishes to merge, in order.
+            exclude_conflicts (bool): Leave out conflicting commitishes instead of raising MergeConflict.
+
+        Returns:
+            tuple(str, list): the SHA of the merge, and the commitishes left out because of conflicts
+
+        Raises:
+            MergeConflict: If a commitish conflicts and ``exclude_conflicts`` is False.
+        """
+        self.checkout_branch(base_branch)
+        base_sha = self.get_head_sha()
+        included = list(commitishes)
+        excluded = []
+        # The number of leading commitishes known to merge cleanly.
+        known_good = 0
+
+        while self._try_merge(base_sha, included) is None:
+            # Find the shortest failing prefix of the commitishes; its last commitish is a conflicting one.
+            low, high = known_good, len(included)
+            while high - low > 1:
+                middle = (low + high) // 2
+                if self._try_merge(base_sha, included[:middle]) is None:
+                    high = middle
+                else:
+                    low = middle
+            conflicting = included[high - 1]
+            if not exclude_conflicts:
+                self.repo.head.reset(base_sha, index=True, working_tree=True)
+                raise MergeConflict(conflicting)
+            LOG.warning('Leaving %s out of the merge into %s because it conflicts', conflicting, base_branch)
+            excluded.append(conflicting)
+            del included[high - 1]
+            known_good = high - 1
+
+        self.repo.head.reset(self._try_merge(base_sha, included), index=True, working_tree=True)
+        return self.get_head_sha(), excluded
+
     def push_tags(self, remote='origin', force=False):
         """
         Push all local tags up to the remote repo.
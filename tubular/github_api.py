@@ -1,14 +1,26 @@
 """ Provides Access to the GitHub API """
 
 from base64 import b64decode
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, time
+from functools import partial
 from urllib.request import urlretrieve
 import enum
+import hashlib
+import itertools
+import json
 import logging
 import os
 import re
 import socket
+import sqlite3
+import statistics
+import threading
+import tempfile
+from time import monotonic, sleep
 import backoff
+import requests
+from requests.structures import CaseInsensitiveDict
 
 from github import Github, GithubException
 from github.PullRequest import PullRequest
@@ -16,6 +28,7 @@ from github.Commit import Commit
 from github.GitCommit import GitCommit
 from github.GithubException import UnknownObjectException, GithubException, RateLimitExceededException
 from github.InputGitAuthor import InputGitAuthor
+from github.Requester import HTTPSRequestsConnectionClass, RequestsResponse
 from pytz import timezone
 import six
 from validators import url as url_validator
@@ -41,6 +54,41 @@ MAX_PR_TEST_TRIES_DEFAULT = 5
 PR_TEST_INITIAL_WAIT_INTERVAL_DEFAULT = 10
 PR_TEST_POLL_INTERVAL_DEFAULT = 10
 
+# Bounds of the adaptive wait between conditional requests when watching a commit's tests.
+WATCH_MIN_INTERVAL_DEFAULT = 5
+WATCH_MAX_INTERVAL_DEFAULT = 120
+
+# Number of requests to leave in the rate limit when pacing concurrent calls with a RateLimitBudget.
+RATE_LIMIT_RESERVE_DEFAULT = 100
+
+# Number of the most recent comments on a PR to scan for a duplicate of a message by our own user.
+RECENT_COMMENTS_TO_CHECK = 100
+
+# Number of days after which unused responses are removed from the HTTP cache.
+HTTP_CACHE_MAX_AGE_DAYS_DEFAULT = 7
+
+# Number of pull requests to fetch at a time when looking up search results.
+PR_FETCH_WORKERS_DEFAULT = 8
+
+# Number of commits or PRs to fetch the validations of in each GraphQL query.
+GRAPHQL_BATCH_SIZE = 20
+
+# The statuses, check suites and check runs of a commit, in the shape of the REST API results they replace.
+GRAPHQL_COMMIT_VALIDATIONS = '''
+fragment CommitValidations on Commit {
+  oid
+  status { contexts { context state targetUrl } }
+  checkSuites(first: 50) {
+    nodes {
+      app { name }
+      conclusion
+      url
+      checkRuns(first: 100) { nodes { name conclusion url } }
+    }
+  }
+}
+'''
+
 
 @enum.unique
 class MessageType(enum.Enum):
@@ -121,6 +169,224 @@ def _constant_with_initial_wait(initial_wait=0, interval=1):
         yield interval
 
 
+class PullRequestShaCache:
+    """
+    On-disk SQLite cache of the pull requests which each commit SHA was merged by, kept between runs.
+
+    A commit which was looked up and found to have no pull request is recorded too, so that it is not looked up again.
+    """
+
+    def __init__(self, path):
+        """
+        Arguments:
+            path (str): Path of the SQLite database file, which is created if it does not exist.
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS commits (repo TEXT NOT NULL, sha TEXT NOT NULL, PRIMARY KEY (repo, sha))'
+            )
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS commit_pulls ('
+                'repo TEXT NOT NULL, sha TEXT NOT NULL, pr_number INTEGER NOT NULL, PRIMARY KEY (repo, sha, pr_number))'
+            )
+
+    def get(self, repo, shas):
+        """
+        Look up the pull request numbers of commits.
+
+        Arguments:
+            repo (str): The org/repo name of the commits' repository.
+            shas (list): Full SHAs of the commits.
+
+        Returns:
+            dict: Sorted list of pull request numbers by SHA, for the SHAs which are cached.
+        """
+        cached = {}
+        for sha_batch in batch(shas, batch_size=500):
+            placeholders = ', '.join('?' * len(sha_batch))
+            rows = self.connection.execute(
+                'SELECT commits.sha, commit_pulls.pr_number FROM commits LEFT JOIN commit_pulls '
+                'ON commit_pulls.repo = commits.repo AND commit_pulls.sha = commits.sha '
+                'WHERE commits.repo = ? AND commits.sha IN ({}) '
+                'ORDER BY commit_pulls.pr_number'.format(placeholders),
+                [repo] + sha_batch
+            )
+            for sha, pr_number in rows:
+                cached.setdefault(sha, [])
+                if pr_number is not None:
+                    cached[sha].append(pr_number)
+        return cached
+
+    def set(self, repo, sha, pr_numbers):
+        """
+        Record the pull request numbers of a commit, which may be none.
+        """
+        with self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO commits (repo, sha) VALUES (?, ?)', (repo, sha))
+            self.connection.execute('DELETE FROM commit_pulls WHERE repo = ? AND sha = ?', (repo, sha))
+            self.connection.executemany(
+                'INSERT INTO commit_pulls (repo, sha, pr_number) VALUES (?, ?, ?)',
+                [(repo, sha, pr_number) for pr_number in sorted(set(pr_numbers))]
+            )
+
+    def close(self):
+        """
+        Close the database connection.
+        """
+        self.connection.close()
+
+
+class CachingHTTPSConnection(HTTPSRequestsConnectionClass):
+    """
+    PyGithub HTTPS connection which keeps the responses to GET requests on disk, and revalidates them with
+    If-None-Match/If-Modified-Since requests. GitHub answers those with a 304 Not Modified, which does not count
+    against the rate limit, when the resource is unchanged, and the cached response is served instead.
+
+    The cache directory can be shared by any number of processes. Responses are cached by URL, Accept header and
+    Authorization header, so tokens never see each other's responses.
+    """
+
+    def __init__(self, *args, cache_dir=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_dir = cache_dir
+        # The cache file and cached entry of the current request, if it can be answered from the cache.
+        self._cache_file_path = None
+        self._cached_entry = None
+
+    def _cache_path(self, url, headers):
+        """
+        Returns the path of the cache file for a request.
+        """
+        key = '\n'.join((self.host, url, headers.get('Accept', ''), headers.get('Authorization', '')))
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json')
+
+    def _store(self, path, response):
+        """
+        Write a response to the cache, atomically so that concurrent readers never see a partial file.
+        """
+        entry = {'headers': dict(response.headers), 'body': response.response.text}
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'w') as temp_file:
+                json.dump(entry, temp_file)
+            os.replace(temp_path, path)
+        except OSError:
+            LOG.warning('Unable to write to the Github HTTP cache {}'.format(self.cache_dir), exc_info=True)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def request(self, verb, url, input, headers, stream=False):  # pylint: disable=redefined-builtin
+        self._cache_file_path = None
+        self._cached_entry = None
+        request_headers = CaseInsensitiveDict(headers)
+        if (
+                verb == 'GET' and not stream and
+                'If-None-Match' not in request_headers and 'If-Modified-Since' not in request_headers
+        ):
+            self._cache_file_path = self._cache_path(url, request_headers)
+            try:
+                with open(self._cache_file_path) as cache_file:
+                    self._cached_entry = json.load(cache_file)
+            except (OSError, ValueError):
+                pass
+
+            if self._cached_entry:
+                cached_headers = CaseInsensitiveDict(self._cached_entry['headers'])
+                if 'ETag' in cached_headers:
+                    request_headers['If-None-Match'] = cached_headers['ETag']
+                if 'Last-Modified' in cached_headers:
+                    request_headers['If-Modified-Since'] = cached_headers['Last-Modified']
+                headers = dict(request_headers)
+
+        super().request(verb, url, input, headers, stream)
+
+    def getresponse(self):
+        response = super().getresponse()
+        if self._cache_file_path is None:
+            return response
+
+        if response.status == 304 and self._cached_entry:
+            # Keep the rate limit and other headers of the fresh response.
+            cached_headers = CaseInsensitiveDict(self._cached_entry['headers'])
+            cached_headers.update({
+                name: value for name, value in response.headers.items() if name.lower() != 'content-length'
+            })
+            cached_response = requests.Response()
+            cached_response.status_code = 200
+            cached_response.headers = cached_headers
+            cached_response.encoding = 'utf-8'
+            cached_response._content = self._cached_entry['body'].encode('utf-8')  # pylint: disable=protected-access
+            cached_response.url = response.response.url
+            # Mark the response as used, so that it is not pruned.
+            try:
+                os.utime(self._cache_file_path)
+            except OSError:
+                # Another process removed or replaced it meanwhile.
+                pass
+            return RequestsResponse(cached_response)
+
+        if response.status == 200 and ('ETag' in response.headers or 'Last-Modified' in response.headers):
+            self._store(self._cache_file_path, response)
+        return response
+
+
+def prune_http_cache(cache_dir, max_age_days=HTTP_CACHE_MAX_AGE_DAYS_DEFAULT):
+    """
+    Remove the responses which have not been used for max_age_days from a CachingHTTPSConnection cache directory.
+    """
+    cutoff = datetime.now().timestamp() - max_age_days * 24 * 60 * 60
+    for entry in os.scandir(cache_dir):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            # Another process removed it first.
+            pass
+
+
+class RateLimitBudget:
+    """
+    Rate limit budget shared by the threads making calls with one GitHub connection.
+
+    The remaining calls are read from the rate limit headers of the connection's last response, rather than with
+    extra calls to the rate limit endpoint. When only the reserve is left, callers wait until the limit resets.
+    """
+
+    def __init__(self, github_connection, reserve=RATE_LIMIT_RESERVE_DEFAULT):
+        """
+        Arguments:
+            github_connection (github.Github): The connection whose rate limit to follow.
+            reserve (int): Number of calls to leave in the rate limit for other jobs using the same token.
+        """
+        self.requester = github_connection.requester
+        self.reserve = reserve
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self):
+        """
+        The (remaining, limit) calls as of the last response, or (-1, -1) before any response.
+        """
+        return self.requester.rate_limiting
+
+    def wait(self):
+        """
+        Wait, if need be, until a call can be made without eating into the reserve.
+        """
+        with self._lock:
+            remaining, limit = self.remaining
+            if 0 <= remaining <= self.reserve:
+                wait = max(self.requester.rate_limiting_resettime - datetime.now().timestamp(), 0) + 1
+                LOG.warning('Github API RL Remaining {} of {}, waiting {:0.0f} seconds for it to reset'.format(
+                    remaining, limit, wait
+                ))
+                sleep(wait)
+                # Assume the limit was reset until the next response says otherwise.
+                self.requester.rate_limiting = (limit, limit)
+
+
 class GitHubAPI:
     """
     Manages requests to the GitHub api for a given org/repo
@@ -129,7 +395,8 @@ class GitHubAPI:
     def __init__(
             self, org, repo, token,
             max_tries=None, initial_wait=None, interval=None,
-            exclude_contexts=None, include_contexts=None, all_checks=False
+            exclude_contexts=None, include_contexts=None, all_checks=False, pr_cache_path=None,
+            use_graphql=None, watch_statuses=None, pool_size=None, http_cache_dir=None
     ):
         """
         Creates a new API access object.
@@ -146,8 +413,33 @@ class GitHubAPI:
             exclude_contexts (string): A regex indicating which validation contexts should be excluded
             include_contexts (string): A regex indicating which validation contexts should be explicitly included.
                 If a context matches both exclude_contexts and include_contexts, it is *included*.
-        """
-        self.github_connection = Github(token)
+
+            pr_cache_path (string): Path of a PullRequestShaCache database used by get_pr_range, kept between runs.
+                Defaults to the GITHUB_PR_CACHE environment variable. If neither is set, nothing is cached.
+            use_graphql (bool): Whether to fetch validation results with a single GraphQL query per commit instead of
+                a REST call each for statuses, check suites and check runs. Defaults to the GITHUB_USE_GRAPHQL
+                environment variable.
+            watch_statuses (bool): Whether to wait for a commit's tests by watching for changes with conditional
+                requests and an adaptive interval, instead of polling at a fixed interval. Defaults to the
+                GITHUB_WATCH_STATUSES environment variable.
+            pool_size (int): Size of the HTTP connection pool, for making calls from that many threads at once.
+            http_cache_dir (string): Directory in which to cache the API's responses and revalidate them with
+                conditional requests, see CachingHTTPSConnection. It can be shared by the scripts run on the same
+                agent. Defaults to the GITHUB_HTTP_CACHE_DIR environment variable. If neither is set, nothing is
+                cached.
+        """
+        self.github_connection = Github(token, pool_size=pool_size)
+        if http_cache_dir is None:
+            http_cache_dir = os.environ.get('GITHUB_HTTP_CACHE_DIR')
+        if http_cache_dir:
+            os.makedirs(http_cache_dir, exist_ok=True)
+            prune_http_cache(
+                http_cache_dir, envvar_get_int('GITHUB_HTTP_CACHE_MAX_AGE_DAYS', HTTP_CACHE_MAX_AGE_DAYS_DEFAULT)
+            )
+            # PyGithub has no public way of changing the connection class of a single client.
+            self.github_connection.requester._Requester__connectionClass = partial(  # pylint: disable=protected-access
+                CachingHTTPSConnection, cache_dir=http_cache_dir
+            )
         self.org = org
         self.repo = repo
         self._set_up_repo_and_org()
@@ -173,6 +465,29 @@ class GitHubAPI:
         if include_contexts is not None:
             self.include_contexts = re.compile(include_contexts)
 
+        if pr_cache_path is None:
+            pr_cache_path = os.environ.get('GITHUB_PR_CACHE')
+        self.pr_cache = PullRequestShaCache(pr_cache_path) if pr_cache_path else None
+
+        if use_graphql is None:
+            use_graphql = bool(envvar_get_int("GITHUB_USE_GRAPHQL", 0))
+        self.use_graphql = use_graphql
+
+        # The required checks of the default branch, fetched once per run.
+        self._required_checks = None
+
+        if watch_statuses is None:
+            watch_statuses = bool(envvar_get_int("GITHUB_WATCH_STATUSES", 0))
+        self.watch_statuses = watch_statuses
+        self.watch_min_interval = envvar_get_int("GITHUB_WATCH_MIN_INTERVAL", WATCH_MIN_INTERVAL_DEFAULT)
+        self.watch_max_interval = envvar_get_int("GITHUB_WATCH_MAX_INTERVAL", WATCH_MAX_INTERVAL_DEFAULT)
+        # ETag and data of the last response of each URL requested conditionally.
+        self._conditional_responses = {}
+
+        # Set to a RateLimitBudget to pace calls made from several threads.
+        self.rate_limit_budget = None
+        self._user_login = None
+
     @backoff.on_exception(backoff.expo, (RateLimitExceededException, socket.timeout), max_tries=7,
                           jitter=backoff.random_jitter, on_backoff=_backoff_logger)
     def _set_up_repo_and_org(self):
@@ -202,12 +517,14 @@ class GitHubAPI:
 
     @backoff.on_exception(backoff.expo, (RateLimitExceededException, socket.timeout), max_tries=7,
                           jitter=backoff.random_jitter, on_backoff=_backoff_logger)
-    def clone(self, branch=None, reference_repo=None):
+    def clone(self, branch=None, reference_repo=None, **kwargs):
         """
         Clone this Github repo as a LocalGitAPI instance.
+
+        Any other keyword arguments, like mirror_cache_dir, are passed on to LocalGitAPI.clone.
         """
         clone_url = self.github_repo.ssh_url
-        return LocalGitAPI.clone(clone_url, branch, reference_repo)
+        return LocalGitAPI.clone(clone_url, branch, reference_repo, **kwargs)
 
     @backoff.on_exception(backoff.expo, (RateLimitExceededException, socket.timeout), max_tries=7,
                           jitter=backoff.random_jitter, on_backoff=_backoff_logger)
@@ -406,38 +723,46 @@ class GitHubAPI:
         Returns:
             dict mapping context names to (result, url) tuples
         """
+        if self.use_graphql:
+            sha = commit if isinstance(commit, six.string_types) else commit.sha
+            return self.get_commits_validation_results([sha])[sha]
+
         self.log_rate_limit()
         required_checks = self.get_branch_protection_rules()
 
-        results = {}
         combined_status = self.get_commit_combined_statuses(commit)
-        results.update({
-            status.context: (
-                status.state.lower() if status.state is not None else None,
-                status.target_url
-            )
-            for status in combined_status.statuses
-        })
-
         check_suites = self.get_commit_check_suites(commit)
-        results.update({
-            suite['app']['name']: (
-                suite.get('conclusion').lower() if suite.get('conclusion') is not None else 'pending',
-                suite['url']
-            )
-            for suite in check_suites['check_suites']
-            if self.all_checks or suite['app']['name'] in required_checks
-        })
-
         # get more results from commit check runs
         check_runs = self.get_commit_check_runs(commit)
+
+        return self._collect_validation_results(
+            required_checks,
+            [(status.context, status.state, status.target_url) for status in combined_status.statuses],
+            [(suite['app']['name'], suite.get('conclusion'), suite['url']) for suite in check_suites['check_suites']],
+            [(run['name'], run.get('conclusion'), run['url']) for run in check_runs['check_runs']],
+        )
+
+    def _collect_validation_results(self, required_checks, statuses, check_suites, check_runs):
+        """
+        Combine the statuses, check suites and check runs of a commit into its validation results.
+
+        Arguments:
+            required_checks (list): Names of the checks required by the default branch's protection.
+            statuses (list): (context, state, url) tuples of the commit's statuses.
+            check_suites (list): (app name, conclusion, url) tuples of the commit's check suites.
+            check_runs (list): (name, conclusion, url) tuples of the commit's check runs.
+
+        Returns:
+            dict mapping context names to (result, url) tuples
+        """
+        results = {
+            context: (state.lower() if state is not None else None, url)
+            for context, state, url in statuses
+        }
         results.update({
-            suite['name']: (
-                suite.get('conclusion').lower() if suite.get('conclusion') is not None else 'pending',
-                suite['url']
-            )
-            for suite in check_runs['check_runs']
-            if self.all_checks or suite['name'] in required_checks
+            name: (conclusion.lower() if conclusion is not None else 'pending', url)
+            for name, conclusion, url in itertools.chain(check_suites, check_runs)
+            if self.all_checks or name in required_checks
         })
 
         # If a required check is missing from the results, add it as pending to block deployment.
@@ -449,20 +774,136 @@ class GitHubAPI:
 
         return results
 
+    def _graphql_validation_results(self, required_checks, commit_data):
+        """
+        Return the validation results of a commit from its CommitValidations GraphQL data.
+        """
+        statuses = (commit_data.get('status') or {}).get('contexts', [])
+        check_suites = [suite for suite in commit_data['checkSuites']['nodes'] if suite.get('app')]
+        return self._collect_validation_results(
+            required_checks,
+            [(status['context'], status['state'], status['targetUrl']) for status in statuses],
+            [(suite['app']['name'], suite['conclusion'], suite['url']) for suite in check_suites],
+            [
+                (run['name'], run['conclusion'], run['url'])
+                for suite in commit_data['checkSuites']['nodes']
+                for run in suite['checkRuns']['nodes']
+            ],
+        )
+
+    @backoff.on_exception(backoff.expo, (RateLimitExceededException, socket.timeout), max_tries=7,
+                          jitter=backoff.random_jitter, on_backoff=_backoff_logger)
+    def _graphql_repository_query(self, fields, variables):
+        """
+        Run a GraphQL query for fields of this repo, using the CommitValidations fragment.
+
+        Arguments:
+            fields (list): of GraphQL field selections of the repository.
+            variables (dict): Mapping of the variables used in the fields to (GraphQL type, value) tuples.
+
+        Returns:
+            dict: The repository data of the response.
+        """
+        self.log_rate_limit()
+        declarations = ''.join(
+            ', ${}: {}'.format(name, graphql_type) for name, (graphql_type, _) in variables.items()
+        )
+        query = (
+            'query($owner: String!, $name: String!{}) {{\n'
+            '  repository(owner: $owner, name: $name) {{\n    {}\n  }}\n'
+            '}}\n{}'
+        ).format(declarations, '\n    '.join(fields), GRAPHQL_COMMIT_VALIDATIONS)
+        query_variables = {name: value for name, (_, value) in variables.items()}
+        query_variables.update({'owner': self.org, 'name': self.repo})
+        _, data = self.github_repo._requester.graphql_query(query, query_variables)  # pylint: disable=protected-access
+        return data['data']['repository']
+
+    def get_commits_validation_results(self, shas):
+        """
+        Return the validation results of many commits, fetched with one GraphQL query per GRAPHQL_BATCH_SIZE commits.
+
+        Arguments:
+            shas (list): of commit SHAs.
+
+        Returns:
+            dict mapping each SHA to a dict mapping context names to (result, url) tuples
+        """
+        required_checks = self.get_branch_protection_rules()
+        results = {}
+        for sha_batch in batch(shas, batch_size=GRAPHQL_BATCH_SIZE):
+            repository = self._graphql_repository_query(
+                [
+                    'c{0}: object(oid: $c{0}) {{ ...CommitValidations }}'.format(index)
+                    for index in range(len(sha_batch))
+                ],
+                {'c{}'.format(index): ('GitObjectID!', sha) for index, sha in enumerate(sha_batch)},
+            )
+            for index, sha in enumerate(sha_batch):
+                commit_data = repository['c{}'.format(index)]
+                if commit_data is None:
+                    raise UnknownObjectException(404, 'Commit {} does not exist.'.format(sha), headers={})
+                results[sha] = self._graphql_validation_results(required_checks, commit_data)
+        return results
+
+    def get_pull_requests_validation_results(self, pr_numbers):
+        """
+        Return the metadata and the validation results of the HEAD commits of many PRs, fetched with one GraphQL
+        query per GRAPHQL_BATCH_SIZE PRs.
+
+        Arguments:
+            pr_numbers (list): of PR numbers.
+
+        Returns:
+            dict mapping each PR number to a dict with the PR's 'title', 'state', 'base', 'mergeable', 'head_sha' and
+            'validation_results'
+        """
+        required_checks = self.get_branch_protection_rules()
+        results = {}
+        for pr_batch in batch(pr_numbers, batch_size=GRAPHQL_BATCH_SIZE):
+            repository = self._graphql_repository_query(
+                [
+                    'p{0}: pullRequest(number: $p{0}) {{ number title state baseRefName mergeable headRefOid '
+                    'commits(last: 1) {{ nodes {{ commit {{ ...CommitValidations }} }} }} }}'.format(index)
+                    for index in range(len(pr_batch))
+                ],
+                {'p{}'.format(index): ('Int!', int(pr_number)) for index, pr_number in enumerate(pr_batch)},
+            )
+            for index, pr_number in enumerate(pr_batch):
+                pr_data = repository['p{}'.format(index)]
+                commits = pr_data['commits']['nodes']
+                results[pr_number] = {
+                    'title': pr_data['title'],
+                    'state': pr_data['state'].lower(),
+                    'base': pr_data['baseRefName'],
+                    'mergeable': pr_data['mergeable'].lower(),
+                    'head_sha': pr_data['headRefOid'],
+                    'validation_results': self._graphql_validation_results(
+                        required_checks, commits[0]['commit']
+                    ) if commits else {},
+                }
+        return results
+
     @backoff.on_exception(backoff.expo, (RateLimitExceededException, socket.timeout), max_tries=7,
                           jitter=backoff.random_jitter, on_backoff=_backoff_logger)
     def get_branch_protection_rules(self):
         """
         reference can be found here https://docs.github.com/en/rest/reference/repos#branches
+
+        The rules are fetched once and reused for the rest of the run.
+
         Returns:
             lists of required checks.
         """
+        if self._required_checks is not None:
+            return self._required_checks
+
         required_status_checks = []
         try:
             branch = self.github_repo.get_branch(self.github_repo.default_branch)
             if branch:
 
                 required_status_checks = branch.raw_data['protection']['required_status_checks']['contexts']
+            self._required_checks = required_status_checks
         except Exception as err:  # pylint: disable=broad-except
             LOG.warning("Error occurred white getting branch protection rules: {0}".format(err))
 
@@ -498,7 +939,7 @@ class GitHubAPI:
             return 'success'
         return 'failure'
 
-    def _is_commit_successful(self, sha):
+    def _is_commit_successful(self, sha, validation_results=None):
         """
         Returns whether the passed commit has passed all its tests.
         Ensures there is at least one status update so that
@@ -506,6 +947,7 @@ class GitHubAPI:
 
         Arguments:
             sha (str): The SHA of which to get the status.
+            validation_results (dict): The commit's validation results, if already fetched.
 
         Returns:
             tuple(bool, dict, string):
@@ -513,7 +955,9 @@ class GitHubAPI:
                 dict: Key/values of ci_context:ci_url
                 string: The aggregate validation status of the commit
         """
-        all_validations = self.filter_validation_results(self.get_validation_results(sha))
+        if validation_results is None:
+            validation_results = self.get_validation_results(sha)
+        all_validations = self.filter_validation_results(validation_results)
         aggregate_validation = self.aggregate_validation_results(all_validations)
 
         # Return false if there are no checks so that commits whose tests haven't started yet are not valid
@@ -560,6 +1004,11 @@ class GitHubAPI:
             github.GithubException.GithubException: Unknown errors from github
             github.GithubException.UnknownObjectException: If the PR does not exist
         """
+        if self.use_graphql:
+            pull_request = self.get_pull_requests_validation_results([pr_number])[pr_number]
+            return self._is_commit_successful(
+                pull_request['head_sha'], pull_request['validation_results']
+            )[0:2]
         return self._is_commit_successful(
             self.get_head_commit_from_pull_request(pr_number)
         )[0:2]
@@ -579,6 +1028,8 @@ class GitHubAPI:
         Returns:
             tuple(string, dict): the current commit status, and the results and urls of all validations
         """
+        if self.watch_statuses:
+            return self._watch_commit(sha)
 
         @backoff.on_exception(
             backoff.expo,
@@ -605,6 +1056,114 @@ class GitHubAPI:
             return (result[2], result[1])
         return _run()
 
+    @backoff.on_exception(backoff.expo, (RateLimitExceededException, socket.timeout), max_tries=7,
+                          jitter=backoff.random_jitter, on_backoff=_backoff_logger)
+    def _conditional_get(self, url, parameters=None):
+        """
+        GET a URL with the ETag of its last response, if any, so that an unchanged resource is answered with a
+        304 Not Modified, which does not count against the rate limit.
+
+        Arguments:
+            url (str): The API URL to get.
+            parameters (dict): Query parameters of the request.
+
+        Returns:
+            tuple(bool, object): whether the resource changed since the last request, and its data
+        """
+        etag, data = self._conditional_responses.get(url, (None, None))
+        headers = {'If-None-Match': etag} if etag else {}
+        requester = self.github_repo._requester  # pylint: disable=protected-access
+        response_headers, response_data = requester.requestJsonAndCheck(
+            'GET', url, parameters=parameters, headers=headers
+        )
+        if response_data is None and etag:
+            return False, data
+        self._conditional_responses[url] = (response_headers.get('etag'), response_data)
+        return True, response_data
+
+    def _expected_remaining_seconds(self, check_runs):
+        """
+        Estimate how long the pending check runs of a commit will take to finish, from how long its completed check
+        runs took.
+
+        Returns:
+            The estimated seconds until the first pending check run finishes, or None if there is nothing to go by.
+        """
+        def _parse(timestamp):
+            return datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%SZ')
+
+        durations = [
+            (_parse(run['completed_at']) - _parse(run['started_at'])).total_seconds()
+            for run in check_runs
+            if run.get('status') == 'completed' and run.get('started_at') and run.get('completed_at')
+        ]
+        pending = [run for run in check_runs if run.get('status') != 'completed']
+        if not durations or not pending:
+            return None
+
+        expected_duration = statistics.median(durations)
+        now = datetime.utcnow()
+        return min(
+            expected_duration - ((now - _parse(run['started_at'])).total_seconds() if run.get('started_at') else 0)
+            for run in pending
+        )
+
+    def _watch_commit(self, sha):
+        """
+        Wait for the passed commit's tests to finish by watching its statuses, check suites and check runs with
+        conditional requests, which are free when nothing changed.
+
+        The wait between requests adapts to when the pending check runs are expected to finish, based on how long
+        the commit's completed check runs took, between watch_min_interval and watch_max_interval seconds. The total
+        wait is bounded by the same budget as fixed polling.
+
+        Arguments:
+            sha (str): The SHA of which to get the status.
+
+        Returns:
+            tuple(string, dict): the current commit status, and the results and urls of all validations
+        """
+        commit_url = '{}/commits/{}'.format(self.github_repo.url, sha)
+        deadline = monotonic() + self.initial_wait + self.interval * self.max_tries
+        result = None
+        while True:
+            required_checks = self.get_branch_protection_rules()
+            changes = [
+                self._conditional_get(commit_url + '/status'),
+                self._conditional_get(commit_url + '/check-suites', {'per_page': 100}),
+                self._conditional_get(commit_url + '/check-runs', {'per_page': 100}),
+            ]
+            (_, combined_status), (_, check_suites), (_, check_runs) = changes
+            if result is None or any(changed for changed, _ in changes):
+                validation_results = self._collect_validation_results(
+                    required_checks,
+                    [
+                        (status['context'], status['state'], status['target_url'])
+                        for status in combined_status['statuses']
+                    ],
+                    [
+                        (suite['app']['name'], suite.get('conclusion'), suite['url'])
+                        for suite in check_suites['check_suites']
+                    ],
+                    [(run['name'], run.get('conclusion'), run['url']) for run in check_runs['check_runs']],
+                )
+                result = self._is_commit_successful(sha, validation_results)
+                if len(result) < 3:
+                    # No checks found against the commit, treated as a success like fixed polling does.
+                    return ("success", None)
+                if result[2] != 'pending':
+                    return (result[2], result[1])
+
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                LOG.info('Gave up watching commit {} with checks still pending'.format(sha))
+                return (result[2], result[1])
+            expected = self._expected_remaining_seconds(check_runs['check_runs'])
+            wait = self.interval if expected is None else expected
+            wait = min(max(wait, self.watch_min_interval), self.watch_max_interval, remaining)
+            LOG.info('Checking commit {} again in {:0.1f} seconds'.format(sha, wait))
+            sleep(wait)
+
     def poll_pull_request_test_status(self, pr_number):
         """
         Given a PR number, poll the combined status of the PR's tests.
@@ -897,6 +1456,12 @@ class GitHubAPI:
         by SHA. Note that the GitHub Search API has custom rate limit rules (30 RPM).
         For more, see https://developer.github.com/v3/search.
 
+        If a PR cache is configured, the PRs of each commit are read from it instead,
+        and the commits which are not cached yet are looked up one at a time with the
+        commit's associated pull requests endpoint, which counts against the much larger
+        core rate limit, and then cached. The Search API is only used for the commits
+        whose lookup fails.
+
         Arguments:
             start_sha (str): SHA from which to begin the PR search, exclusive.
             end_sha (str): SHA at which to conclude the PR search, inclusive.
@@ -905,6 +1470,53 @@ class GitHubAPI:
             list: of github.PullRequest.PullRequest
         """
         self.log_rate_limit()
+        comparison = self.github_repo.compare(start_sha, end_sha)
+        if self.pr_cache is None:
+            return self._search_pr_range(comparison.commits)
+
+        repo_name = '{}/{}'.format(self.org, self.repo)
+        commits = list({commit.sha: commit for commit in comparison.commits}.values())
+        cached = self.pr_cache.get(repo_name, [commit.sha for commit in commits])
+        LOG.info('Found {} of {} commits in the PR cache'.format(len(cached), len(commits)))
+
+        pulls = {}
+        unresolved = []
+        for commit in commits:
+            if commit.sha in cached:
+                for pr_number in cached[commit.sha]:
+                    pulls.setdefault(pr_number, None)
+                continue
+            try:
+                commit_pulls = [pull for pull in commit.get_pulls() if pull.base.ref == 'master']
+            except GithubException as exc:
+                LOG.warning('Unable to get the PRs of commit {}, searching for them instead: {}'.format(
+                    commit.sha, exc
+                ))
+                unresolved.append(commit)
+                continue
+            self.pr_cache.set(repo_name, commit.sha, [pull.number for pull in commit_pulls])
+            for pull in commit_pulls:
+                pulls[pull.number] = pull
+
+        if unresolved:
+            for pull in self._search_pr_range(unresolved):
+                pulls[pull.number] = pull
+
+        return [
+            pull if pull is not None else self.github_repo.get_pull(pr_number)
+            for pr_number, pull in pulls.items()
+        ]
+
+    def _search_pr_range(self, commits):
+        """
+        Returns the PRs of the given commits, found with the GitHub Search API.
+
+        Arguments:
+            commits (list): of github.Commit.Commit
+
+        Returns:
+            list: of github.PullRequest.PullRequest
+        """
         # The Search API limits search queries to 256 characters. Untrimmed SHA1s
         # are 40 characters long. To avoid exceeding the rate and search query size
         # limits, we can batch SHAs in our searches. Reserving 56 characters for
@@ -916,8 +1528,7 @@ class GitHubAPI:
         sha_length = int(os.environ.get('SHA_LENGTH', 10))
         batch_size = int(os.environ.get('BATCH_SIZE', 18))
 
-        comparison = self.github_repo.compare(start_sha, end_sha)
-        shas = [commit.sha[:sha_length] for commit in comparison.commits]
+        shas = [commit.sha[:sha_length] for commit in commits]
 
         issues = []
         for sha_batch in batch(shas, batch_size=batch_size):
@@ -938,7 +1549,7 @@ class GitHubAPI:
 
     @backoff.on_exception(backoff.expo, (RateLimitExceededException, socket.timeout), max_tries=7,
                           jitter=backoff.random_jitter, on_backoff=_backoff_logger)
-    def message_pull_request(self, pull_request, message, message_filter, force_message=False):
+    def message_pull_request(self, pull_request, message, message_filter, force_message=False, bot_comments_only=False):
         """
         Messages a pull request. Will only message the PR if the message has not already been posted to the discussion
 
@@ -947,6 +1558,8 @@ class GitHubAPI:
             message (str): the message to post to the pull request
             message_filter (str): the message filter used to avoid duplicate messages
             force_message (bool): if set true the message will be posted without duplicate checking
+            bot_comments_only (bool): if set true only the most recent comments are checked for duplicates, and only
+                those posted by our own user, instead of every comment on the PR
 
         Returns:
             github.IssueComment.IssueComment
@@ -956,7 +1569,10 @@ class GitHubAPI:
             InvalidPullRequestError: When the PR does not exist
 
         """
-        self.log_rate_limit()
+        if self.rate_limit_budget is None:
+            self.log_rate_limit()
+        else:
+            self.rate_limit_budget.wait()
 
         def _not_duplicate(pr_messages, new_message):
             """
@@ -981,19 +1597,50 @@ class GitHubAPI:
                     result = False
             return result
 
+        def _not_duplicate_of_own_comment(pr_messages, new_message):
+            """
+            Returns False if any of our user's comments among the PR's last RECENT_COMMENTS_TO_CHECK comments
+            contains the message, True otherwise.
+
+            Args:
+                pr_messages (github.PaginatedList.PaginatedList): the PR's comments, oldest first
+                new_message (str):
+
+            Returns:
+                bool
+            """
+            login = self.user_login()
+            for index, comment in enumerate(pr_messages.reversed):
+                if index >= RECENT_COMMENTS_TO_CHECK:
+                    break
+                if comment.user.login == login and new_message.lower() in comment.body.lower():
+                    return False
+            return True
+
         if not isinstance(pull_request, PullRequest):
             try:
                 pull_request = self.github_repo.get_pull(pull_request)
             except UnknownObjectException:
                 raise InvalidPullRequestError('PR #{} does not exist'.format(pull_request))
 
-        if force_message or _not_duplicate(pull_request.get_issue_comments(), message_filter):
+        not_duplicate = _not_duplicate_of_own_comment if bot_comments_only else _not_duplicate
+        if force_message or not_duplicate(pull_request.get_issue_comments(), message_filter):
             return pull_request.create_issue_comment(message)
         else:
             LOG.info(f"Not posting duplicate PR message {message} on PR# {pull_request}")
             return None
 
-    def message_pr_with_type(self, pr_number, message_type, deploy_date=None, force_message=False, extra_text=''):
+    def user_login(self):
+        """
+        Returns the login of the user the API token belongs to, fetched once.
+        """
+        if self._user_login is None:
+            self._user_login = self.user().login
+        return self._user_login
+
+    def message_pr_with_type(
+            self, pr_number, message_type, deploy_date=None, force_message=False, extra_text='', bot_comments_only=False
+    ):
         """
         Sends a message to a PR based on the built-in MessageTypes
 
@@ -1002,6 +1649,7 @@ class GitHubAPI:
             message_type (MessageType): The type of message to send
             force_message (bool): if set true the message will be posted without duplicate checking
             extra_text (str): Extra text that will be inserted at the end of the PR message
+            bot_comments_only (bool): if set true only recent comments by our own user are checked for duplicates
 
         Returns:
             github.IssueComment.IssueComment
@@ -1024,6 +1672,7 @@ class GitHubAPI:
             message,
             message,
             force_message,
+            bot_comments_only=bot_comments_only,
         )
 
     @backoff.on_exception(backoff.expo, (RateLimitExceededException, socket.timeout), max_tries=7,
@@ -1042,14 +1691,17 @@ class GitHubAPI:
 
     @backoff.on_exception(backoff.expo, (RateLimitExceededException, socket.timeout), max_tries=7,
                           jitter=backoff.random_jitter, on_backoff=_backoff_logger)
-    def find_approved_not_closed_prs(self, pr_base):
+    def find_approved_not_closed_prs(self, pr_base, max_workers=PR_FETCH_WORKERS_DEFAULT):
         """
         Yield all pull requests in the repo against ``pr_base`` that are approved and not closed.
+
+        The pull requests found by the search are fetched ``max_workers`` at a time, and yielded in search order.
         """
         self.log_rate_limit()
         query = "review:approved state:open"
-        for issue in self.search_issues(query, 'pr', pr_base, '', ''):
-            yield self.github_repo.get_pull(issue.number)
+        pr_numbers = [issue.number for issue in self.search_issues(query, 'pr', pr_base, '', '')]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            yield from executor.map(self.github_repo.get_pull, pr_numbers)
 
     def file_contents(self, path):
         """
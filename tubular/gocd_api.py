@@ -6,6 +6,9 @@ https://api.gocd.org/current/
 """
 import requests
 
+from tubular.utils.instrumentation import http_hooks
+
+
 def get_elastic_profile(host, token, profile_id):
     """
     GoCD get elastic profile
@@ -19,7 +22,7 @@ def get_elastic_profile(host, token, profile_id):
         'Accept': 'application/vnd.go.cd.v2+json',
         'Authorization': "bearer {token}".format(token=token),
     }
-    r = requests.get(url, headers=headers)
+    r = requests.get(url, headers=headers, hooks=http_hooks('gocd'))
     r.raise_for_status()
     return r
 
@@ -39,7 +42,7 @@ def put_elastic_profile(host, token, profile_id, etag, data):
         'Content-Type': 'application/json',
         'If-Match': etag,
     }
-    r = requests.put(url, json=data, headers=headers)
+    r = requests.put(url, json=data, headers=headers, hooks=http_hooks('gocd'))
     r.raise_for_status()
     return r
 
@@ -54,7 +57,7 @@ def list_pipeline_group_configs(host, token):
         'Accept': 'application/vnd.go.cd.v1+json',
         'Authorization': f'bearer {token}',
     }
-    r = requests.get(url, headers=headers)
+    r = requests.get(url, headers=headers, hooks=http_hooks('gocd'))
     r.raise_for_status()
     return r
 
@@ -69,7 +72,7 @@ def get_pipeline_group_config(host, token, name):
         'Accept': 'application/vnd.go.cd.v1+json',
         'Authorization': f'bearer {token}',
     }
-    r = requests.get(url, headers=headers)
+    r = requests.get(url, headers=headers, hooks=http_hooks('gocd'))
     r.raise_for_status()
     return r
 
@@ -86,7 +89,7 @@ def update_pipeline_group_config(host, token, etag, name, data):
         'Content-Type': 'application/json',
         'If-Match': etag,
     }
-    r = requests.put(url, json=data, headers=headers)
+    r = requests.put(url, json=data, headers=headers, hooks=http_hooks('gocd'))
     r.raise_for_status()
     return r
 
@@ -104,7 +107,7 @@ def trigger_update_config_repository(host, token, config_repo):
         'X-GoCD-Confirm': 'true',
     }
 
-    r = requests.post(url, headers=headers)
+    r = requests.post(url, headers=headers, hooks=http_hooks('gocd'))
     # Ignore 409 as it means it is already scheduled.
     if r.status_code not in [409]:
         r.raise_for_status()
@@ -124,6 +127,6 @@ def check_if_config_repo_update_completed(host, token, config_repo_id):
         'Authorization': "bearer {token}".format(token=token),
         'X-GoCD-Confirm': 'true',
     }
-    r = requests.get(url, headers=headers)
+    r = requests.get(url, headers=headers, hooks=http_hooks('gocd'))
     r.raise_for_status()
     return r
\ No newline at end of file
@@ -9,16 +9,24 @@ DriveApi is for managing files in google drive.
 # does NOT tolerate unicode text on sys.stdout, namely python 2 on Build
 # Jenkins  PLAT-2287 tracks this Tech Debt..
 
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from itertools import count
 
 import json
 import logging
+import os
+import threading
+import time
 from six import iteritems, text_type
 import backoff
+import httplib2
 
 from dateutil.parser import parse
+from dateutil.tz import tzutc
 from google.oauth2 import service_account
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaIoBaseUpload
@@ -35,9 +43,31 @@ LOG = logging.getLogger(__name__)
 # However, cap our number lower than that maximum to avoid throttling errors and backoff.
 GOOGLE_API_MAX_BATCH_SIZE = 10
 
+# The hard limit on the number of requests per batch, for clients configured to grow batches beyond the default.
+GOOGLE_API_BATCH_SIZE_LIMIT = 100
+
 # Mimetype used for Google Drive folders.
 FOLDER_MIMETYPE = 'application/vnd.google-apps.folder'
 
+# The largest page size allowed by the Drive files.list API.
+FILES_LIST_MAX_PAGE_SIZE = 1000
+
+# The largest page size allowed by the Drive comments.list API.
+COMMENTS_LIST_MAX_PAGE_SIZE = 100
+
+# File metadata fields kept in a DriveMetadataCache.  Walks asking only for these fields can be served from the cache.
+CACHED_FILE_FIELDS = ['id', 'name', 'mimeType', 'parents', 'createdTime']
+
+# Maximum number of folders combined into a single "'a' in parents or 'b' in parents" files.list query.
+# Kept well below the point where the query string gets long enough for Drive to reject it.
+WALK_FILES_MAX_PARENTS_PER_QUERY = 50
+
+# Uploads larger than this many bytes are sent as resumable uploads, per the Drive API recommendation.
+RESUMABLE_UPLOAD_THRESHOLD = 5 * 1024 * 1024
+
+# Size of each chunk sent during a resumable upload.  Must be a multiple of 256 KB.
+RESUMABLE_UPLOAD_CHUNKSIZE = 5 * 1024 * 1024
+
 # Fields to be extracted from OAuth2 JSON token files
 OAUTH2_TOKEN_FIELDS = [
     'client_id', 'client_secret', 'refresh_token',
@@ -57,6 +87,57 @@ class TriggerRetryException(Exception):
     """
 
 
+BatchAttempt = namedtuple('BatchAttempt', ['size', 'seconds', 'throttled'])
+
+
+class AdaptiveBatchSizer:
+    """
+    Chooses how many requests to put in each batch request, based on how many recent requests were throttled.
+
+    Batches are halved whenever any request in an attempt is throttled, and grow back by one request after each
+    attempt with no throttling, up to max_size.  Every attempt is kept in `attempts` for reporting.
+    """
+    def __init__(self, max_size=GOOGLE_API_MAX_BATCH_SIZE):
+        if not 1 <= max_size <= GOOGLE_API_BATCH_SIZE_LIMIT:
+            raise ValueError('max_size must be between 1 and {}.'.format(GOOGLE_API_BATCH_SIZE_LIMIT))
+        self.max_size = max_size
+        self.size = max_size
+        self.attempts = []
+        self._lock = threading.Lock()
+
+    def record(self, size, seconds, throttled):
+        """
+        Record one batch request attempt and adjust the size of the following batches.
+
+        Args:
+            size (int): Number of requests sent in the batch.
+            seconds (float): How long the batch request took.
+            throttled (int): Number of requests in the batch which were throttled.
+        """
+        with self._lock:
+            self.attempts.append(BatchAttempt(size, seconds, throttled))
+            if throttled:
+                self.size = max(1, self.size // 2)
+            else:
+                self.size = min(self.max_size, self.size + 1)
+            LOG.info('Batch of {} requests took {:0.2f} seconds with {} throttled, next batch size is {}.'.format(
+                size, seconds, throttled, self.size
+            ))
+
+    def summary(self):
+        """
+        Return a dict summarizing all recorded attempts.
+        """
+        with self._lock:
+            attempts = list(self.attempts)
+        return {
+            'batches': len(attempts),
+            'requests': sum(attempt.size for attempt in attempts),
+            'throttled': sum(attempt.throttled for attempt in attempts),
+            'seconds': sum(attempt.seconds for attempt in attempts),
+        }
+
+
 class BaseApiClient:
     """
     Base API client for google services.
@@ -71,7 +152,17 @@ class BaseApiClient:
     _api_version = None
     _api_scopes = None
 
-    def __init__(self, client_secrets_file_path, **kwargs):
+    def __init__(
+            self, client_secrets_file_path, batch_workers=1, max_batch_size=GOOGLE_API_MAX_BATCH_SIZE, **kwargs
+    ):
+        """
+        Args:
+            client_secrets_file_path (str): Path to the service account or OAuth2 token JSON file.
+            batch_workers (int): Number of batch requests to keep in flight at once.
+            max_batch_size (int): Largest number of requests to send in one batch request.
+        """
+        self._batch_workers = batch_workers
+        self._batch_sizer = AdaptiveBatchSizer(max_batch_size)
         self._build_client(client_secrets_file_path, **kwargs)
 
     def _build_client(self, client_secrets_file_path, **kwargs):
@@ -99,15 +190,82 @@ class BaseApiClient:
                 # Set the scopes
                 token_info['scopes'] = self._api_scopes
                 credentials = Credentials(**token_info)
+        self._credentials = credentials
+        self._thread_local = threading.local()
         self._client = build(self._api_name, self._api_version, credentials=credentials, **kwargs)
         LOG.info("Client built.")
 
+    def _thread_http(self):
+        """
+        Return an authorized http object for the calling thread, for executing requests concurrently.
+
+        The http object the client was built with is not thread-safe, so each worker thread needs its own.  Returns
+        None if the client was built without credentials (e.g. with a mock http), meaning the client's own http.
+        """
+        if self._credentials is None:
+            return None
+        if not hasattr(self._thread_local, 'http'):
+            self._thread_local.http = AuthorizedHttp(self._credentials, http=httplib2.Http())
+        return self._thread_local.http
+
     def _batch_with_retry(self, requests):
         """
-        Send the given Google API requests in a single batch requests, and retry only requests that are throttled.
+        Send the given Google API requests in batch requests, and retry only requests that are throttled.
+
+        The requests are split into batches sized by the client's AdaptiveBatchSizer, so batches shrink while Google
+        is throttling and grow back once it stops.  If the client was built with batch_workers > 1, that many batches
+        are in flight at once.
+
+        Args:
+            requests (list of googleapiclient.http.HttpRequest): The requests to send.
+
+        Returns:
+            dict mapping of request object to response
+        """
+        # Mapping of request object to the corresponding response.
+        responses = {}
+
+        # Requests which have not yet been sent in any batch.
+        pending = list(requests)
+
+        def next_batch():
+            """
+            Pop the next batch of requests off the pending queue, sized according to recent throttling.
+            """
+            batch_requests = pending[:self._batch_sizer.size]
+            del pending[:len(batch_requests)]
+            return batch_requests
+
+        if self._batch_workers <= 1:
+            while pending:
+                responses.update(self._send_batch_with_retry(next_batch()))
+            return responses
+
+        def send_batch(batch_requests):
+            """
+            Send one batch from a worker thread, which needs its own http object.
+            """
+            return self._send_batch_with_retry(batch_requests, http=self._thread_http())
+
+        with ThreadPoolExecutor(max_workers=self._batch_workers) as executor:
+            in_flight = set()
+            while pending or in_flight:
+                while pending and len(in_flight) < self._batch_workers:
+                    in_flight.add(executor.submit(send_batch, next_batch()))
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    responses.update(future.result())
+        return responses
+
+    def _send_batch_with_retry(self, requests, http=None):
+        """
+        Send the given Google API requests in a single batch request, and retry only requests that are throttled.
+
+        Every attempt is recorded with the client's AdaptiveBatchSizer.
 
         Args:
             requests (list of googleapiclient.http.HttpRequest): The requests to send.
+            http (httplib2.Http): Optional http object to execute the batch request with, instead of the client's.
 
         Returns:
             dict mapping of request object to response
@@ -168,7 +326,7 @@ class BaseApiClient:
         def func():
             """
             Core function which constitutes the retry loop.  It has no inputs or outputs, only side-effects which
-            populates the `responses` variable within the scope of _batch_with_retry().
+            populates the `responses` variable within the scope of _send_batch_with_retry().
             """
             # Construct a new batch request object containing the current iteration of requests to "try".
             batch_request = self._client.new_batch_http_request(callback=batch_callback)  # pylint: disable=no-member
@@ -185,7 +343,15 @@ class BaseApiClient:
             # immediately retry this function func() with the same requests in the try_requests queue.  If the response
             # is HTTP 200, we *still* may raise TriggerRetryException and retry a subset of requests if some, but not
             # all requests need to be retried.
-            batch_request.execute()
+            start_time = time.monotonic()
+            try:
+                batch_request.execute(http=http)
+            except HttpError as exc:
+                # The whole batch was rejected, so count every request in it as throttled.
+                if _should_retry_google_api(exc):
+                    self._batch_sizer.record(len(try_requests), time.monotonic() - start_time, len(try_requests))
+                raise
+            self._batch_sizer.record(len(try_requests), time.monotonic() - start_time, len(retry_requests))
 
             # If the API throttled some requests, batch_callback would have populated the retry queue.  Reset the
             # try_requests queue and indicate to backoff that there are requests to retry.
@@ -222,6 +388,85 @@ def _should_retry_google_api(exc):
     return retry
 
 
+class DriveMetadataCache:
+    """
+    On-disk cache of Drive folder listings.
+
+    Stores the children of each folder that has been listed, along with a Drive changes.list page token.  DriveApi
+    replays the changes made since that token to bring the cached listings up to date, so later walks of the same
+    folders only need to fetch what changed.
+    """
+    def __init__(self, path):
+        self.path = path
+        # Token marking the point in the Drive changes feed that the cached listings are current to.
+        self.page_token = None
+        # Mapping of folder ID to a dict mapping each child's ID to its metadata.
+        self.folders = {}
+        if os.path.exists(path):
+            with open(path, 'r') as cache_file:
+                contents = json.load(cache_file)
+            self.page_token = contents.get('page_token')
+            self.folders = contents.get('folders', {})
+        LOG.info('Drive metadata cache "{}" loaded with {} folders.'.format(path, len(self.folders)))
+
+    def save(self):
+        """
+        Write the cache to disk, replacing the previous contents atomically.
+        """
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as cache_file:
+            json.dump({'page_token': self.page_token, 'folders': self.folders}, cache_file)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """
+        Forget all cached listings.
+        """
+        self.page_token = None
+        self.folders = {}
+
+    def get_children(self, folder_id):
+        """
+        Return the cached list of metadata dicts for the folder's children, or None if the folder is not cached.
+        """
+        children = self.folders.get(folder_id)
+        return None if children is None else list(children.values())
+
+    def set_children(self, folder_id, children):
+        """
+        Cache the complete list of metadata dicts for the folder's children.
+        """
+        self.folders[folder_id] = {child['id']: {field: child.get(field) for field in CACHED_FILE_FIELDS}
+                                   for child in children}
+
+    def forget_folder(self, folder_id):
+        """
+        Drop the cached listing for the folder, so it is listed from Drive next time.
+        """
+        self.folders.pop(folder_id, None)
+
+    def remove_file(self, file_id):
+        """
+        Remove the file from the listings of all cached parent folders.
+        """
+        for children in self.folders.values():
+            children.pop(file_id, None)
+
+    def apply_change(self, change):
+        """
+        Update the cached listings with one change resource from the Drive changes.list API.
+        """
+        file_id = change['fileId']
+        changed_file = change.get('file')
+        self.remove_file(file_id)
+        if change.get('removed') or not changed_file or changed_file.get('trashed'):
+            self.forget_folder(file_id)
+            return
+        for parent_id in changed_file.get('parents') or []:
+            if parent_id in self.folders:
+                self.folders[parent_id][file_id] = {field: changed_file.get(field) for field in CACHED_FILE_FIELDS}
+
+
 class DriveApi(BaseApiClient):
     """
     Google Drive API client.
@@ -237,6 +482,68 @@ class DriveApi(BaseApiClient):
         'https://www.googleapis.com/auth/drive.metadata',
     ]
 
+    # DriveMetadataCache used to serve walks, if enabled.
+    _cache = None
+
+    def __init__(self, client_secrets_file_path, cache_file=None, **kwargs):
+        """
+        Args:
+            client_secrets_file_path (str): Path to the service account or OAuth2 token JSON file.
+            cache_file (str): Optional path to a DriveMetadataCache file.  If given, folder listings are read from and
+                saved to it, and are brought up to date with the Drive changes feed before the first walk.
+        """
+        super(DriveApi, self).__init__(client_secrets_file_path, **kwargs)
+        self._cache_refreshed = False
+        if cache_file:
+            self._cache = DriveMetadataCache(cache_file)
+
+    @backoff.on_exception(
+        backoff.expo,
+        HttpError,
+        max_time=600,  # 10 minutes
+        giveup=lambda e: not _should_retry_google_api(e),
+        on_backoff=lambda details: _backoff_handler(details),  # pylint: disable=unnecessary-lambda
+    )
+    def _refresh_cache(self):
+        """
+        Bring the metadata cache up to date by replaying the Drive changes feed since it was last saved.
+
+        A cache without a page token, or whose changes can't be listed from its page token (e.g. because it has
+        expired), is cleared and starts tracking changes from now.
+        """
+        if self._cache_refreshed:
+            return
+        if self._cache.page_token is not None:
+            page_token = self._cache.page_token
+            change_count = 0
+            try:
+                while page_token:
+                    resp = self._client.changes().list(  # pylint: disable=no-member
+                        pageToken=page_token,
+                        pageSize=FILES_LIST_MAX_PAGE_SIZE,
+                        fields='nextPageToken, newStartPageToken, changes(fileId, removed, file({}, trashed))'.format(
+                            ', '.join(CACHED_FILE_FIELDS)
+                        ),
+                    ).execute()
+                    for change in resp.get('changes', []):
+                        self._cache.apply_change(change)
+                        change_count += 1
+                    page_token = resp.get('nextPageToken')
+                    if 'newStartPageToken' in resp:
+                        self._cache.page_token = resp['newStartPageToken']
+                LOG.info('Applied {} Drive changes to the metadata cache.'.format(change_count))
+            except HttpError as exc:
+                if _should_retry_google_api(exc):
+                    raise
+                LOG.warning('Unable to list Drive changes for the metadata cache, so clearing it: {}'.format(exc))
+                self._cache.clear()
+        if self._cache.page_token is None:
+            self._cache.clear()
+            resp = self._client.changes().getStartPageToken().execute()  # pylint: disable=no-member
+            self._cache.page_token = resp['startPageToken']
+        self._cache.save()
+        self._cache_refreshed = True
+
     @backoff.on_exception(
         backoff.expo,
         HttpError,
@@ -244,15 +551,18 @@ class DriveApi(BaseApiClient):
         giveup=lambda e: not _should_retry_google_api(e),
         on_backoff=lambda details: _backoff_handler(details),  # pylint: disable=unnecessary-lambda
     )
-    def create_file_in_folder(self, folder_id, filename, file_stream, mimetype):
+    def create_file_in_folder(self, folder_id, filename, file_stream, mimetype, resumable=None):
         """
         Creates a new file in the specified folder.
 
         Args:
             folder_id (str): google resource ID for the drive folder to put the file into.
             filename (str): name of the uploaded file.
-            file_stream (file-like/stream): contents of the file to upload.
+            file_stream (file-like/stream): seekable contents of the file to upload, such as an open file or an
+                in-memory buffer.  The whole stream is uploaded regardless of its current position.
             mimetype (str): mimetype of the given file.
+            resumable (bool): True to upload the file in chunks using a resumable upload session.  If not specified,
+                streams larger than RESUMABLE_UPLOAD_THRESHOLD bytes are uploaded resumably.
 
         Returns: file ID (str).
 
@@ -265,13 +575,23 @@ class DriveApi(BaseApiClient):
             'name': filename,
             'parents': [folder_id],
         }
-        media = MediaIoBaseUpload(file_stream, mimetype=mimetype)
+        if resumable is None:
+            resumable = file_stream.seek(0, os.SEEK_END) > RESUMABLE_UPLOAD_THRESHOLD
+        # Always upload from the start of the stream, which also makes backoff retries resend the whole file.
+        file_stream.seek(0)
+        media = MediaIoBaseUpload(
+            file_stream, mimetype=mimetype, chunksize=RESUMABLE_UPLOAD_CHUNKSIZE, resumable=resumable
+        )
         uploaded_file = self._client.files().create(  # pylint: disable=no-member
             body=file_metadata,
             media_body=media,
             fields='id'
         ).execute()
         LOG.info(u'File uploaded: ID="{}", name="{}"'.format(uploaded_file.get('id'), filename))
+        if self._cache is not None:
+            # The folder is re-listed on the next walk rather than guessing the new file's metadata.
+            self._cache.forget_folder(folder_id)
+            self._cache.save()
         return uploaded_file.get('id')
 
     # NOTE: Do not decorate this function with backoff since it already calls retryable methods.
@@ -293,24 +613,24 @@ class DriveApi(BaseApiClient):
         if len(set(file_ids)) != len(file_ids):
             raise ValueError('duplicates detected in the file_ids list.')
 
-        # mapping of request object to the new comment resource returned in the response.
-        responses = {}
-
-        # process the list of file ids in batches of size GOOGLE_API_MAX_BATCH_SIZE.
-        for file_ids_batch in batch(file_ids, batch_size=GOOGLE_API_MAX_BATCH_SIZE):
-            request_objects = []
-            for file_id in file_ids_batch:
-                request_objects.append(self._client.files().delete(fileId=file_id))  # pylint: disable=no-member
+        request_objects_to_file_id = {}
+        for file_id in file_ids:
+            request_object = self._client.files().delete(fileId=file_id)  # pylint: disable=no-member
+            request_objects_to_file_id[request_object] = file_id
 
-            # this generic helper function will handle the retry logic
-            responses_batch = self._batch_with_retry(request_objects)
+        # this generic helper function will handle the batching and retry logic
+        responses = self._batch_with_retry(list(request_objects_to_file_id))
 
-            responses.update(responses_batch)
+        if self._cache is not None:
+            for request_object in responses:
+                self._cache.remove_file(request_objects_to_file_id[request_object])
+                self._cache.forget_folder(request_objects_to_file_id[request_object])
+            self._cache.save()
 
         if len(responses) != len(file_ids):
             raise BatchRequestError('Error deleting one or more files/folders.')
 
-    def delete_files_older_than(self, top_level, delete_before_dt, mimetype=None, prefix=None):
+    def delete_files_older_than(self, top_level, delete_before_dt, mimetype=None, prefix=None, workers=1):
         """
         Delete all files beneath a given top level folder that are older than a certain datetime.
         Optionally, specify a file mimetype and a filename prefix.
@@ -321,109 +641,44 @@ class DriveApi(BaseApiClient):
                 will be permanently deleted. Should be timezone offset-aware.
             mimetype (str): Mimetype of files to delete. If not specified, all non-folders will be found.
             prefix (str): Filename prefix - only files started with this prefix will be deleted.
+            workers (int): Maximum number of folder listing queries to send at once while walking the folders.
         """
         LOG.info("Starting deletion process with criteria - mimetype: {}, prefix: {}, delete_before: {}".format(
             mimetype or 'any', prefix or 'any', delete_before_dt
         ))
-        LOG.info("Walking files...")
-        all_files = self.walk_files(
-            top_level, 'id, name, createdTime', mimetype
+        # A single walk lists only the files old enough, of any type, so that those with the right prefix which would
+        # have been deleted but for their mimetype can be reported too.
+        expired_files = self.walk_files(
+            top_level, 'id, name, mimeType, createdTime', workers=workers, created_before=delete_before_dt,
+            name_prefix=prefix
         )
-        LOG.info("Files walked. {} files found (already filtered by mimetype: {}).".format(
-            len(all_files), mimetype or 'any'
-        ))
         file_ids_to_delete = []
-        skipped_files_count = 0
-        
-        for file in all_files:
-            file_created = parse(file['createdTime'])
-            file_name = file.get('name', 'unknown')
-            
-            # Check prefix requirement
-            prefix_check_passed = not prefix or file_name.startswith(prefix)
-            # Check date requirement
-            date_check_passed = file_created < delete_before_dt
-            
-            LOG.info("Checking file '{}' created at {}. Prefix check: {}, Date check: {} < {}".format(
-                file_name,
-                file_created,
-                "passed" if prefix_check_passed else "FAILED (prefix='{}')".format(prefix),
-                file_created,
-                delete_before_dt
-            ))
-            
-            if prefix_check_passed and date_check_passed:
-                file_ids_to_delete.append(file['id'])
-                LOG.info("✓ File '{}' marked for deletion.".format(file_name))
+        unmatched_files_count = 0
+        for file_obj in expired_files:
+            if file_obj['mimeType'] == FOLDER_MIMETYPE:
+                continue
+            if mimetype and file_obj['mimeType'] != mimetype:
+                unmatched_files_count += 1
+                LOG.debug(u"Not considered for deletion - Reason: Not a {} file (actual type: {}). File: '{}'".format(
+                    mimetype, file_obj['mimeType'], file_obj['name']
+                ))
             else:
-                skipped_files_count += 1
-                reasons = []
-                if not prefix_check_passed:
-                    actual_prefix_length = min(len(file_name), len(prefix))
-                    reasons.append("Prefix did not match (expected '{}', file starts with '{}')".format(
-                        prefix, file_name[:actual_prefix_length]
-                    ))
-                if not date_check_passed:
-                    reasons.append("Date check failed - file too recent (created {}, cutoff {})".format(
-                        file_created.strftime('%Y-%m-%d'), delete_before_dt.strftime('%Y-%m-%d')
-                    ))
-                LOG.info("Not considered for deletion - Reason: {}. File: '{}'".format(
-                    "; ".join(reasons), file_name
+                file_ids_to_delete.append(file_obj['id'])
+                LOG.debug(u"File '{}' created at {} marked for deletion.".format(
+                    file_obj['name'], file_obj['createdTime']
                 ))
-        
-        LOG.info("Summary: {} files scanned, {} marked for deletion, {} skipped".format(
-            len(all_files), len(file_ids_to_delete), skipped_files_count
+
+        LOG.info("Summary: {} expired files found, {} marked for deletion, {} not matching mimetype {}.".format(
+            len(file_ids_to_delete) + unmatched_files_count, len(file_ids_to_delete), unmatched_files_count,
+            mimetype or 'any'
         ))
-        
+
         if file_ids_to_delete:
-            LOG.info("{} files remaining after filtering.".format(len(file_ids_to_delete)))
             self.delete_files(file_ids_to_delete)
         else:
             LOG.info("No files matched the deletion criteria (prefix='{}', delete_before={}).".format(
                 prefix, delete_before_dt
             ))
-        
-        # Log files not matching the mimetype that were not considered for deletion
-        if mimetype:
-            LOG.info("Scanning for files not matching mimetype '{}'...".format(mimetype))
-            excluded_files = self.get_non_csv_files(top_level, mimetype)
-            LOG.info("Completed scanning. {} files found not matching mimetype '{}'.".format(len(excluded_files), mimetype))
-
-    def get_non_csv_files(self, top_folder_id, exclude_mimetype):
-        """
-        Get all files beneath a given top level folder that don't match the specified mimetype.
-        Traverses all subfolders recursively and logs each file found that doesn't match the mimetype.
-
-        Args:
-            top_folder_id (str): ID of top level folder to scan.
-            exclude_mimetype (str): Mimetype to exclude from results (e.g., 'text/csv').
-
-        Returns:
-            list: List of file objects (excluding folders and files matching the specified mimetype).
-        """
-        LOG.info("Walking all files to identify files not matching mimetype '{}'...".format(exclude_mimetype))
-        all_files = self.walk_files(
-            top_folder_id, 
-            file_fields='id, name, mimeType, createdTime',
-            mimetype=None,
-            recurse=True
-        )
-        
-        excluded_files = []
-        for file_obj in all_files:
-            file_mimetype = file_obj.get('mimeType', '')
-            file_name = file_obj.get('name', 'unknown')
-            
-            # Exclude folders and files matching the specified mimetype
-            if file_mimetype == FOLDER_MIMETYPE:
-                continue
-            elif file_mimetype != exclude_mimetype:
-                excluded_files.append(file_obj)
-                LOG.info(u"Not considered for deletion - Reason: Not a {} file (actual type: {}). File: '{}'".format(
-                    exclude_mimetype, file_mimetype, file_name
-                ))
-        
-        return excluded_files
 
     @backoff.on_exception(
         backoff.expo,
@@ -432,12 +687,56 @@ class DriveApi(BaseApiClient):
         giveup=lambda e: not _should_retry_google_api(e),
         on_backoff=lambda details: _backoff_handler(details),  # pylint: disable=unnecessary-lambda
     )
-    def walk_files(self, top_folder_id, file_fields='id, name', mimetype=None, recurse=True):
+    def _list_children(self, parent_ids, fields, mimetype_clause='', http=None):
         """
-        List all files of a particular mimetype within a given top level folder, traversing all folders recursively.
+        List every item whose parent is one of the given folders, following all result pages.
+
+        Args:
+            parent_ids (list of str): IDs of the folders to list, combined into a single query.
+            fields (str): Comma-separated list of metadata fields to return for each item.
+            mimetype_clause (str): Optional query clause, ending in "and", to restrict the listed mimetypes.
+            http (httplib2.Http): Optional http object to execute the requests with, for use from worker threads.
+
+        Returns: list of item metadata dicts.
+        """
+        query = '{}({})'.format(
+            mimetype_clause,
+            ' or '.join("'{}' in parents".format(parent_id) for parent_id in parent_ids)
+        )
+        results = []
+        extra_kwargs = {}
+        while True:
+            resp = self._client.files().list(  # pylint: disable=no-member
+                q=query,
+                fields='nextPageToken, files({})'.format(fields),
+                pageSize=FILES_LIST_MAX_PAGE_SIZE,
+                **extra_kwargs
+            ).execute(http=http)
+            page_results = resp.get('files', [])
+            LOG.debug("walk_files: Returned %s results for %s folder(s).", len(page_results), len(parent_ids))
+            results.extend(page_results)
+
+            if page_results and resp.get('nextPageToken'):
+                # Only call for more result pages if results were actually returned -and
+                # a nextPageToken is returned.
+                extra_kwargs['pageToken'] = resp['nextPageToken']
+            else:
+                return results
+
+    def iter_files(
+            self, top_folder_id, file_fields='id, name', mimetype=None, recurse=True, workers=1, created_before=None,
+            name_prefix=None
+    ):
+        """
+        Generate all files of a particular mimetype within a given top level folder, traversing folders breadth-first.
 
-        This function may make multiple HTTP requests depending on how many pages the response contains.  The default
-        page size for the python google API client is 100 items.
+        Each level of the folder tree is listed with as few queries as possible by combining up to
+        WALK_FILES_MAX_PARENTS_PER_QUERY folders per query.  When workers is greater than 1, the queries for a level
+        are sent concurrently.  Results are yielded as each level is listed.
+
+        The mimetype and created_before filters are part of the Drive query, so items which don't match them are never
+        listed (folders are always listed, so they can be traversed).  Drive has no name prefix query, so name_prefix
+        is only checked against the listed items.
 
         Args:
             top_folder_id (str): ID of top level folder.
@@ -445,72 +744,131 @@ class DriveApi(BaseApiClient):
                 For a full list of file metadata fields, see https://developers.google.com/drive/api/v3/reference/files
             mimetype (str): Mimetype of files to find. If not specified, all items will be returned, including folders.
             recurse (bool): True to recurse into all found folders for items, False to only return top-level items.
+            workers (int): Maximum number of list queries to send at once.
+            created_before (datetime.datetime): Only return items created before this timezone-aware datetime.
+            name_prefix (str): Only return items whose names start with this prefix.
 
-        Returns: List of dicts, where each dict contains file metadata and each dict key corresponds to fields
-            specified in the `file_fields` arg.
+        Yields: dicts containing file metadata, where each dict key corresponds to fields specified in the
+            `file_fields` arg.
 
         Throws:
             googleapiclient.errors.HttpError:
                 For some non-retryable 4xx or 5xx error.  See the full list here:
                 https://developers.google.com/drive/api/v3/handle-errors
         """
-        # Sent to list() call and used only for sending the pageToken.
-        extra_kwargs = {}
-        # Cumulative list of file metadata dicts for found files.
-        results = []
-        # List of IDs of all visited folders.
-        visited_folders = []
-        # List of IDs of all found files.
-        found_ids = []
-        # List of folder IDs remaining to be listed.
-        folders_to_visit = [top_folder_id]
-        # Mimetype part of file-listing query.
-        mimetype_clause = ""
+        fields = [field.strip() for field in file_fields.split(',')]
+        list_fields = ', '.join(
+            fields + [field for field in ('mimeType', 'parents', 'name', 'createdTime') if field not in fields]
+        )
+        # Predicates which returned files must match.  Folders are always listed, so that they can be traversed.
+        file_predicates = []
         if mimetype:
-            # Return both folders and the specified mimetype.
-            mimetype_clause = "( mimeType = '{}' or mimeType = '{}') and ".format(FOLDER_MIMETYPE, mimetype)
-
-        while folders_to_visit:
-            current_folder = folders_to_visit.pop()
-            LOG.info("Current folder: {}".format(current_folder))
-            visited_folders.append(current_folder)
-            extra_kwargs = {}
+            file_predicates.append("mimeType = '{}'".format(mimetype))
+        if created_before:
+            file_predicates.append("createdTime < '{}'".format(
+                created_before.astimezone(tzutc()).strftime('%Y-%m-%dT%H:%M:%S')
+            ))
+        mimetype_clause = ""
+        if file_predicates:
+            mimetype_clause = "( mimeType = '{}' or ({}) ) and ".format(FOLDER_MIMETYPE, ' and '.join(file_predicates))
 
-            while True:
-                resp = self._client.files().list(  # pylint: disable=no-member
-                    q="{}'{}' in parents".format(mimetype_clause, current_folder),
-                    fields='nextPageToken, files({})'.format(
-                        file_fields + ', mimeType, parents'
-                    ),
-                    **extra_kwargs
-                ).execute()
-                page_results = resp.get('files', [])
+        def _is_match(result):
+            """
+            Check a listed item against the filters, which cached listings and folders have not been filtered by.
+            """
+            return (
+                (not mimetype or result['mimeType'] == mimetype) and
+                (not created_before or parse(result['createdTime']) < created_before) and
+                (not name_prefix or result['name'].startswith(name_prefix))
+            )
 
-                LOG.info("walk_files: Returned %s results.", len(page_results))
+        use_cache = self._cache is not None and set(fields) <= set(CACHED_FILE_FIELDS)
+        if use_cache:
+            self._refresh_cache()
+            # Cached listings must be complete, so list every child with all the cached fields.
+            list_fields = ', '.join(CACHED_FILE_FIELDS)
+            mimetype_clause = ""
+
+        # IDs of all folders visited or queued to be visited, and of all files already returned.
+        visited_folders = {top_folder_id}
+        found_ids = set()
+        found_count = 0
+        folders_to_visit = [top_folder_id]
 
+        while folders_to_visit:
+            group_results = []
+            if use_cache:
+                uncached_folders = []
+                for folder_id in folders_to_visit:
+                    children = self._cache.get_children(folder_id)
+                    if children is None:
+                        uncached_folders.append(folder_id)
+                    else:
+                        group_results.append(children)
+                LOG.info("walk_files: %s of %s folder(s) served from the metadata cache.",
+                         len(folders_to_visit) - len(uncached_folders), len(folders_to_visit))
+                folders_to_visit = uncached_folders
+
+            LOG.info("walk_files: Listing %s folder(s).", len(folders_to_visit))
+            parent_groups = list(batch(folders_to_visit, batch_size=WALK_FILES_MAX_PARENTS_PER_QUERY))
+            if workers > 1 and len(parent_groups) > 1:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    listed_results = list(executor.map(
+                        lambda group: self._list_children(group, list_fields, mimetype_clause, self._thread_http()),
+                        parent_groups
+                    ))
+            else:
+                listed_results = [self._list_children(group, list_fields, mimetype_clause) for group in parent_groups]
+            group_results.extend(listed_results)
+
+            if use_cache and parent_groups:
+                for group, results in zip(parent_groups, listed_results):
+                    for folder_id in group:
+                        self._cache.set_children(
+                            folder_id, [result for result in results if folder_id in (result.get('parents') or [])]
+                        )
+                self._cache.save()
+
+            folders_to_visit = []
+            for results in group_results:
                 # Examine returned results to separate folders from non-folders.
-                for result in page_results:
-                    LOG.info(u"walk_files: Result: {}".format(result))
+                for result in results:
+                    LOG.debug(u"walk_files: Result: {}".format(result))
                     # Folders contain files - and get special treatment.
-                    if result['mimeType'] == FOLDER_MIMETYPE:
-                        if recurse and result['id'] not in visited_folders:
-                            # Add any undiscovered folders to the list of folders to check.
-                            folders_to_visit.append(result['id'])
+                    if result['mimeType'] == FOLDER_MIMETYPE and recurse and result['id'] not in visited_folders:
+                        # Add any undiscovered folders to the next level of folders to check.
+                        visited_folders.add(result['id'])
+                        folders_to_visit.append(result['id'])
                     # Determine if this result is a file to return.
-                    if result['id'] not in found_ids and (not mimetype or result['mimeType'] == mimetype):
-                        found_ids.append(result['id'])
+                    if result['id'] not in found_ids and _is_match(result):
+                        found_ids.add(result['id'])
+                        found_count += 1
                         # Return only the fields specified in file_fields.
-                        results.append({k.strip(): result.get(k.strip(), None) for k in file_fields.split(',')})
+                        yield {field: result.get(field, None) for field in fields}
 
-                LOG.info("walk_files: %s files found and %s folders to check.", len(results), len(folders_to_visit))
+            LOG.info("walk_files: %s files found and %s folders to check.", found_count, len(folders_to_visit))
 
-                if page_results and 'nextPageToken' in resp and resp['nextPageToken']:
-                    # Only call for more result pages if results were actually returned -and
-                    # a nextPageToken is returned.
-                    extra_kwargs['pageToken'] = resp['nextPageToken']
-                else:
-                    break
-        return results
+    def walk_files(
+            self, top_folder_id, file_fields='id, name', mimetype=None, recurse=True, workers=1, created_before=None,
+            name_prefix=None
+    ):
+        """
+        List all files of a particular mimetype within a given top level folder, traversing all folders recursively.
+
+        This is iter_files() collected into a list; see it for details of the arguments.
+
+        Returns: List of dicts, where each dict contains file metadata and each dict key corresponds to fields
+            specified in the `file_fields` arg.
+
+        Throws:
+            googleapiclient.errors.HttpError:
+                For some non-retryable 4xx or 5xx error.  See the full list here:
+                https://developers.google.com/drive/api/v3/handle-errors
+        """
+        return list(self.iter_files(
+            top_folder_id, file_fields, mimetype, recurse, workers, created_before=created_before,
+            name_prefix=name_prefix
+        ))
 
     # NOTE: Do not decorate this function with backoff since it already calls retryable methods.
     def create_comments_for_files(self, file_ids_and_content, fields='id'):
@@ -538,29 +896,23 @@ class DriveApi(BaseApiClient):
         if len(set(file_ids)) != len(file_ids):
             raise ValueError('Duplicates detected in the file_ids_and_content list.')
 
-        # Mapping of file_id to the new comment resource returned in the response.
-        responses = {}
-
-        # Process the list of file IDs in batches of size GOOGLE_API_MAX_BATCH_SIZE.
-        for file_ids_and_content_batch in batch(file_ids_and_content, batch_size=GOOGLE_API_MAX_BATCH_SIZE):
-            request_objects_to_file_id = {}
-            for file_id, content in file_ids_and_content_batch:
-                request_object = self._client.comments().create(  # pylint: disable=no-member
-                    fileId=file_id,
-                    body={u'content': content},
-                    fields=fields
-                )
-                request_objects_to_file_id[request_object] = file_id
+        request_objects_to_file_id = {}
+        for file_id, content in file_ids_and_content:
+            request_object = self._client.comments().create(  # pylint: disable=no-member
+                fileId=file_id,
+                body={u'content': content},
+                fields=fields
+            )
+            request_objects_to_file_id[request_object] = file_id
 
-            # This generic helper function will handle the retry logic
-            responses_batch = self._batch_with_retry(request_objects_to_file_id.keys())
+        # This generic helper function will handle the batching and retry logic
+        responses_by_request = self._batch_with_retry(list(request_objects_to_file_id))
 
-            # Transform the mapping FROM request objects -> comment resource TO file IDs -> comment resources.
-            responses_batch = {
-                request_objects_to_file_id[request_object]: resp
-                for request_object, resp in responses_batch.items()
-            }
-            responses.update(responses_batch)
+        # Transform the mapping FROM request objects -> comment resource TO file IDs -> comment resources.
+        responses = {
+            request_objects_to_file_id[request_object]: resp
+            for request_object, resp in responses_by_request.items()
+        }
 
         if len(responses) != len(file_ids_and_content):
             raise BatchRequestError('Error creating comments for one or more files/folders.')
@@ -618,6 +970,58 @@ class DriveApi(BaseApiClient):
                 return []
             raise
 
+    # NOTE: Do not decorate this function with backoff since it already calls retryable methods.
+    def list_comments_for_files(self, file_ids, fields='id, content, createdTime'):
+        """
+        List comments for multiple files.
+
+        This function takes advantage of request batching to reduce request volume.  The first page of comments for
+        every file is fetched in batches; any further pages, and any file whose batched request failed, fall back to
+        list_comments_for_file().
+
+        Args:
+            file_ids (list of str): list of Drive file IDs for which to list comments.
+            fields (str): comma separated list of fields to describe each comment resource in the response.
+
+        Returns: dict mapping of file_id to comment resource list (list of dict).  The contents of the comment
+            resources are dictated by the `fields` arg.
+
+        Throws:
+            googleapiclient.errors.HttpError:
+                For some non-retryable 4xx or 5xx error.  See the full list here:
+                https://developers.google.com/drive/api/v3/handle-errors
+        """
+        if len(set(file_ids)) != len(file_ids):
+            raise ValueError('duplicates detected in the file_ids list.')
+
+        # mapping of file_id to the list of comment resources.
+        responses = {}
+
+        request_objects_to_file_id = {}
+        for file_id in file_ids:
+            request_object = self._client.comments().list(  # pylint: disable=no-member
+                fileId=file_id,
+                fields='nextPageToken, comments({})'.format(fields),
+                pageSize=COMMENTS_LIST_MAX_PAGE_SIZE
+            )
+            request_objects_to_file_id[request_object] = file_id
+
+        # this generic helper function will handle the batching and retry logic
+        for request_object, resp in self._batch_with_retry(list(request_objects_to_file_id)).items():
+            file_id = request_objects_to_file_id[request_object]
+            if resp and resp.get('nextPageToken'):
+                # Rare: too many comments for one page, so just list them all for this file.
+                continue
+            responses[file_id] = (resp or {}).get('comments', [])
+
+        # Requests which failed in the batch, or had more pages, are listed individually so that real errors surface
+        # rather than being mistaken for files without comments.
+        for file_id in file_ids:
+            if file_id not in responses:
+                responses[file_id] = self.list_comments_for_file(file_id, fields=fields)
+
+        return responses
+
     # NOTE: Do not decorate this function with backoff since it already calls retryable methods.
     def list_permissions_for_files(self, file_ids, fields='emailAddress, role'):
         """
@@ -641,31 +1045,24 @@ class DriveApi(BaseApiClient):
         if len(set(file_ids)) != len(file_ids):
             raise ValueError('duplicates detected in the file_ids list.')
 
-        # mapping of file_id to the new comment resource returned in the response.
-        responses = {}
-
-        # process the list of file ids in batches of size GOOGLE_API_MAX_BATCH_SIZE.
-        for file_ids_batch in batch(file_ids, batch_size=GOOGLE_API_MAX_BATCH_SIZE):
-            request_objects_to_file_id = {}
-            for file_id in file_ids_batch:
-                request_object = self._client.permissions().list(  # pylint: disable=no-member
-                    fileId=file_id,
-                    fields='permissions({})'.format(fields)
-                )
-                request_objects_to_file_id[request_object] = file_id
-
-            # this generic helper function will handle the retry logic
-            responses_batch = self._batch_with_retry(request_objects_to_file_id.keys())
+        request_objects_to_file_id = {}
+        for file_id in file_ids:
+            request_object = self._client.permissions().list(  # pylint: disable=no-member
+                fileId=file_id,
+                fields='permissions({})'.format(fields)
+            )
+            request_objects_to_file_id[request_object] = file_id
 
-            # transform the mapping from request objects -> response dicts to file ids -> permissions resource lists.
-            responses_batch_transformed = {}
-            for request_object, resp in responses_batch.items():
-                permissions = None
-                if resp and 'permissions' in resp:
-                    permissions = resp['permissions']
-                responses_batch_transformed[request_objects_to_file_id[request_object]] = permissions
+        # this generic helper function will handle the batching and retry logic
+        responses_by_request = self._batch_with_retry(list(request_objects_to_file_id))
 
-            responses.update(responses_batch_transformed)
+        # transform the mapping from request objects -> response dicts to file ids -> permissions resource lists.
+        responses = {}
+        for request_object, resp in responses_by_request.items():
+            permissions = None
+            if resp and 'permissions' in resp:
+                permissions = resp['permissions']
+            responses[request_objects_to_file_id[request_object]] = permissions
 
         if len(responses) != len(file_ids):
             raise BatchRequestError('Error listing permissions for one or more files/folders.')
@@ -8,12 +8,14 @@ import backoff
 import requests
 
 from tubular.tubular_email import send_email
+from tubular.utils.instrumentation import backoff_recorder, http_hooks
 
 LOG = logging.getLogger(__name__)
 MAX_ATTEMPTS = int(os.environ.get('RETRY_HUBSPOT_MAX_ATTEMPTS', 5))
 
-GET_VID_FROM_EMAIL_URL_TEMPLATE = "https://api.hubapi.com/contacts/v1/contact/email/{email}/profile"
-DELETE_USER_FROM_VID_TEMPLATE = "https://api.hubapi.com/contacts/v1/contact/vid/{vid}"
+HUBSPOT_BASE_URL = "https://api.hubapi.com"
+GET_VID_FROM_EMAIL_URL_TEMPLATE = "{base_url}/contacts/v1/contact/email/{email}/profile"
+DELETE_USER_FROM_VID_TEMPLATE = "{base_url}/contacts/v1/contact/vid/{vid}"
 
 
 class HubspotException(Exception):
@@ -30,9 +32,11 @@ class HubspotAPI:
         hubspot_api_key,
         aws_region,
         from_address,
-        alert_email
+        alert_email,
+        base_url=None
     ):
         self.api_key = hubspot_api_key
+        self.base_url = (base_url or HUBSPOT_BASE_URL).rstrip('/')
         self.aws_region = aws_region
         self.from_address = from_address
         self.alert_email = alert_email
@@ -40,7 +44,8 @@ class HubspotAPI:
     @backoff.on_exception(
         backoff.expo,
         HubspotException,
-        max_tries=MAX_ATTEMPTS
+        max_tries=MAX_ATTEMPTS,
+        on_backoff=backoff_recorder('hubspot'),
     )
     def delete_user(self, learner):
         """
@@ -64,8 +69,9 @@ class HubspotAPI:
         }
 
         req = requests.delete(DELETE_USER_FROM_VID_TEMPLATE.format(
+            base_url=self.base_url,
             vid=vid
-        ), headers=headers)
+        ), headers=headers, hooks=http_hooks('hubspot'))
         error_msg = ""
         if req.status_code == 200:
             LOG.info("User successfully deleted from Hubspot")
@@ -93,8 +99,9 @@ class HubspotAPI:
         }
 
         req = requests.get(GET_VID_FROM_EMAIL_URL_TEMPLATE.format(
+            base_url=self.base_url,
             email=email
-        ), headers=headers)
+        ), headers=headers, hooks=http_hooks('hubspot'))
         if req.status_code == 200:
             req_data = req.json()
             return req_data.get('vid')
@@ -8,6 +8,7 @@ import backoff
 import os
 
 from auth0.authentication import GetToken
+from tubular.utils.instrumentation import backoff_recorder, http_hooks
 
 logger = logging.getLogger(__name__)
 MAX_ATTEMPTS = int(os.environ.get("RETRY_MAX_ATTEMPTS", 5))
@@ -56,6 +57,7 @@ class RedVenturesApi:
         backoff.expo,
         RedVenturesRecoverableException,
         max_tries=MAX_ATTEMPTS,
+        on_backoff=backoff_recorder('red_ventures'),
     )
     def delete_user(self, user: dict) -> None:
         """
@@ -85,7 +87,7 @@ class RedVenturesApi:
                 "Expected an email address for user to delete, but received None."
             )
         response = requests.delete(
-            self.deletion_url, params={"email": email}, headers=headers
+            self.deletion_url, params={"email": email}, headers=headers, hooks=http_hooks('red_ventures')
         )
 
         if response.status_code == 204:
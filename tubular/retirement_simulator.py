@@ -0,0 +1,413 @@
+"""
+A local stand-in for the LMS retirement APIs and the third-party services learners are retired from.
+
+The simulator is a threaded HTTP server which implements the endpoints used by LmsApi for retirement and the partner
+report, and fake Braze, Amplitude, Hubspot, Segment and Salesforce Marketing Cloud endpoints.  Each service can be
+given a latency, an error rate and a rate limit, so that the retirement scripts can be load-tested offline.
+
+The LMS is served at the root of the simulator's URL, and each vendor under its own path, e.g. <url>/braze.  Use
+`RetirementSimulator.base_urls()` for the `base_urls` of a retirement config pointing at the simulator.
+"""
+
+import json
+import logging
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict, namedtuple
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+LOG = logging.getLogger(__name__)
+
+LMS = 'lms'
+# The path prefixes the vendors are served under, which are also the config base_urls keys for them.
+VENDOR_PREFIXES = {
+    'braze': 'braze',
+    'amplitude': 'amplitude',
+    'hubspot': 'hubspot',
+    'segment': 'segment',
+    'salesforce_marketing_cloud': 'sfmc',
+}
+SERVICES = (LMS,) + tuple(VENDOR_PREFIXES)
+
+START_STATE = 'PENDING'
+
+
+class ServiceProfile(namedtuple('ServiceProfile', 'latency_seconds latency_jitter_seconds error_rate rate_limit')):
+    """
+    How a simulated service behaves.
+
+    latency_seconds: time taken to respond to every request.
+    latency_jitter_seconds: up to this much random extra time is taken.
+    error_rate: fraction of requests, 0 to 1, which fail with a 500 error.
+    rate_limit: requests per second beyond which requests fail with a 429 error, or None for no limit.
+    """
+    __slots__ = ()
+
+    def __new__(cls, latency_seconds=0, latency_jitter_seconds=0, error_rate=0, rate_limit=None):
+        return super().__new__(cls, latency_seconds, latency_jitter_seconds, error_rate, rate_limit)
+
+
+class _RateLimiter:
+    """
+    Token bucket allowing `rate` requests per second, with bursts of up to `rate` requests.
+    """
+    def __init__(self, rate):
+        self.rate = rate
+        self._tokens = rate
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Take a token, returning False if there is none.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+def make_learner(number, state_name=START_STATE, orgs=()):
+    """
+    Return a simulated learner, in the format the LMS serializes learners in retirement in.
+    """
+    username = 'sim_user_{}'.format(number)
+    return {
+        'id': number,
+        'current_state': {'id': 1, 'state_name': state_name, 'state_execution_order': 10},
+        'last_state': {'id': 1, 'state_name': START_STATE, 'state_execution_order': 10},
+        'original_username': username,
+        'original_email': '{}@simulator.invalid'.format(username),
+        'original_name': 'Simulated User {}'.format(number),
+        'retired_username': 'retired_user__sim{}'.format(number),
+        'retired_email': 'retired_user__sim{}@retired.invalid'.format(number),
+        'ecommerce_segment_id': 'ecommerce-{}'.format(number),
+        'orgs': list(orgs),
+        'created': datetime.utcnow().isoformat(),
+        'user': {
+            'id': number,
+            'username': username,
+            'email': '{}@simulator.invalid'.format(username),
+            'profile': {'id': number, 'name': ''},
+        },
+    }
+
+
+class RetirementSimulator:
+    """
+    Simulated LMS and vendor services, served over HTTP from a background thread.
+
+    Usage:
+        with RetirementSimulator(profiles={'braze': ServiceProfile(latency_seconds=0.2)}) as simulator:
+            simulator.add_learners(100)
+            ... point a retirement config's base_urls at simulator.base_urls() ...
+    """
+    def __init__(self, host='127.0.0.1', port=0, profiles=None, seed=None):
+        self.profiles = {service: ServiceProfile() for service in SERVICES}
+        self.profiles.update(profiles or {})
+        self.learners = OrderedDict()
+        # Counts of (service, status code) of the requests made.
+        self.request_counts = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._rate_limiters = {
+            service: _RateLimiter(profile.rate_limit)
+            for service, profile in self.profiles.items() if profile.rate_limit
+        }
+        self._server = ThreadingHTTPServer((host, port), _handler_class(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        """
+        The URL the simulator is served at.
+        """
+        host, port = self._server.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def base_urls(self):
+        """
+        Return the base_urls for a retirement config which uses the simulator for every service.
+        """
+        urls = {key: '{}/{}/'.format(self.url, prefix) for key, prefix in VENDOR_PREFIXES.items()}
+        urls[LMS] = self.url + '/'
+        return urls
+
+    def add_learners(self, count, state_name=START_STATE, orgs=()):
+        """
+        Add learners to the retirement queue, and return them.
+        """
+        with self._lock:
+            first = len(self.learners) + 1
+            learners = [make_learner(number, state_name, orgs) for number in range(first, first + count)]
+            for learner in learners:
+                self.learners[learner['original_username']] = learner
+        return learners
+
+    def learner_states(self):
+        """
+        Return a Counter of the learners' current retirement states.
+        """
+        with self._lock:
+            return Counter(learner['current_state']['state_name'] for learner in self.learners.values())
+
+    def start(self):
+        """
+        Start serving requests in a background thread.
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        LOG.info('Retirement simulator serving at {}'.format(self.url))
+        return self
+
+    def stop(self):
+        """
+        Stop serving requests.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def simulate(self, service):
+        """
+        Apply the service's profile to a request.
+
+        Returns:
+            the status code to fail the request with, or None to handle it normally
+        """
+        profile = self.profiles[service]
+        if service in self._rate_limiters and not self._rate_limiters[service].allow():
+            return 429
+        delay = profile.latency_seconds + self._random.uniform(0, profile.latency_jitter_seconds)
+        if delay > 0:
+            time.sleep(delay)
+        if profile.error_rate and self._random.random() < profile.error_rate:
+            return 500
+        return None
+
+    def count(self, service, status):
+        """
+        Count a request made to a service.
+        """
+        with self._lock:
+            self.request_counts[(service, status)] += 1
+
+    # The LMS endpoints.  Each returns (status code, response data).
+
+    def lms_access_token(self, _params, _data):
+        """
+        Issue an access token.
+        """
+        return 200, {'access_token': 'simulated-token', 'token_type': 'JWT', 'expires_in': 3600}
+
+    def lms_retirement_queue(self, params, _data):
+        """
+        List the learners in the requested states, up to the limit.
+        """
+        states = set(params.get('states', []))
+        limit = int(params['limit'][0]) if params.get('limit') else None
+        with self._lock:
+            learners = [
+                learner for learner in self.learners.values() if learner['current_state']['state_name'] in states
+            ]
+        return 200, learners[:limit] if limit else learners
+
+    def lms_retirements_by_status(self, params, _data):
+        """
+        List the learners in the requested state.
+        """
+        state = params.get('state', [None])[0]
+        with self._lock:
+            return 200, [
+                learner for learner in self.learners.values() if learner['current_state']['state_name'] == state
+            ]
+
+    def lms_retirement_status(self, _params, _data, username):
+        """
+        Get a learner's retirement status.
+        """
+        with self._lock:
+            learner = self.learners.get(username)
+        if learner is None:
+            return 404, {'detail': 'Not found.'}
+        return 200, learner
+
+    def lms_update_retirement_status(self, _params, data):
+        """
+        Move a learner to a new retirement state.
+        """
+        with self._lock:
+            learner = self.learners.get(data.get('username'))
+            if learner is None:
+                return 404, {'detail': 'Not found.'}
+            learner['last_state'] = learner['current_state']
+            learner['current_state'] = dict(learner['current_state'], state_name=data['new_state'])
+        return 204, None
+
+    def lms_partner_report(self, _params, _data):
+        """
+        List the learners to report to their partner organizations.
+        """
+        with self._lock:
+            return 200, [
+                dict(learner, user_id=learner['user']['id'])
+                for learner in self.learners.values() if learner['orgs']
+            ]
+
+    def ok(self, *_args):
+        """
+        Succeed with an empty object.
+        """
+        return 200, {}
+
+    def no_content(self, *_args):
+        """
+        Succeed with no content.
+        """
+        return 204, None
+
+    # The vendor endpoints.
+
+    def braze_delete(self, _params, data):
+        """
+        Delete Braze users.
+        """
+        return 201, {'deleted': len(data.get('external_ids', [])), 'message': 'success'}
+
+    def hubspot_get_vid(self, _params, _data, email):
+        """
+        Get a Hubspot contact's VID, derived from their email.
+        """
+        return 200, {'vid': zlib.crc32(email.encode('utf-8'))}
+
+    def segment_regulate(self, _params, _data, _workspace):
+        """
+        Create a Segment regulation.
+        """
+        return 200, {'regulate_id': 'sim-{}'.format(self._random.randint(0, 1000000))}
+
+    def segment_regulation_status(self, _params, _data, _workspace, _regulation):
+        """
+        Get a Segment regulation's status.
+        """
+        return 200, {'overall_status': 'FINISHED'}
+
+    def sfmc_token(self, _params, _data):
+        """
+        Issue a Salesforce Marketing Cloud access token.
+        """
+        return 200, {'access_token': 'simulated-token', 'expires_in': 1080}
+
+    def sfmc_search(self, _params, data):
+        """
+        Find a Salesforce Marketing Cloud contact for each email address.
+        """
+        return 200, {'channelAddressResponseEntities': [{
+            'contactKeyDetails': [{'contactKey': address}]
+        } for address in data.get('ChannelAddressList', [])]}
+
+
+# (method, path regex, service, simulator method name).  Paths are matched without any trailing slash.
+ROUTES = [
+    ('POST', r'/oauth2/access_token', LMS, 'lms_access_token'),
+    ('GET', r'/api/user/v1/accounts/retirement_queue', LMS, 'lms_retirement_queue'),
+    ('GET', r'/api/user/v1/accounts/retirements_by_status_and_date', LMS, 'lms_retirements_by_status'),
+    ('GET', r'/api/user/v1/accounts/([^/]+)/retirement_status', LMS, 'lms_retirement_status'),
+    ('PATCH', r'/api/user/v1/accounts/update_retirement_status', LMS, 'lms_update_retirement_status'),
+    ('POST', r'/api/user/v1/accounts/retirement_partner_report', LMS, 'lms_partner_report'),
+    ('PUT', r'/api/user/v1/accounts/retirement_partner_report', LMS, 'no_content'),
+    ('POST', r'/api/.+', LMS, 'no_content'),
+    ('POST', r'/braze/users/delete', 'braze', 'braze_delete'),
+    ('POST', r'/amplitude/api/2/deletions/users', 'amplitude', 'ok'),
+    ('GET', r'/hubspot/contacts/v1/contact/email/([^/]+)/profile', 'hubspot', 'hubspot_get_vid'),
+    ('DELETE', r'/hubspot/contacts/v1/contact/vid/[^/]+', 'hubspot', 'ok'),
+    ('POST', r'/segment/v1beta/workspaces/([^/]+)/regulations', 'segment', 'segment_regulate'),
+    ('GET', r'/segment/v1beta/workspaces/([^/]+)/regulations/([^/]+)', 'segment', 'segment_regulation_status'),
+    ('POST', r'/sfmc/v2/token', 'salesforce_marketing_cloud', 'sfmc_token'),
+    ('POST', r'/sfmc/contacts/v1/addresses/email/search', 'salesforce_marketing_cloud', 'sfmc_search'),
+    ('POST', r'/sfmc/contacts/v1/contacts/actions/delete', 'salesforce_marketing_cloud', 'ok'),
+]
+COMPILED_ROUTES = [(method, re.compile(path + '$'), service, name) for method, path, service, name in ROUTES]
+
+
+def _handler_class(simulator):
+    """
+    Return a request handler class which serves the simulator's routes.
+    """
+    class SimulatorRequestHandler(BaseHTTPRequestHandler):
+        """
+        Dispatches requests to the simulator.
+        """
+        protocol_version = 'HTTP/1.1'
+
+        def _handle(self):
+            """
+            Serve a request with the matching route, applying its service's profile.
+            """
+            parts = urlsplit(self.path)
+            path = parts.path.rstrip('/') or '/'
+            for method, path_re, service, name in COMPILED_ROUTES:
+                match = path_re.match(path) if method == self.command else None
+                if match:
+                    break
+            else:
+                self._respond(404, {'detail': 'Not simulated.'})
+                simulator.count(None, 404)
+                return
+
+            data = self._read_body()
+            failure = simulator.simulate(service)
+            if failure is not None:
+                status, response_data = failure, {'message': 'Simulated failure.'}
+            else:
+                status, response_data = getattr(simulator, name)(parse_qs(parts.query), data, *match.groups())
+            simulator.count(service, status)
+            self._respond(status, response_data)
+
+        def _read_body(self):
+            """
+            Read the request body, as JSON or form data.
+            """
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else b''
+            if self.headers.get('Content-Type', '').startswith('application/json') and body:
+                return json.loads(body)
+            return {key: values[0] for key, values in parse_qs(body.decode('utf-8')).items()}
+
+        def _respond(self, status, data):
+            """
+            Send a response with the data as JSON.
+            """
+            body = json.dumps(data).encode('utf-8') if data is not None else b''
+            self.send_response(status)
+            if status == 429:
+                self.send_header('Retry-After', '1')
+            if body:
+                self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+        def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+            LOG.debug('Simulator: ' + format, *args)
+
+    return SimulatorRequestHandler
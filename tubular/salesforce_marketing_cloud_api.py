@@ -9,6 +9,8 @@ from typing import Optional
 import backoff
 import requests
 
+from tubular.utils.instrumentation import backoff_recorder, http_hooks
+
 logger = logging.getLogger(__name__)
 MAX_ATTEMPTS = int(os.environ.get("RETRY_SFMC_MAX_ATTEMPTS", 5))
 
@@ -39,6 +41,7 @@ class SalesforceMarketingCloudApi:
         client_id: str,
         client_secret: str,
         subdomain: str,
+        base_url: Optional[str] = None,
     ):
         """
         Initialize the SFMC API client.
@@ -47,17 +50,22 @@ class SalesforceMarketingCloudApi:
             client_id: SFMC OAuth client ID
             client_secret: SFMC OAuth client secret
             subdomain: SFMC subdomain (e.g., 'mc123456789')
+            base_url: Optional URL to use for both the auth and REST APIs instead of the subdomain's, e.g. to use
+                the retirement simulator.
         """
         self.client_id = client_id
         self.client_secret = client_secret
         self.subdomain = subdomain
         self.token_host = f"{subdomain}.auth.marketingcloudapis.com"
         self.suppression_host = f"{subdomain}.rest.marketingcloudapis.com"
+        self.token_base_url = base_url.rstrip("/") if base_url else f"https://{self.token_host}"
+        self.suppression_base_url = base_url.rstrip("/") if base_url else f"https://{self.suppression_host}"
 
     @backoff.on_exception(
         backoff.expo,
         SalesforceMarketingCloudRecoverableException,
         max_tries=MAX_ATTEMPTS,
+        on_backoff=backoff_recorder('salesforce_marketing_cloud'),
     )
     def _get_access_token(self) -> str:
         """
@@ -70,7 +78,7 @@ class SalesforceMarketingCloudApi:
             SalesforceMarketingCloudException: if the error from SFMC is unrecoverable/unretryable.
             SalesforceMarketingCloudRecoverableException: if the error from SFMC is recoverable/retryable.
         """
-        token_url = f"https://{self.token_host}/v2/token"
+        token_url = f"{self.token_base_url}/v2/token"
         token_data = {
             "grant_type": "client_credentials",
             "client_id": self.client_id,
@@ -80,7 +88,8 @@ class SalesforceMarketingCloudApi:
 
         try:
             response = requests.post(
-                token_url, headers=token_headers, json=token_data, timeout=30
+                token_url, headers=token_headers, json=token_data, timeout=30,
+                hooks=http_hooks('salesforce_marketing_cloud'),
             )
 
             if response.status_code == 200:
@@ -107,6 +116,7 @@ class SalesforceMarketingCloudApi:
         backoff.expo,
         SalesforceMarketingCloudRecoverableException,
         max_tries=MAX_ATTEMPTS,
+        on_backoff=backoff_recorder('salesforce_marketing_cloud'),
     )
     def _get_contact_key_by_email(self, email: str, access_token: str) -> Optional[str]:
         """
@@ -124,7 +134,7 @@ class SalesforceMarketingCloudApi:
             SalesforceMarketingCloudRecoverableException: if the error from SFMC is recoverable/retryable.
         """
         search_route = "contacts/v1/addresses/email/search"
-        search_url = f"https://{self.suppression_host}/{search_route}"
+        search_url = f"{self.suppression_base_url}/{search_route}"
         search_headers = {
             "Authorization": f"Bearer {access_token}",
             "Content-Type": "application/json",
@@ -140,6 +150,7 @@ class SalesforceMarketingCloudApi:
                 headers=search_headers,
                 json=search_data,
                 timeout=30,
+                hooks=http_hooks('salesforce_marketing_cloud'),
             )
 
             if response.status_code == 200:
@@ -192,6 +203,7 @@ class SalesforceMarketingCloudApi:
         backoff.expo,
         SalesforceMarketingCloudRecoverableException,
         max_tries=MAX_ATTEMPTS,
+        on_backoff=backoff_recorder('salesforce_marketing_cloud'),
     )
     def delete_user(self, user: dict) -> None:
         """
@@ -221,7 +233,7 @@ class SalesforceMarketingCloudApi:
             return
 
         delete_route = "contacts/v1/contacts/actions/delete?type=keys"
-        delete_url = f"https://{self.suppression_host}/{delete_route}"
+        delete_url = f"{self.suppression_base_url}/{delete_route}"
         delete_headers = {
             "Authorization": f"Bearer {access_token}",
             "Content-Type": "application/json",
@@ -238,6 +250,7 @@ class SalesforceMarketingCloudApi:
                 headers=delete_headers,
                 json=delete_data,
                 timeout=30,
+                hooks=http_hooks('salesforce_marketing_cloud'),
             )
 
             if response.status_code == 200:
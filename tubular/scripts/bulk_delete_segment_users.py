@@ -5,6 +5,7 @@ Command-line script to bulk delete users from Segment.
 
 
 from functools import partial
+from itertools import islice
 from os import path
 import csv
 import logging
@@ -31,6 +32,10 @@ ERR_NO_CONFIG = -1
 ERR_BAD_CONFIG = -2
 ERR_NO_CSV_FILE = -3
 ERR_DELETING_USERS = -4
+ERR_BAD_LEDGER = -5
+
+# Suffix appended to the users CSV filename to name the default resume ledger.
+LEDGER_SUFFIX = '.ledger'
 
 SCRIPT_SHORTNAME = 'bulk_delete_segment_users'
 LOG = partial(_log, SCRIPT_SHORTNAME)
@@ -41,6 +46,52 @@ CONFIG_OR_EXIT = partial(_config_or_exit, FAIL_EXCEPTION, ERR_BAD_CONFIG)
 logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
 
 
+def _csv_row_to_learner(user_info):
+    """
+    Convert a row from the users CSV file into the learner dict expected by SegmentApi.
+    """
+    return {
+        'retirement_id': user_info[0],
+        'user': {'id': user_info[1]},
+        'original_username': user_info[2],
+        'ecommerce_segment_id': user_info[3]
+    }
+
+
+def _read_ledger(ledger_file):
+    """
+    Return the number of CSV rows already submitted to Segment according to the ledger file.
+
+    Each ledger line is "<start_row>,<row_count>,<regulation_id>" and lines are only ever appended
+    after a chunk is accepted by Segment, so the furthest row recorded is where to resume.
+    """
+    if not path.exists(ledger_file):
+        return 0
+
+    rows_done = 0
+    with open(ledger_file, 'r') as ledger:
+        for line_num, entry in enumerate(csv.reader(ledger), start=1):
+            if not entry:
+                continue
+            try:
+                start_row, row_count = int(entry[0]), int(entry[1])
+            except (IndexError, ValueError):
+                FAIL(ERR_BAD_LEDGER, 'Malformed line {} in ledger file "{}": {}'.format(line_num, ledger_file, entry))
+            rows_done = max(rows_done, start_row + row_count)
+    return rows_done
+
+
+def _iter_chunks(users_reader, chunk_size):
+    """
+    Lazily yield lists of at most chunk_size learner dicts from the CSV reader.
+    """
+    while True:
+        chunk = [_csv_row_to_learner(user_info) for user_info in islice(users_reader, chunk_size)]
+        if not chunk:
+            return
+        yield chunk
+
+
 @click.command("bulk_delete_segment_users")
 @click.option(
     '--dry_run',
@@ -60,9 +111,18 @@ logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
     default=DEFAULT_CHUNK_SIZE,
     help='Maximum number of Segment deletions to perform in each deletion request.'
 )
-def bulk_delete_segment_users(dry_run, config_file, retired_users_csv, chunk_size):
+@click.option(
+    '--ledger_file',
+    help='Append-only file recording each submitted chunk and its Segment regulation id. Existing entries are '
+         'used to resume without resubmitting completed chunks. Defaults to the users CSV filename plus "{}".'.format(
+             LEDGER_SUFFIX
+         )
+)
+def bulk_delete_segment_users(dry_run, config_file, retired_users_csv, chunk_size, ledger_file):
     """
     Deletes the users in the CSV file from Segment.
+
+    The CSV file is streamed one chunk at a time, so memory use does not grow with the number of users.
     """
     if not config_file:
         FAIL(ERR_NO_CONFIG, 'No config file passed in.')
@@ -82,28 +142,47 @@ def bulk_delete_segment_users(dry_run, config_file, retired_users_csv, chunk_siz
 
     segment_api = SegmentApi(segment_base_url, auth_token, workplace_slug)
 
-    # Read the CSV file. Log the number of user rows read.
+    if not ledger_file:
+        ledger_file = retired_users_csv + LEDGER_SUFFIX
+
+    rows_done = _read_ledger(ledger_file)
+    if rows_done:
+        LOG('Ledger file "{}" shows {} user rows already submitted, resuming after them.'.format(
+            ledger_file, rows_done
+        ))
+
+    rows_read = rows_done
     with open(retired_users_csv, 'r') as csv_file:
         users_reader = csv.reader(csv_file)
-        users_rows = list(users_reader)
-        LOG("Read {} user rows from CSV file '{}'.".format(len(users_rows), retired_users_csv))
-
-    users_to_delete = []
-    for user_info in users_rows:
-        users_to_delete.append(
-            {
-                'retirement_id': user_info[0],
-                'id': user_info[1],
-                'original_username': user_info[2],
-                'ecommerce_segment_id': user_info[3]
-            }
-        )
-    LOG('Attempting Segment deletion of {} users...'.format(len(users_to_delete)))
-    if not dry_run:
-        try:
-            segment_api.delete_and_suppress_learners(users_to_delete, chunk_size)
-        except Exception as exc:  # pylint: disable=broad-except
-            FAIL_EXCEPTION(ERR_DELETING_USERS, 'Unexpected error occurred!', exc)
+
+        # Skip past the rows that were already submitted without building any learner dicts for them.
+        for _ in islice(users_reader, rows_done):
+            pass
+
+        for chunk in _iter_chunks(users_reader, chunk_size):
+            start_row = rows_read
+            rows_read += len(chunk)
+            LOG('Attempting Segment deletion of {} users from rows {} through {}...'.format(
+                len(chunk), start_row, rows_read - 1
+            ))
+            if dry_run:
+                continue
+
+            try:
+                regulation_ids = segment_api.delete_and_suppress_learners(chunk, chunk_size)
+            except Exception as exc:  # pylint: disable=broad-except
+                FAIL_EXCEPTION(ERR_DELETING_USERS, 'Unexpected error occurred!', exc)
+
+            if not regulation_ids:
+                FAIL(ERR_DELETING_USERS, 'Segment did not accept the deletion of rows {} through {}.'.format(
+                    start_row, rows_read - 1
+                ))
+
+            # Record the chunk as soon as Segment accepts it so a later failure never resubmits it.
+            with open(ledger_file, 'a') as ledger:
+                csv.writer(ledger).writerow([start_row, len(chunk), ' '.join(str(reg_id) for reg_id in regulation_ids)])
+
+    LOG("Read {} user rows from CSV file '{}'.".format(rows_read, retired_users_csv))
 
 
 if __name__ == '__main__':
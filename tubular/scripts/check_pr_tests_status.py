@@ -74,9 +74,16 @@ LOG = logging.getLogger(__name__)
     help=u"Regex defining which validation contexts to include from this status check.",
     default=None
 )
+@click.option(
+    '--use-graphql',
+    help=u"Fetch the statuses and check runs with a single GraphQL query.",
+    envvar='GITHUB_USE_GRAPHQL',
+    is_flag=True,
+    default=False
+)
 def check_tests(
         org, repo, token, input_file, pr_number, commit_hash,
-        out_file, all_checks, exclude_contexts, include_contexts,
+        out_file, all_checks, exclude_contexts, include_contexts, use_graphql,
 ):
     """
     Check the current combined status of a GitHub PR/commit in a repo once.
@@ -101,7 +108,7 @@ def check_tests(
         sys.exit(1)
 
     gh_utils = GitHubAPI(org, repo, token, exclude_contexts=exclude_contexts,
-                         include_contexts=include_contexts, all_checks=all_checks)
+                         include_contexts=include_contexts, all_checks=all_checks, use_graphql=use_graphql)
 
     status_success = False
     if input_file:
@@ -67,6 +67,21 @@ LOG = logging.getLogger(__name__)
     u'--reference_repo',
     help=u'Path to a reference private repo to use to speed up repo cloning.',
 )
+@click.option(
+    u'--mirror_cache_dir',
+    envvar=u'GIT_MIRROR_CACHE_DIR',
+    help=u'Directory in which to keep a mirror of the repo between runs, fetched incrementally and used as the '
+         u'reference repo to speed up cloning.',
+)
+@click.option(
+    u'--clone_filter',
+    help=u'Partial clone filter, e.g. blob:none to only fetch file contents when they are needed.',
+)
+@click.option(
+    u'--clone_depth',
+    type=int,
+    help=u'Number of commits of history to clone, for a shallow clone.',
+)
 @click_log.simple_verbosity_option(default=u'INFO')
 def create_private_to_public_pr(private_org,
                                 private_repo,
@@ -76,7 +91,10 @@ def create_private_to_public_pr(private_org,
                                 public_target_branch,
                                 token,
                                 output_file,
-                                reference_repo):
+                                reference_repo,
+                                mirror_cache_dir,
+                                clone_filter,
+                                clone_depth):
     u"""
     Creates a PR to merge the private source branch into the public target branch.
     Clones the repo in order to perform the proper git commands locally.
@@ -91,7 +109,10 @@ def create_private_to_public_pr(private_org,
     }
 
     LOG.info('Cloning private repo %s with branch %s.', private_github_url, private_source_branch)
-    with LocalGitAPI.clone(private_github_url, private_source_branch, reference_repo).cleanup() as local_repo:
+    with LocalGitAPI.clone(
+            private_github_url, private_source_branch, reference_repo,
+            mirror_cache_dir=mirror_cache_dir, filter_spec=clone_filter, depth=clone_depth,
+    ).cleanup() as local_repo:
         # Add the public repo as a remote for the private git working tree.
         local_repo.add_remote('public', public_github_url)
         # Create a new public branch with unique name.
@@ -101,8 +101,24 @@ def _config_or_exit(config_file, google_secrets_file):
     ),
     show_default=True,
 )
+@click.option(
+    '--drive_cache_file',
+    default=None,
+    help=(
+        'Optional path to a local cache of Drive folder listings, kept between runs. Folders are then only '
+        're-listed where the Drive changes feed shows something changed.'
+    ),
+)
+@click.option(
+    '--workers',
+    type=click.IntRange(min=1),
+    default=1,
+    help='Number of Drive folder listing queries, and of batched delete requests, to send concurrently.',
+    show_default=True,
+)
 def delete_expired_reports(
-    config_file, google_secrets_file, age_in_days, as_user_account, enable_delete_notification
+    config_file, google_secrets_file, age_in_days, as_user_account, enable_delete_notification, drive_cache_file,
+    workers
 ):
     """
     Performs the partner report deletion as needed.
@@ -130,14 +146,16 @@ def delete_expired_reports(
     try:
         delete_before_dt = datetime.now(UTC) - timedelta(days=age_in_days)
         drive = DriveApi(
-            config['google_secrets_file'], as_user_account=as_user_account
+            config['google_secrets_file'], as_user_account=as_user_account, cache_file=drive_cache_file,
+            batch_workers=workers
         )
         LOG('DriveApi configured')
         drive.delete_files_older_than(
             config['drive_partners_folder'],
             delete_before_dt,
             mimetype='text/csv',
-            prefix="{}_{}".format(REPORTING_FILENAME_PREFIX, config['partner_report_platform_name'])
+            prefix="{}_{}".format(REPORTING_FILENAME_PREFIX, config['partner_report_platform_name']),
+            workers=workers
         )
         LOG('Partner report deletion complete')
     except Exception as exc:  # pylint: disable=broad-except
@@ -218,12 +218,14 @@ def _setup_all_apis_or_exit(fail_func, fail_code, config):
             config['BRAZE'] = BrazeApi(
                 braze_api_key,
                 braze_instance,
+                base_url=config['base_urls'].get('braze', None),
             )
 
         if amplitude_api_key and amplitude_secret_key:
             config['AMPLITUDE'] = AmplitudeApi(
                 amplitude_api_key,
                 amplitude_secret_key,
+                base_url=config['base_urls'].get('amplitude', None),
             )
 
         if salesforce_user and salesforce_password and salesforce_token:
@@ -240,7 +242,8 @@ def _setup_all_apis_or_exit(fail_func, fail_code, config):
                 hubspot_api_key,
                 hubspot_aws_region,
                 hubspot_from_address,
-                hubspot_alert_email
+                hubspot_alert_email,
+                base_url=config['base_urls'].get('hubspot', None),
             )
 
         if ecommerce_base_url:
@@ -286,6 +289,7 @@ def _setup_all_apis_or_exit(fail_func, fail_code, config):
                 salesforce_marketing_cloud_client_id,
                 salesforce_marketing_cloud_secret,
                 salesforce_marketing_cloud_subdomain,
+                base_url=config['base_urls'].get('salesforce_marketing_cloud', None),
             )
     except Exception as exc:  # pylint: disable=broad-except
         fail_func(fail_code, 'Unexpected error occurred!', exc)
@@ -7,6 +7,7 @@ This is intended to be used with edx/edx-platform-private according to
 2U's private patch process:
 https://2u-internal.atlassian.net/wiki/spaces/ENG/pages/19466701/LMS+Studio+Security+Fix+Process
 """
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import logging
 import sys
@@ -18,9 +19,19 @@ import click_log
 import yaml
 
 from tubular import github_api  # pylint: disable=wrong-import-position
+from tubular.git_repo import MergeConflict  # pylint: disable=wrong-import-position
 
 
-def find_approved_prs(target_repo, source_repo, target_base_branch, source_base_branch):
+MERGE_FAILURE_MESSAGE = (
+    "Merging of private PRs failed; see this runbook for hints: "
+    "https://2u-internal.atlassian.net/wiki/spaces/ENG/pages/19466701/LMS+Studio+Security+Patch+Process#Deployments-are-failing-at-the-edxapp-build/prerelease_materials-stage-in-GoCD"
+)
+
+
+def find_approved_prs(
+        target_repo, source_repo, target_base_branch, source_base_branch,
+        max_workers=github_api.PR_FETCH_WORKERS_DEFAULT,
+):
     """
     Yield all PRs in ``target_repo`` which meet the following criteria:
         * have been approved
@@ -28,17 +39,24 @@ def find_approved_prs(target_repo, source_repo, target_base_branch, source_base_
         * have a base branch of ``target_base_branch``
         * have not been merged to ``source_base_branch`` in ``source_repo``
 
+    The PRs are fetched, and checked for having been merged, ``max_workers`` at a time.
+
     Arguments:
         target_repo (str, str): A tuple of org, repository
         source_repo (str, str): A tuple of org, repository
         target_base_branch (str): The name of the branch that PRs should be targetting
         source_base_branch (str): The name of a branch that PRs shouldn't have been merged to
+        max_workers (int): The number of PRs to look up at a time
     """
-    candidate_prs = list(target_repo.find_approved_not_closed_prs(target_base_branch))
+    candidate_prs = list(target_repo.find_approved_not_closed_prs(target_base_branch, max_workers=max_workers))
 
-    for pull in candidate_prs:
-        if not source_repo.has_been_merged(source_base_branch, pull.head.sha):
-            yield pull
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        merged = executor.map(
+            lambda pull: source_repo.has_been_merged(source_base_branch, pull.head.sha), candidate_prs
+        )
+        for pull, has_been_merged in zip(candidate_prs, merged):
+            if not has_been_merged:
+                yield pull
 
 
 @click.command()
@@ -100,6 +118,28 @@ def find_approved_prs(target_repo, source_repo, target_base_branch, source_base_
     u'--target-reference-repo',
     help=u"Path to a reference repository to speed up cloning of the target repository",
 )
+@click.option(
+    u'--mirror-cache-dir',
+    envvar=u'GIT_MIRROR_CACHE_DIR',
+    help=u'Directory in which to keep a mirror of the target repository between runs, fetched incrementally and '
+         u'used as the reference repo to speed up cloning.',
+)
+@click.option(
+    u'--clone-filter',
+    help=u'Partial clone filter, e.g. blob:none to only fetch file contents when they are needed.',
+)
+@click.option(
+    u'--exclude-conflicting-prs',
+    help=u"Leave out PRs which conflict with the source deploy commit or with other PRs, and merge the rest, instead "
+         u"of failing.",
+    is_flag=True,
+)
+@click.option(
+    u'--workers',
+    help=u"The number of approved PRs to look up at a time.",
+    type=click.IntRange(min=1),
+    default=github_api.PR_FETCH_WORKERS_DEFAULT,
+)
 @click.option(
     u'--repo-variable',
     help=u"The name of the variable to add to the results yaml file. This variable will "
@@ -115,7 +155,7 @@ def find_approved_prs(target_repo, source_repo, target_base_branch, source_base_
 def octomerge(
         token, target_repo, source_repo, target_base_branch, source_base_branch,
         target_branch, target_tag, source_deploy_commit, out_file, target_reference_repo,
-        repo_variable, sha_variable
+        mirror_cache_dir, clone_filter, exclude_conflicting_prs, workers, repo_variable, sha_variable
 ):
     u"""
     Merge all approved security PRs into a release candidate.
@@ -130,7 +170,9 @@ def octomerge(
     """
     target_github_repo = github_api.GitHubAPI(*target_repo, token=token)
     source_github_repo = github_api.GitHubAPI(*source_repo, token=token)
-    with target_github_repo.clone(target_branch, target_reference_repo).cleanup() as local_repo:
+    with target_github_repo.clone(
+            target_branch, target_reference_repo, mirror_cache_dir=mirror_cache_dir, filter_spec=clone_filter
+    ).cleanup() as local_repo:
         logging.info(f"Initial target branch at commit {local_repo.get_head_sha(branch=target_branch)}")
         local_repo.add_remote('source', source_github_repo.github_repo.ssh_url)
         local_repo.force_branch_to(target_branch, source_deploy_commit)
@@ -138,8 +180,9 @@ def octomerge(
         logging.info(f"Target branch has been locally forced to {target_head_sha}")
 
         approved_prs = list(find_approved_prs(
-            target_github_repo, source_github_repo, target_base_branch, source_base_branch
+            target_github_repo, source_github_repo, target_base_branch, source_base_branch, max_workers=workers
         ))
+        excluded_prs = []
 
         if approved_prs:
             logging.info("Merging the following prs into {}:\n{}".format(
@@ -150,13 +193,25 @@ def octomerge(
                 )
             ))
             try:
-                local_repo.octopus_merge(target_branch, [pr.head.sha for pr in approved_prs])
-            except BaseException as e:
-                logging.error(
-                    "Merging of private PRs failed; see this runbook for hints: "
-                    "https://2u-internal.atlassian.net/wiki/spaces/ENG/pages/19466701/LMS+Studio+Security+Patch+Process#Deployments-are-failing-at-the-edxapp-build/prerelease_materials-stage-in-GoCD"
+                _, excluded_shas = local_repo.merge_bisecting_conflicts(
+                    target_branch, [pr.head.sha for pr in approved_prs], exclude_conflicts=exclude_conflicting_prs
                 )
+            except MergeConflict as e:
+                logging.error("Merging {} failed with conflicts".format(
+                    ", ".join(pr.html_url for pr in approved_prs if pr.head.sha == e.commitish)
+                ))
+                logging.error(MERGE_FAILURE_MESSAGE)
+                raise e
+            except BaseException as e:
+                logging.error(MERGE_FAILURE_MESSAGE)
                 raise e
+            excluded_prs = [pr for pr in approved_prs if pr.head.sha in excluded_shas]
+            if excluded_prs:
+                logging.error("The following prs conflict and were not merged into {}:\n{}".format(
+                    target_branch,
+                    "\n".join("    {.html_url}".format(pr) for pr in excluded_prs)
+                ))
+                approved_prs = [pr for pr in approved_prs if pr not in excluded_prs]
         else:
             logging.info("No PRs to merge")
 
@@ -183,6 +238,11 @@ def octomerge(
                 for pr in approved_prs
             ],
         }
+        if exclude_conflicting_prs:
+            results['excluded_prs'] = [
+                {'html_url': pr.html_url}
+                for pr in excluded_prs
+            ]
 
         if repo_variable:
             repo = target_github_repo.github_repo
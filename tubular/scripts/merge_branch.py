@@ -57,6 +57,16 @@ LOG = logging.getLogger(__name__)
     u'--reference-repo',
     help=u'Path to a reference repo to use to speed up cloning',
 )
+@click.option(
+    u'--mirror-cache-dir',
+    envvar=u'GIT_MIRROR_CACHE_DIR',
+    help=u'Directory in which to keep a mirror of the repo between runs, fetched incrementally and used as the '
+         u'reference repo to speed up cloning.',
+)
+@click.option(
+    u'--clone-filter',
+    help=u'Partial clone filter, e.g. blob:none to only fetch file contents when they are needed.',
+)
 @click_log.simple_verbosity_option(default=u'INFO')
 def merge_branch(org,
                  repo,
@@ -64,7 +74,9 @@ def merge_branch(org,
                  target_branch,
                  fast_forward_only,
                  output_file,
-                 reference_repo):
+                 reference_repo,
+                 mirror_cache_dir,
+                 clone_filter):
     u"""
     Merges the source branch into the target branch without creating a pull request for the merge.
     Clones the repo in order to perform the proper git commands locally.
@@ -76,9 +88,16 @@ def merge_branch(org,
         target_branch (str):
         fast_forward_only (bool): If True, the branch merge will be performed as a fast-forward merge.
           If the merge cannot be performed as a fast-forward merge, the merge will fail.
+        output_file (str):
+        reference_repo (str): Path to a reference repo
+        mirror_cache_dir (str): Directory of the cached mirror to use as the reference repo
+        clone_filter (str): Partial clone filter
     """
     github_url = u'git@github.com:{}/{}.git'.format(org, repo)
-    with LocalGitAPI.clone(github_url, target_branch, reference_repo).cleanup() as local_repo:
+    with LocalGitAPI.clone(
+            github_url, target_branch, reference_repo,
+            mirror_cache_dir=mirror_cache_dir, filter_spec=clone_filter,
+    ).cleanup() as local_repo:
         merge_sha = local_repo.merge_branch(source_branch, target_branch, fast_forward_only)
         local_repo.push_branch(target_branch)
 
@@ -4,6 +4,7 @@
 Command-line script message pull requests in a range
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from os import path
 import sys
 import logging
@@ -15,7 +16,7 @@ from github.GithubException import UnknownObjectException
 # Add top-level module path to sys.path before importing tubular code.
 sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
 
-from tubular.github_api import GitHubAPI, MessageType  # pylint: disable=wrong-import-position
+from tubular.github_api import GitHubAPI, MessageType, RateLimitBudget  # pylint: disable=wrong-import-position
 
 logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 LOG = logging.getLogger(__name__)
@@ -82,6 +83,22 @@ LOG = logging.getLogger(__name__)
     help=u'Disable posting messages for testing',
     is_flag=True
 )
+@click.option(
+    u'--pr_cache', u'--pr-cache', 'pr_cache',
+    envvar=u'GITHUB_PR_CACHE',
+    help=u'Path of a SQLite file in which to cache the PRs of each commit between runs',
+)
+@click.option(
+    u'--workers',
+    help=u'Number of PRs to message at a time, pacing the calls by the rate limit reported by Github',
+    type=click.IntRange(min=1),
+    default=1,
+)
+@click.option(
+    u'--bot_comments_only', u'--bot-comments-only', 'bot_comments_only',
+    help=u'Only check the most recent comments posted by the token\'s user for duplicates',
+    is_flag=True
+)
 def message_pull_requests(org,
                           repo,
                           token,
@@ -94,7 +111,10 @@ def message_pull_requests(org,
                           message_type,
                           extra_text,
                           force,
-                          no_op):
+                          no_op,
+                          pr_cache,
+                          workers,
+                          bot_comments_only):
     u"""
     Message a range of Pull requests between the BASE and HEAD SHA specified.
 
@@ -113,6 +133,9 @@ def message_pull_requests(org,
         message_type (str): type of message to send
         extra_text (str): Extra text to be inserted in the PR message
         no_op (bool): Disable posting comments for testing
+        pr_cache (str): Path of the file caching the PRs of each commit
+        workers (int): Number of PRs to message at a time
+        bot_comments_only (bool): Only check recent comments by the token's user for duplicates
 
     Returns:
         None
@@ -130,14 +153,22 @@ def message_pull_requests(org,
         version = head_ami_tags[tag]
         _, _, head_sha = version.partition(u' ')
 
-    api = get_client(org, repo, token)
+    api = get_client(org, repo, token, pr_cache, pool_size=workers if workers > 1 else None)
     LOG.info("Github API Rate Limit: {}".format(api.get_rate_limit()))
     pull_requests = retrieve_pull_requests(api, base_sha, head_sha)
-    for pull_request in pull_requests:
-        message_pr(api, MessageType[message_type], pull_request, extra_text, force, no_op)
-
-
-def get_client(org, repo, token):
+    if workers > 1:
+        api.rate_limit_budget = RateLimitBudget(api.github_connection)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Consume the results so that an exception messaging any PR is raised.
+        list(executor.map(
+            lambda pull_request: message_pr(
+                api, MessageType[message_type], pull_request, extra_text, force, no_op, bot_comments_only
+            ),
+            pull_requests
+        ))
+
+
+def get_client(org, repo, token, pr_cache=None, pool_size=None):
     u"""
     Returns the github client, pointing at the repo specified
 
@@ -145,11 +176,13 @@ def get_client(org, repo, token):
         org (str): The github organization
         repo (str): The github repository
         token (str): The authentication token
+        pr_cache (str): Path of the file caching the PRs of each commit
+        pool_size (int): Number of connections to keep for concurrent calls
 
     Returns:
         Returns the github client object
     """
-    api = GitHubAPI(org, repo, token)
+    api = GitHubAPI(org, repo, token, pr_cache_path=pr_cache, pool_size=pool_size)
     return api
 
 
@@ -175,7 +208,7 @@ def retrieve_pull_requests(api, base_sha, head_sha):
     return pull_requests
 
 
-def message_pr(api, message_type, pull_request, extra_text, force_message, no_op):
+def message_pr(api, message_type, pull_request, extra_text, force_message, no_op, bot_comments_only=False):
     u"""
     Send a Message for a Pull request.
 
@@ -186,18 +219,21 @@ def message_pr(api, message_type, pull_request, extra_text, force_message, no_op
         message_type (obj): The message type to be sent(see above)
         pull_request (obj): The Pull request for which the message is to be sent
         extra_text (str): extra text to include in the message
+        bot_comments_only (bool): only check recent comments by the token's user for duplicates
 
     Returns:
         None
     """
-    LOG.info("Github API Rate Limit: {}".format(api.get_rate_limit()))
+    if api.rate_limit_budget is None:
+        LOG.info("Github API Rate Limit: {}".format(api.get_rate_limit()))
     if no_op:
         LOG.info(u"No-op mode: Whould have posted message type %r to %d.", message_type.name, pull_request.number)
     else:
         LOG.info(u"Posting message type %r to %d.", message_type.name, pull_request.number)
 
         try:
-            api.message_pr_with_type(pr_number=pull_request, message_type=message_type, force_message=force_message, extra_text=extra_text)
+            api.message_pr_with_type(pr_number=pull_request, message_type=message_type, force_message=force_message,
+                                     extra_text=extra_text, bot_comments_only=bot_comments_only)
         except UnknownObjectException as exc:
             LOG.error(u"message_pr_with_type args were: pr_number={0} message_type={1} force_message={2}, extra_text={3}".format(
                 pull_request, message_type, force_message, extra_text))
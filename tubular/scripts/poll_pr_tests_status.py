@@ -61,9 +61,23 @@ LOG = logging.getLogger(__name__)
     help=u"Regex defining which validation contexts to include from this status check.",
     default=None
 )
+@click.option(
+    '--use-graphql',
+    help=u"Fetch each poll's statuses and check runs with a single GraphQL query.",
+    envvar='GITHUB_USE_GRAPHQL',
+    is_flag=True,
+    default=False
+)
+@click.option(
+    '--watch',
+    help=u"Watch for status changes with conditional requests at an adaptive interval instead of polling.",
+    envvar='GITHUB_WATCH_STATUSES',
+    is_flag=True,
+    default=False
+)
 def poll_tests(
         org, repo, token, input_file, pr_number, commit_hash,
-        exclude_contexts, include_contexts,
+        exclude_contexts, include_contexts, use_graphql, watch,
 ):
     """
     Poll the combined status of a GitHub PR/commit in a repo several times.
@@ -76,7 +90,10 @@ def poll_tests(
     Else if both PR number -and- commit hash is specified, return a failure.
     Else if either PR number -or- commit hash is specified, check the tests for the specified value.
     """
-    gh_utils = GitHubAPI(org, repo, token, exclude_contexts=exclude_contexts, include_contexts=include_contexts)
+    gh_utils = GitHubAPI(
+        org, repo, token, exclude_contexts=exclude_contexts, include_contexts=include_contexts, use_graphql=use_graphql,
+        watch_statuses=watch,
+    )
 
     if not exactly_one_set((input_file, pr_number, commit_hash)):
         err_msg = \
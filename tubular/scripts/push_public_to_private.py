@@ -60,6 +60,16 @@ LOG = logging.getLogger(__name__)
     u'--reference_repo',
     help=u'Path to a public reference repo to use to speed up cloning.',
 )
+@click.option(
+    u'--mirror_cache_dir',
+    envvar=u'GIT_MIRROR_CACHE_DIR',
+    help=u'Directory in which to keep a mirror of the repo between runs, fetched incrementally and used as the '
+         u'reference repo to speed up cloning.',
+)
+@click.option(
+    u'--clone_filter',
+    help=u'Partial clone filter, e.g. blob:none to only fetch file contents when they are needed.',
+)
 @click_log.simple_verbosity_option(default=u'INFO')
 def push_public_to_private(private_org,
                            private_repo,
@@ -68,7 +78,9 @@ def push_public_to_private(private_org,
                            public_repo,
                            public_source_branch,
                            output_file,
-                           reference_repo):
+                           reference_repo,
+                           mirror_cache_dir,
+                           clone_filter):
     u"""
     Push the results of a merge of private changes to public back over to the private
     repo to keep the repo branches in-sync.
@@ -84,7 +96,10 @@ def push_public_to_private(private_org,
 
     # Clone the public repo, checking out the proper public branch.
     LOG.info('Cloning public repo %s with branch %s.', public_github_url, public_source_branch)
-    with LocalGitAPI.clone(public_github_url, public_source_branch, reference_repo).cleanup() as local_repo:
+    with LocalGitAPI.clone(
+            public_github_url, public_source_branch, reference_repo,
+            mirror_cache_dir=mirror_cache_dir, filter_spec=clone_filter,
+    ).cleanup() as local_repo:
         # Add the private repo as a remote for the public git working tree.
         local_repo.add_remote('private', private_github_url)
         try:
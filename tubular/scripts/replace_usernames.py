@@ -9,11 +9,15 @@ username in their DBs.
 
 """
 
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import ExitStack
+from itertools import islice
 from os import path
 import csv
 import io
 import sys
 import logging
+import threading
 import click
 import yaml
 
@@ -26,6 +30,14 @@ logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
 LOG = logging.getLogger(__name__)
 
 
+# File the replacement results are written to.
+RESULTS_FILENAME = 'username_replacement_results.csv'
+
+# Services whose usernames are replaced, in the order they are called.  LMS is always called first, since it makes
+# the desired usernames unique, and the other services are given the usernames LMS settled on.
+SERVICE_NAMES = ['lms', 'ecommerce', 'discovery', 'credentials', 'forums']
+
+
 def write_responses(writer, replacements, status):
     for replacement in replacements:
         original_username = list(replacement.keys())[0]
@@ -33,6 +45,141 @@ def write_responses(writer, replacements, status):
         writer.writerow([original_username, new_username, status])
 
 
+def _chunks(items, chunk_size):
+    """
+    Split the list of items into lists of at most chunk_size items, or a single list if chunk_size is 0.
+    """
+    if not chunk_size:
+        return [items]
+    return [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+
+
+def _service_replacement_method(replacement_method, semaphore, chunk_size):
+    """
+    Wrap a service's replacement method so that it sends at most chunk_size replacements per request, and only
+    sends a request while holding the given semaphore.
+    """
+    def chunked_replacement_method(username_mappings):
+        response = {'successful_replacements': [], 'failed_replacements': []}
+        for chunk in _chunks(username_mappings, chunk_size):
+            with semaphore:
+                chunk_response = replacement_method(chunk)
+            response['successful_replacements'] += chunk_response['successful_replacements']
+            response['failed_replacements'] += chunk_response['failed_replacements']
+        return response
+    return chunked_replacement_method
+
+
+def _read_ledger(ledger_file):
+    """
+    Read the chunks of CSV rows already replaced from the ledger file.
+
+    Each ledger line is "<start_row>,<row_count>,<partially_failed_count>,<failed_count>", appended once the chunk's
+    results have been written.
+
+    Returns:
+        tuple of (sorted list of (start_row, row_count) tuples, total number of failed replacements in them)
+    """
+    completed_chunks = []
+    failure_count = 0
+    if not path.exists(ledger_file):
+        return completed_chunks, failure_count
+
+    with io.open(ledger_file, 'r') as ledger:
+        for line_num, entry in enumerate(csv.reader(ledger), start=1):
+            if not entry:
+                continue
+            try:
+                start_row, row_count, partially_failed_count, failed_count = (int(value) for value in entry)
+            except ValueError:
+                click.echo('Malformed line {} in ledger file "{}": {}'.format(line_num, ledger_file, entry))
+                sys.exit(-1)
+            completed_chunks.append((start_row, row_count))
+            failure_count += partially_failed_count + failed_count
+    return sorted(completed_chunks), failure_count
+
+
+def _iter_pending_chunks(csv_reader, chunk_size, completed_chunks):
+    """
+    Lazily group the CSV rows not covered by completed_chunks into chunks of consecutive rows.
+
+    Yields:
+        tuples of (start_row, list of {current_username: desired_username} dicts), with at most chunk_size
+        mappings per chunk, or all consecutive pending rows if chunk_size is 0
+    """
+    completed = iter(completed_chunks)
+    next_completed = next(completed, None)
+    chunk_start, chunk = None, []
+    for row_num, (current_username, desired_username) in enumerate(csv_reader):
+        while next_completed and row_num >= sum(next_completed):
+            next_completed = next(completed, None)
+        if next_completed and row_num >= next_completed[0]:
+            # Already replaced in an earlier run.
+            if chunk:
+                yield chunk_start, chunk
+                chunk = []
+            continue
+        if not chunk:
+            chunk_start = row_num
+        chunk.append({current_username: desired_username})
+        if len(chunk) == chunk_size:
+            yield chunk_start, chunk
+            chunk = []
+    if chunk:
+        yield chunk_start, chunk
+
+
+def _replace_chunk(username_mappings, replacement_methods, service_executor=None):
+    """
+    Replace the usernames in one chunk of mappings in every service.
+
+    The first replacement method is LMS's.  Without a service_executor, the other services are then called in turn
+    and only the replacements which succeeded in one service are passed on to the next.  With one, the other services
+    are all called concurrently with the replacements which succeeded in LMS, and a replacement which failed in any
+    of them is partially failed.  A service which raises then partially fails every replacement sent to it, since
+    LMS has already replaced them.
+
+    Returns:
+        tuple of (successful, partially failed, fully failed) lists of replacements
+    """
+    lms_replacement_method = replacement_methods[0]
+    response = lms_replacement_method(username_mappings)
+    fully_failed_replacements = response['failed_replacements']
+    in_progress_replacements = response['successful_replacements']
+    partially_failed_replacements = []
+
+    if service_executor is None:
+        # Step through each services endpoints with the list returned from LMS.
+        # The LMS list has already verified usernames and made any duplicate
+        # usernames unique (e.g. 'matt' => 'mattf56a'). We pass successful
+        # replacements onto the next service and store all failed replacments.
+        for replacement_method in replacement_methods[1:]:
+            response = replacement_method(in_progress_replacements)
+            partially_failed_replacements += response['failed_replacements']
+            in_progress_replacements = response['successful_replacements']
+        return in_progress_replacements, partially_failed_replacements, fully_failed_replacements
+
+    futures = [
+        service_executor.submit(replacement_method, in_progress_replacements)
+        for replacement_method in replacement_methods[1:]
+    ]
+    failed_usernames = set()
+    for future in futures:
+        try:
+            failed_replacements = future.result()['failed_replacements']
+        except Exception:  # pylint: disable=broad-except
+            LOG.exception('Username replacement failed in a service after LMS')
+            failed_replacements = in_progress_replacements
+        failed_usernames.update(list(replacement.keys())[0] for replacement in failed_replacements)
+    successful_replacements = []
+    for replacement in in_progress_replacements:
+        if list(replacement.keys())[0] in failed_usernames:
+            partially_failed_replacements.append(replacement)
+        else:
+            successful_replacements.append(replacement)
+    return successful_replacements, partially_failed_replacements, fully_failed_replacements
+
+
 @click.command("replace_usernames")
 @click.option(
     '--config_file',
@@ -42,7 +189,32 @@ def write_responses(writer, replacements, status):
     '--username_replacement_csv',
     help='File in which YAML config exists that overrides all other params.'
 )
-def replace_usernames(config_file, username_replacement_csv):
+@click.option(
+    '--chunk_size',
+    type=click.IntRange(min=0),
+    default=0,
+    help='Number of CSV rows to replace together. 0 replaces them all at once.',
+    show_default=True,
+)
+@click.option(
+    '--workers',
+    type=click.IntRange(min=1),
+    default=1,
+    help=(
+        'Number of chunks to replace concurrently. With more than one, the services after LMS are also called '
+        'concurrently for each chunk, rather than in turn.'
+    ),
+    show_default=True,
+)
+@click.option(
+    '--ledger_file',
+    default=None,
+    help=(
+        'Optional file recording each chunk of rows once its results are written. Rerunning with the same ledger '
+        'skips the recorded rows and appends to the existing results file.'
+    ),
+)
+def replace_usernames(config_file, username_replacement_csv, chunk_size, workers, ledger_file):
     """
     Retrieves a JWT token as the retirement service user, then calls the LMS
     endpoint to retrieve the list of learners awaiting retirement.
@@ -56,6 +228,10 @@ def replace_usernames(config_file, username_replacement_csv):
         ecommerce: http://localhost:18130
         discovery: http://localhost:18381
         credentials: http://localhost:18150
+    max_concurrent_requests:  # Optional, per service. Defaults to --workers.
+        lms: 2
+    chunk_sizes:  # Optional, per service: most replacements sent in one request. Defaults to --chunk_size.
+        ecommerce: 100
     ```
 
     Username file example:
@@ -76,14 +252,6 @@ def replace_usernames(config_file, username_replacement_csv):
     with io.open(config_file, 'r') as config:
         config_yaml = yaml.safe_load(config)
 
-    with io.open(username_replacement_csv, 'r') as replacement_file:
-        csv_reader = csv.reader(replacement_file)
-        lms_username_mappings = [
-            {current_username: desired_username}
-            for (current_username, desired_username)
-            in csv_reader
-        ]
-
     client_id = config_yaml['client_id']
     client_secret = config_yaml['client_secret']
     lms_base_url = config_yaml['base_urls']['lms']
@@ -91,53 +259,109 @@ def replace_usernames(config_file, username_replacement_csv):
     discovery_base_url = config_yaml['base_urls']['discovery']
     credentials_base_url = config_yaml['base_urls']['credentials']
 
-    # Note that though partially_failed sounds better than completely_failed,
-    # it's actually worse since the user is not consistant across DBs.
-    # Partially failed username replacements will need to be triaged so the
-    # user isn't in a broken state
-    successful_replacements = []
-    partially_failed_replacements = []
-    fully_failed_replacements = []
+    # Number of partially and fully failed replacements, including those from earlier runs in the ledger.
+    completed_chunks, failure_count = _read_ledger(ledger_file) if ledger_file else ([], 0)
+    resuming = bool(completed_chunks)
+    if resuming:
+        click.echo('Resuming: skipping {} rows already replaced according to the ledger.'.format(
+            sum(row_count for _, row_count in completed_chunks)
+        ))
 
     lms_api = LmsApi(lms_base_url, lms_base_url, client_id, client_secret)
     ecommerce_api = EcommerceApi(lms_base_url, ecommerce_base_url, client_id, client_secret)
     discovery_api = DiscoveryApi(lms_base_url, discovery_base_url, client_id, client_secret)
     credentials_api = CredentialsApi(lms_base_url, credentials_base_url, client_id, client_secret)
 
-    # Call LMS with current and desired usernames
-    response = lms_api.replace_lms_usernames(lms_username_mappings)
-    fully_failed_replacements += response['failed_replacements']
-    in_progress_replacements = response['successful_replacements']
-
-    # Step through each services endpoints with the list returned from LMS.
-    # The LMS list has already verified usernames and made any duplicate
-    # usernames unique (e.g. 'matt' => 'mattf56a'). We pass successful
-    # replacements onto the next service and store all failed replacments.
+    # Each service's replacement method, with LMS's first, limited to that service's maximum concurrent requests
+    # and chunk size.
+    max_concurrent_requests = config_yaml.get('max_concurrent_requests') or {}
+    chunk_sizes = config_yaml.get('chunk_sizes') or {}
     replacement_methods = [
-        ecommerce_api.replace_usernames,
-        discovery_api.replace_usernames,
-        credentials_api.replace_usernames,
-        lms_api.replace_forums_usernames,
+        _service_replacement_method(
+            replacement_method,
+            threading.BoundedSemaphore(max_concurrent_requests.get(service_name, workers)),
+            chunk_sizes.get(service_name, chunk_size),
+        )
+        for service_name, replacement_method in zip(SERVICE_NAMES, [
+            lms_api.replace_lms_usernames,
+            ecommerce_api.replace_usernames,
+            discovery_api.replace_usernames,
+            credentials_api.replace_usernames,
+            lms_api.replace_forums_usernames,
+        ])
     ]
-    # Iterate through the endpoints above and if the APIs return any failures
-    # capture these in partially_failed_replacements. Only successfuly
-    # replacements will continue to be passed to the next service.
-    for replacement_method in replacement_methods:
-        response = replacement_method(in_progress_replacements)
-        partially_failed_replacements += response['failed_replacements']
-        in_progress_replacements = response['successful_replacements']
 
-    successful_replacements = in_progress_replacements
+    with ExitStack() as stack:
+        replacement_file = stack.enter_context(io.open(username_replacement_csv, 'r'))
+        write_header = not (resuming and path.exists(RESULTS_FILENAME))
+        output_file = stack.enter_context(open(RESULTS_FILENAME, 'w' if write_header else 'a', newline=''))
+        ledger = stack.enter_context(io.open(ledger_file, 'a')) if ledger_file else None
 
-    with open('username_replacement_results.csv', 'w', newline='') as output_file:
         csv_writer = csv.writer(output_file)
-        # Write header
-        csv_writer.writerow(['Original Username', 'New Username', 'Status'])
-        write_responses(csv_writer, successful_replacements, "SUCCESS")
-        write_responses(csv_writer, partially_failed_replacements, "PARTIALLY FAILED")
-        write_responses(csv_writer, fully_failed_replacements, "FAILED")
+        if write_header:
+            csv_writer.writerow(['Original Username', 'New Username', 'Status'])
+
+        def record_chunk(start_row, username_mappings, results):
+            """
+            Write the results for a chunk, then record it in the ledger.  Returns the chunk's number of failures.
+            """
+            # Note that though partially_failed sounds better than completely_failed,
+            # it's actually worse since the user is not consistant across DBs.
+            # Partially failed username replacements will need to be triaged so the
+            # user isn't in a broken state
+            successful_replacements, partially_failed_replacements, fully_failed_replacements = results
+            write_responses(csv_writer, successful_replacements, "SUCCESS")
+            write_responses(csv_writer, partially_failed_replacements, "PARTIALLY FAILED")
+            write_responses(csv_writer, fully_failed_replacements, "FAILED")
+            output_file.flush()
+            if ledger:
+                ledger.write('{},{},{},{}\n'.format(
+                    start_row, len(username_mappings), len(partially_failed_replacements),
+                    len(fully_failed_replacements)
+                ))
+                ledger.flush()
+            return len(partially_failed_replacements) + len(fully_failed_replacements)
+
+        pending_chunks = _iter_pending_chunks(csv.reader(replacement_file), chunk_size, completed_chunks)
+        if workers == 1:
+            for start_row, username_mappings in pending_chunks:
+                failure_count += record_chunk(
+                    start_row, username_mappings, _replace_chunk(username_mappings, replacement_methods)
+                )
+        else:
+            # Service calls get their own pool, so that chunks waiting on them never hold up the calls themselves.
+            chunk_executor = stack.enter_context(ThreadPoolExecutor(max_workers=workers))
+            service_executor = stack.enter_context(
+                ThreadPoolExecutor(max_workers=workers * (len(replacement_methods) - 1))
+            )
+            # Only read as many chunks ahead as the workers can be busy with.
+            in_flight = {}
+            chunk_error = None
+            while True:
+                if chunk_error is None:
+                    for start_row, username_mappings in islice(pending_chunks, 2 * workers - len(in_flight)):
+                        future = chunk_executor.submit(
+                            _replace_chunk, username_mappings, replacement_methods, service_executor
+                        )
+                        in_flight[future] = (start_row, username_mappings)
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    start_row, username_mappings = in_flight.pop(future)
+                    try:
+                        results = future.result()
+                    except Exception as exc:  # pylint: disable=broad-except
+                        # Stop starting chunks, but record the ones in flight before failing, so that a resumed
+                        # run doesn't replay their replacements.  This chunk is left out of the ledger.
+                        LOG.exception('Username replacement failed for the chunk starting at row %s', start_row)
+                        chunk_error = chunk_error or exc
+                        continue
+                    failure_count += record_chunk(start_row, username_mappings, results)
+            if chunk_error is not None:
+                raise chunk_error
 
-    if partially_failed_replacements or fully_failed_replacements:
+    if failure_count:
         sys.exit(-1)
 
 
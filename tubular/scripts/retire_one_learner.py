@@ -19,6 +19,9 @@ retirement_pipeline:
     - ['RETIRING_ENROLLMENTS', 'ENROLLMENTS_COMPLETE', 'LMS', 'retirement_unenroll']
     - ['RETIRING_LMS', 'LMS_COMPLETE', 'LMS', 'retirement_lms_retire']
     - ['RETIRING_CERTIFICATES', 'CERTIFICATES_COMPLETE', 'LMS', 'retirement_retire_certificates']
+
+With --timings_file, a JSON line with the timing and outcome of each retirement state run is appended to the file,
+for retirement_timing_report.py to aggregate.
 """
 
 import logging
@@ -42,6 +45,7 @@ from tubular.scripts.helpers import (
     _log,
     _setup_all_apis_or_exit
 )
+from tubular.utils.instrumentation import JsonLinesSink, retry_count
 
 # Return codes for various fail cases
 ERR_SETUP_FAILED = -1
@@ -150,6 +154,28 @@ def _get_ecom_segment_id(config, learner):
         FAIL_EXCEPTION(ERR_SETUP_FAILED, 'Unexpected error fetching Ecommerce tracking id!', str(exc))
 
 
+def _record_state_timing(timings_sink, user_id, state, service, method, start_time, retries, error=None):
+    """
+    Record the timing and outcome of a retirement state run with the timings sink, if there is one.
+    """
+    if timings_sink is None:
+        return
+    end_time = time()
+    timings_sink.record({
+        'type': 'retirement_state',
+        'user_id': user_id,
+        'state': state,
+        'service': service,
+        'method': method,
+        'start': start_time,
+        'end': end_time,
+        'duration_seconds': end_time - start_time,
+        'retries': retry_count() - retries,
+        'outcome': 'error' if error else 'success',
+        'error': error,
+    })
+
+
 @click.command("retire_learner")
 @click.option(
     '--username',
@@ -163,10 +189,15 @@ def _get_ecom_segment_id(config, learner):
     '--config_file',
     help='File in which YAML config exists that overrides all other params.'
 )
+@click.option(
+    '--timings_file',
+    help='File to append a JSON line to with the timing and outcome of each retirement state run.'
+)
 def retire_learner(
         username,
         user_id,
-        config_file
+        config_file,
+        timings_file
 ):
     """
     Retrieves a JWT token as the retirement service learner, then performs the retirement process as
@@ -186,7 +217,10 @@ def retire_learner(
     if config.get('fetch_ecommerce_segment_id', False):
         learner['ecommerce_segment_id'] = _get_ecom_segment_id(config, learner)
 
+    timings_sink = JsonLinesSink(timings_file) if timings_file else None
     start_state = None
+    # The start time and retry count of the state being run, while its API call is in progress.
+    running = None
     try:
         for start_state, end_state, service, method in config['retirement_pipeline']:
             # Skip anything that has already been done
@@ -200,8 +234,11 @@ def retire_learner(
 
             # This does the actual API call
             start_time = time()
+            running = (start_time, retry_count())
             response = getattr(config[service], method)(learner)
             end_time = time()
+            _record_state_timing(timings_sink, user_id, start_state, service, method, *running)
+            running = None
 
             LOG('State {} completed in {} seconds'.format(start_state, end_time - start_time))
 
@@ -219,6 +256,8 @@ def retire_learner(
         LOG('Retirement complete for learner with user ID {}'.format(user_id))
     except Exception as exc:  # pylint: disable=broad-except
         exc_msg = _get_error_str_from_exception(exc)
+        if running is not None:
+            _record_state_timing(timings_sink, user_id, start_state, service, method, *running, error=exc_msg)
 
         try:
             LOG('Error in retirement state {}: {}'.format(start_state, exc_msg))
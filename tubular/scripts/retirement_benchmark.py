@@ -0,0 +1,258 @@
+#! /usr/bin/env python3
+"""
+Command-line script to benchmark learner retirement against the local retirement simulator.
+
+Starts the simulator, queues the given number of learners in it, and retires them all by running
+retire_one_learner.py once per learner, as the retirement pipeline does, with the given number of runs at a time.
+Reports the end-to-end throughput, the per-service state timing percentiles and the simulated request counts.
+
+Each simulated service can be given a latency, error rate and rate limit, e.g.:
+
+    retirement_benchmark.py --learners 200 --workers 8 --latency braze=0.3 --error_rate braze=0.05 \
+        --rate_limit amplitude=5
+
+With --serve_only, the simulator is started with the queued learners and left running, so that
+get_learners_to_retire.py, retire_one_learner.py or the partner report can be pointed at it by hand with the
+config file written to the output directory.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from os import path
+import io
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import click
+import yaml
+
+# Add top-level module path to sys.path before importing tubular code.
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from tubular.retirement_simulator import SERVICES, RetirementSimulator, ServiceProfile
+from tubular.scripts import retire_one_learner
+from tubular.scripts.helpers import _fail, _log
+from tubular.scripts.retirement_timing_report import summarize_timings
+from tubular.utils.instrumentation import HTTP_METRICS_ENV_VAR
+
+SCRIPT_SHORTNAME = 'Retirement Benchmark'
+
+# Return codes for various fail cases
+ERR_BAD_PROFILE = -1
+ERR_RETIREMENTS_FAILED = -2
+
+LOG = partial(_log, SCRIPT_SHORTNAME)
+FAIL = partial(_fail, SCRIPT_SHORTNAME)
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+CONFIG_FILENAME = 'benchmark_config.yml'
+TIMINGS_FILENAME = 'timings.jsonl'
+HTTP_METRICS_FILENAME = 'http_metrics.jsonl'
+
+# The retirement states run for each service which can be benchmarked.  Hubspot is left out, since its deletions
+# send a real alert email with SES from retire_one_learner.py, which the simulator cannot stand in for.
+SERVICE_STATES = {
+    'lms': [
+        ['RETIRING_FORUMS', 'FORUMS_COMPLETE', 'LMS', 'retirement_retire_forum'],
+        ['RETIRING_EMAIL_LISTS', 'EMAIL_LISTS_COMPLETE', 'LMS', 'retirement_retire_mailings'],
+        ['RETIRING_ENROLLMENTS', 'ENROLLMENTS_COMPLETE', 'LMS', 'retirement_unenroll'],
+        ['RETIRING_LMS', 'LMS_COMPLETE', 'LMS', 'retirement_lms_retire'],
+    ],
+    'braze': [['RETIRING_BRAZE', 'BRAZE_COMPLETE', 'BRAZE', 'delete_user']],
+    'amplitude': [['RETIRING_AMPLITUDE', 'AMPLITUDE_COMPLETE', 'AMPLITUDE', 'delete_user']],
+    'segment': [['RETIRING_SEGMENT', 'SEGMENT_COMPLETE', 'SEGMENT', 'delete_and_suppress_learner']],
+    'salesforce_marketing_cloud': [
+        ['RETIRING_SFMC', 'SFMC_COMPLETE', 'SALESFORCE_MARKETING_CLOUD', 'delete_user'],
+    ],
+}
+DEFAULT_SERVICES = ('braze', 'amplitude', 'segment', 'salesforce_marketing_cloud')
+
+
+def _parse_service_values(option_name, values, value_type=float):
+    """
+    Parse SERVICE=VALUE option values into a dict.
+    """
+    parsed = {}
+    for value in values:
+        service, _, number = value.partition('=')
+        if service not in SERVICES:
+            FAIL(ERR_BAD_PROFILE, 'Unknown service "{}" for {}, expected one of {}'.format(
+                service, option_name, ', '.join(SERVICES)
+            ))
+        try:
+            parsed[service] = value_type(number)
+        except ValueError:
+            FAIL(ERR_BAD_PROFILE, 'Bad {} value "{}", expected SERVICE=NUMBER'.format(option_name, value))
+    return parsed
+
+
+def _service_profiles(latency, jitter, error_rate, rate_limit):
+    """
+    Build the simulator's service profiles from the parsed options.
+    """
+    return {
+        service: ServiceProfile(
+            latency_seconds=latency.get(service, 0),
+            latency_jitter_seconds=jitter.get(service, 0),
+            error_rate=error_rate.get(service, 0),
+            rate_limit=rate_limit.get(service),
+        )
+        for service in SERVICES
+    }
+
+
+def _write_config(config_file, simulator, services):
+    """
+    Write a retirement config which uses the simulator for the LMS and the given vendor services.
+    """
+    retirement_pipeline = list(SERVICE_STATES['lms'])
+    for service in services:
+        retirement_pipeline.extend(SERVICE_STATES[service])
+    config = {
+        'client_id': 'benchmark',
+        'client_secret': 'benchmark',
+        'base_urls': simulator.base_urls(),
+        'retirement_pipeline': retirement_pipeline,
+        'braze_api_key': 'benchmark',
+        'braze_instance': 'benchmark',
+        'amplitude_api_key': 'benchmark',
+        'amplitude_secret_key': 'benchmark',
+        'segment_auth_token': 'benchmark',
+        'segment_workspace_slug': 'benchmark',
+        'salesforce_marketing_cloud_client_id': 'benchmark',
+        'salesforce_marketing_cloud_secret': 'benchmark',
+        'salesforce_marketing_cloud_subdomain': 'benchmark',
+    }
+    with io.open(config_file, 'w') as config_f:
+        yaml.safe_dump(config, config_f)
+
+
+def _retire_one(learner, config_file, timings_file, env):
+    """
+    Retire a learner by running retire_one_learner.py, returning whether it succeeded.
+    """
+    process = subprocess.run(
+        [
+            sys.executable, retire_one_learner.__file__,
+            '--username', learner['original_username'],
+            '--user_id', str(learner['user']['id']),
+            '--config_file', config_file,
+            '--timings_file', timings_file,
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        env=env,
+        check=False,
+    )
+    if process.returncode != 0:
+        LOG('Retirement of learner {} failed:\n{}'.format(
+            learner['user']['id'], process.stdout.decode('utf-8', 'replace')[-2000:]
+        ))
+    return process.returncode == 0
+
+
+def _report(simulator, timings_file, elapsed, succeeded, total):
+    """
+    Log the benchmark results.
+    """
+    LOG('Retired {} of {} learners in {:.1f} seconds, {:.2f} learners per second'.format(
+        succeeded, total, elapsed, succeeded / elapsed if elapsed else 0
+    ))
+    LOG('Final learner states: {}'.format(dict(simulator.learner_states())))
+    for (service, status), count in sorted(simulator.request_counts.items(), key=str):
+        LOG('Simulated {} responses with status {}: {}'.format(service, status, count))
+
+    if path.exists(timings_file):
+        with io.open(timings_file) as timings_f:
+            timings = [json.loads(line) for line in timings_f if line.strip()]
+        if timings:
+            for service, summary in sorted(summarize_timings(timings).items()):
+                LOG('{}: {count} state runs, {errors} errors, {retries} retries, p50 {p50:.3f}s, p95 {p95:.3f}s, '
+                    'p99 {p99:.3f}s'.format(service, **summary))
+
+
+@click.command("retirement_benchmark")
+@click.option('--learners', type=int, default=50, help='Number of learners to queue and retire.')
+@click.option('--workers', type=click.IntRange(min=1), default=4, help='Number of learners to retire at a time.')
+@click.option(
+    '--service',
+    'services',
+    multiple=True,
+    type=click.Choice(sorted(set(SERVICE_STATES) - {'lms'})),
+    help='Vendor service to retire learners from, after the LMS states. Can be given more than once. Defaults to '
+         'Braze, Amplitude, Segment and Salesforce Marketing Cloud.'
+)
+@click.option('--latency', multiple=True, help='SERVICE=SECONDS latency of a simulated service.')
+@click.option('--jitter', multiple=True, help='SERVICE=SECONDS of random extra latency of a simulated service.')
+@click.option('--error_rate', multiple=True, help='SERVICE=FRACTION of requests to a simulated service which fail.')
+@click.option('--rate_limit', multiple=True, help='SERVICE=REQUESTS per second a simulated service allows.')
+@click.option('--port', type=int, default=0, help='Port to serve the simulator on. Defaults to any free port.')
+@click.option('--seed', type=int, help='Seed for the simulated latency jitter and errors.')
+@click.option(
+    '--output_dir',
+    help='Directory to write the config, state timings and HTTP metrics to. Defaults to a temporary directory.'
+)
+@click.option(
+    '--serve_only',
+    is_flag=True,
+    help='Queue the learners and serve the simulator until interrupted, instead of running the benchmark.'
+)
+def retirement_benchmark(
+        learners, workers, services, latency, jitter, error_rate, rate_limit, port, seed, output_dir, serve_only
+):
+    """
+    Retires learners from the local retirement simulator and reports the throughput.
+    """
+    profiles = _service_profiles(
+        _parse_service_values('--latency', latency),
+        _parse_service_values('--jitter', jitter),
+        _parse_service_values('--error_rate', error_rate),
+        _parse_service_values('--rate_limit', rate_limit),
+    )
+    services = services or DEFAULT_SERVICES
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    else:
+        output_dir = tempfile.mkdtemp(prefix='retirement_benchmark_')
+    config_file = path.join(output_dir, CONFIG_FILENAME)
+    timings_file = path.join(output_dir, TIMINGS_FILENAME)
+
+    with RetirementSimulator(port=port, profiles=profiles, seed=seed) as simulator:
+        queued = simulator.add_learners(learners)
+        _write_config(config_file, simulator, services)
+        LOG('Simulator serving at {} with {} learners queued, config written to {}'.format(
+            simulator.url, learners, config_file
+        ))
+
+        if serve_only:
+            try:
+                while True:
+                    time.sleep(60)
+            except KeyboardInterrupt:
+                return
+
+        env = dict(os.environ)
+        env[HTTP_METRICS_ENV_VAR] = 'jsonl:' + path.join(output_dir, HTTP_METRICS_FILENAME)
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(lambda learner: _retire_one(learner, config_file, timings_file, env), queued))
+        elapsed = time.monotonic() - start
+
+        succeeded = sum(results)
+        _report(simulator, timings_file, elapsed, succeeded, len(queued))
+
+    LOG('State timings and HTTP metrics written to {}'.format(output_dir))
+    if succeeded < len(queued):
+        FAIL(ERR_RETIREMENTS_FAILED, '{} retirements failed'.format(len(queued) - succeeded))
+
+
+if __name__ == '__main__':
+    # pylint: disable=no-value-for-parameter
+    retirement_benchmark()
@@ -5,7 +5,9 @@
 Command-line script to drive the partner reporting part of the retirement process
 """
 
-from collections import defaultdict, OrderedDict
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import date, datetime, timedelta
 from dateutil.parser import parse
 from functools import partial
@@ -13,6 +15,8 @@ import logging
 import os
 from pytz import UTC
 import sys
+import tempfile
+import threading
 import unicodedata
 import unicodecsv as csv
 
@@ -84,37 +88,123 @@ ORGS_CONFIG_KEY = 'orgs_config'
 ORGS_CONFIG_ORG_KEY = 'org'
 ORGS_CONFIG_FIELD_HEADINGS_KEY = 'field_headings'
 ORGS_CONFIG_LEARNERS_KEY = 'learners'
+# Config key under which partner folder permissions are kept once listed, for the rest of the run.
+FOLDER_PERMISSIONS_KEY = 'partner_folder_permissions'
 
 # Default field headings for the CSV file
 DEFAULT_FIELD_HEADINGS = ['user_id', 'original_username', 'original_email', 'original_name', 'deletion_completed']
 
+# Upper bound on concurrent partner uploads. Drive throttles writes per user well before this many
+# parallel requests would help, so larger --workers values are clamped to it.
+MAX_DRIVE_UPLOAD_WORKERS = 8
 
-def _check_all_learner_orgs_or_exit(config, learners):
+# In-memory reports are kept in RAM up to this many bytes, after which they spill to a temporary file.
+IN_MEMORY_REPORT_MAX_BYTES = 32 * 1024 * 1024
+
+# A generated report which was never written to output_dir: the Drive filename and a buffer holding the CSV.
+InMemoryReport = namedtuple('InMemoryReport', ['filename', 'stream'])
+
+
+def _run_for_partners(partner_func, partners, workers):
+    """
+    Call partner_func(partner) for every partner, using up to `workers` threads.
+
+    With a single worker the partners are handled one at a time, stopping at the first one that raises.
+    Otherwise every partner is handled, whether or not others raise.
+
+    Returns a tuple of two dicts: {partner: result} for partners that succeeded and
+    {partner: exception} for partners that raised, the latter in the order of `partners`.
+    """
+    results = {}
+    errors = {}
+
+    def _call(partner):
+        try:
+            results[partner] = partner_func(partner)
+        except Exception as exc:  # pylint: disable=broad-except
+            errors[partner] = exc
+
+    if workers <= 1:
+        for partner in partners:
+            _call(partner)
+            if partner in errors:
+                break
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Consume the iterator so every call finishes before the executor shuts down.
+            list(executor.map(_call, partners))
+
+    return results, {partner: errors[partner] for partner in partners if partner in errors}
+
+
+def _log_partner_summary(action, results, errors):
+    """
+    Log one line per partner describing the outcome of a per-partner step.
+    """
+    LOG('{} summary: {} succeeded, {} failed.'.format(action, len(results), len(errors)))
+    for partner in sorted(results):
+        LOG('  {}: OK ({})'.format(partner, results[partner]))
+    for partner in sorted(errors):
+        LOG('  {}: FAILED ({})'.format(partner, errors[partner]))
+
+
+def _iter_learner_orgs(learner):
     """
-    Checks all learners and their orgs, ensuring that each org has a mapping to a partner Drive folder.
-    If any orgs are missing a mapping, fails after printing the mismatched orgs.
+    Yield (org name, field headings) for every org that should be notified about this learner.
     """
-    # Loop through all learner orgs, checking for their mappings.
+    # Orgs with standard fields
+    for org_name in learner.get(ORGS_KEY, ()):
+        yield org_name, DEFAULT_FIELD_HEADINGS
+
+    # Orgs with custom configurations (orgs with custom fields)
+    for org_config in learner.get(ORGS_CONFIG_KEY, ()):
+        yield org_config[ORGS_CONFIG_ORG_KEY], org_config[ORGS_CONFIG_FIELD_HEADINGS_KEY]
+
+
+def _group_learners_by_partner_or_exit(config, learners):
+    """
+    Group the learners into a dict of {partner name: {field headings, learners}} in a single pass.
+
+    Each org is checked for a mapping to a partner Drive folder along the way. If any orgs are missing a mapping,
+    fails after printing the mismatched orgs.
+
+    Learners can appear in more than one partner. Partners hold references to the learner dicts returned
+    from the LMS rather than copies. It is assumed that each partner has 1 and only 1 set of field headings,
+    the first one seen wins.
+    """
+    org_partner_mapping = config['org_partner_mapping']
+    partners = {}
     mismatched_orgs = set()
+
     for learner in learners:
-        # Check the orgs with standard fields
-        if ORGS_KEY in learner:
-            for org in learner[ORGS_KEY]:
-                if org not in config['org_partner_mapping']:
-                    mismatched_orgs.add(org)
-
-        # Check the orgs with custom configurations (orgs with custom fields)
-        if ORGS_CONFIG_KEY in learner:
-            for org_config in learner[ORGS_CONFIG_KEY]:
-                org_name = org_config[ORGS_CONFIG_ORG_KEY]
-                if org_name not in config['org_partner_mapping']:
-                    mismatched_orgs.add(org_name)
+        # Use the datetime upon which the record was 'created' in the partner reporting queue
+        # as the approximate time upon which user retirement was completed ('deletion_completed')
+        # for the record's user.
+        learner['deletion_completed'] = learner[LEARNER_CREATED_KEY]
+
+        for org_name, org_headings in _iter_learner_orgs(learner):
+            reporting_partner_names = org_partner_mapping.get(org_name)
+            if reporting_partner_names is None:
+                mismatched_orgs.add(org_name)
+                continue
+
+            for partner_name in reporting_partner_names:
+                partner = partners.get(partner_name)
+                if partner is None:
+                    partner = partners[partner_name] = {
+                        ORGS_CONFIG_FIELD_HEADINGS_KEY: org_headings,
+                        ORGS_CONFIG_LEARNERS_KEY: []
+                    }
+                partner[ORGS_CONFIG_LEARNERS_KEY].append(learner)
+
     if mismatched_orgs:
         FAIL(
             ERR_UNKNOWN_ORG,
             'Partners for organizations {} do not exist in configuration.'.format(text_type(mismatched_orgs))
         )
 
+    return partners
+
 
 def _get_orgs_and_learners_or_exit(config):
     """
@@ -127,80 +217,64 @@ def _get_orgs_and_learners_or_exit(config):
         learners = config['LMS'].retirement_partner_report()
         LOG('Retrieved {} learners from the LMS.'.format(len(learners)))
 
-        _check_all_learner_orgs_or_exit(config, learners)
-
-        orgs = defaultdict()
-        usernames = []
-
-        # Organize the learners, create separate dicts per partner, making sure each partner is in the mapping.
-        # Learners can appear in more than one dict. It is assumed that each org has 1 and only 1 set of field headings.
-        for learner in learners:
-            usernames.append({'original_username': learner[LEARNER_ORIGINAL_USERNAME_KEY]})
-
-            # Use the datetime upon which the record was 'created' in the partner reporting queue
-            # as the approximate time upon which user retirement was completed ('deletion_completed')
-            # for the record's user.
-            learner['deletion_completed'] = learner[LEARNER_CREATED_KEY]
-
-            # Create a list of orgs who should be notified about this user
-            if ORGS_KEY in learner:
-                for org_name in learner[ORGS_KEY]:
-                    reporting_org_names = config['org_partner_mapping'][org_name]
-                    _add_reporting_org(orgs, reporting_org_names, DEFAULT_FIELD_HEADINGS, learner)
-
-            # Check for orgs with custom fields
-            if ORGS_CONFIG_KEY in learner:
-                for org_config in learner[ORGS_CONFIG_KEY]:
-                    org_name = org_config[ORGS_CONFIG_ORG_KEY]
-                    org_headings = org_config[ORGS_CONFIG_FIELD_HEADINGS_KEY]
-                    reporting_org_names = config['org_partner_mapping'][org_name]
-                    _add_reporting_org(orgs, reporting_org_names, org_headings, learner)
+        orgs = _group_learners_by_partner_or_exit(config, learners)
+        usernames = [{'original_username': learner[LEARNER_ORIGINAL_USERNAME_KEY]} for learner in learners]
 
         return orgs, usernames
     except Exception as exc:  # pylint: disable=broad-except
         FAIL_EXCEPTION(ERR_FETCHING_LEARNERS, 'Unexpected exception occurred!', exc)
 
 
-def _add_reporting_org(orgs, org_names, org_headings, learner):
+def _generate_report_files_or_exit(config, report_data, output_dir, workers=1):
     """
-    Add the learner to the org
+    Spins through the partners, creating a single CSV file for each
+
+    If output_dir is None the reports are built as InMemoryReports instead of files on disk.
     """
-    for org_name in org_names:
-        # Create the org, if necessary
-        orgs[org_name] = orgs.get(
-            org_name,
-            {
-                ORGS_CONFIG_FIELD_HEADINGS_KEY: org_headings,
-                ORGS_CONFIG_LEARNERS_KEY: []
-            }
+    # All of the partner files are generated before any are pushed to Google, so we can be sure they
+    # all generated successfully, minimizing the cases where we might have to overwrite files already up there.
+    def _generate(partner_name):
+        partner = report_data[partner_name]
+        field_headings = partner[ORGS_CONFIG_FIELD_HEADINGS_KEY]
+        field_values = partner[ORGS_CONFIG_LEARNERS_KEY]
+        if output_dir:
+            report = _generate_report_file_or_exit(config, output_dir, partner_name, field_headings, field_values)
+        else:
+            report = _generate_report_buffer(config, partner_name, field_headings, field_values)
+        LOG('Report complete for partner {}'.format(partner_name))
+        return report
+
+    partner_filenames, errors = _run_for_partners(_generate, list(report_data), workers)
+
+    if workers > 1:
+        _log_partner_summary('Report generation', partner_filenames, errors)
+
+    if errors:
+        _close_reports(partner_filenames.values())
+        partner_name = next(iter(errors))
+        FAIL_EXCEPTION(
+            ERR_REPORTING, 'Error reporting retirement for partner {}'.format(partner_name), errors[partner_name]
         )
 
-        # Add the learner to the list of learners in the org
-        orgs[org_name][ORGS_CONFIG_LEARNERS_KEY].append(learner)
+    return partner_filenames
 
 
-def _generate_report_files_or_exit(config, report_data, output_dir):
+def _report_filename(config, partner):
     """
-    Spins through the partners, creating a single CSV file for each
+    Return the filename to use for a partner's report generated today.
     """
-    # We'll store all of the partner to file links here so we can be sure all files generated successfully
-    # before trying to push to Google, minimizing the cases where we might have to overwrite files
-    # already up there.
-    partner_filenames = {}
+    return '{}_{}_{}_{}.csv'.format(
+        REPORTING_FILENAME_PREFIX, config['partner_report_platform_name'], partner, date.today().isoformat()
+    )
 
-    for partner_name in report_data:
-        try:
-            partner = report_data[partner_name]
-            partner_headings = partner[ORGS_CONFIG_FIELD_HEADINGS_KEY]
-            partner_learners = partner[ORGS_CONFIG_LEARNERS_KEY]
-            outfile = _generate_report_file_or_exit(config, output_dir, partner_name, partner_headings,
-                                                    partner_learners)
-            partner_filenames[partner_name] = outfile
-            LOG('Report complete for partner {}'.format(partner_name))
-        except Exception as exc:  # pylint: disable=broad-except
-            FAIL_EXCEPTION(ERR_REPORTING, 'Error reporting retirement for partner {}'.format(partner_name), exc)
 
-    return partner_filenames
+def _write_report_csv(f, field_headings, field_values):
+    """
+    Write the CSV report rows to the binary file-like object f.
+    """
+    writer = csv.DictWriter(f, field_headings, dialect=csv.excel, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(field_values)
 
 
 def _generate_report_file_or_exit(config, output_dir, partner, field_headings, field_values):
@@ -213,9 +287,7 @@ def _generate_report_file_or_exit(config, output_dir, partner, field_headings, f
         field_headings
     ))
 
-    outfile = os.path.join(output_dir, '{}_{}_{}_{}.csv'.format(
-        REPORTING_FILENAME_PREFIX, config['partner_report_platform_name'], partner, date.today().isoformat()
-    ))
+    outfile = os.path.join(output_dir, _report_filename(config, partner))
 
     # If there is already a file for this date, assume it is bad and replace it
     try:
@@ -224,20 +296,62 @@ def _generate_report_file_or_exit(config, output_dir, partner, field_headings, f
         pass
 
     with open(outfile, 'wb') as f:
-        writer = csv.DictWriter(f, field_headings, dialect=csv.excel, extrasaction='ignore')
-        writer.writeheader()
-        writer.writerows(field_values)
+        _write_report_csv(f, field_headings, field_values)
 
     return outfile
 
 
+def _generate_report_buffer(config, partner, field_headings, field_values):
+    """
+    Create the partner's CSV report in memory, spilling to a temporary file only if it grows too large.
+    """
+    LOG('Starting in-memory report for partner {}: {} learners to add. Field headings are {}'.format(
+        partner,
+        len(field_values),
+        field_headings
+    ))
+
+    stream = tempfile.SpooledTemporaryFile(max_size=IN_MEMORY_REPORT_MAX_BYTES)  # pylint: disable=consider-using-with
+    try:
+        _write_report_csv(stream, field_headings, field_values)
+    except Exception:
+        stream.close()
+        raise
+    stream.seek(0)
+    return InMemoryReport(_report_filename(config, partner), stream)
+
+
+def _close_reports(reports):
+    """
+    Close the buffers of any InMemoryReports among the reports, when they won't be uploaded.
+    """
+    for report in reports:
+        if isinstance(report, InMemoryReport):
+            report.stream.close()
+
+
+@contextmanager
+def _open_report(report):
+    """
+    Yield the Drive filename and a readable binary stream for a generated report, closing it afterwards.
+
+    The report is either the path to a file in output_dir or an InMemoryReport.
+    """
+    if isinstance(report, InMemoryReport):
+        with report.stream as f:
+            yield report.filename, f
+    else:
+        with open(report, 'rb') as f:
+            yield os.path.basename(report), f
+
+
 def _config_drive_folder_map_or_exit(config):
     """
     Lists folders under our top level parent for this environment and returns
     a dict of {partner name: folder id}. Partner names should match the values
     in config['org_partner_mapping']
     """
-    drive = DriveApi(config['google_secrets_file'])
+    drive = DriveApi(config['google_secrets_file'], cache_file=config.get('drive_metadata_cache_file'))
 
     try:
         LOG('Attempting to find all partner sub-directories on Drive.')
@@ -260,7 +374,7 @@ def _config_drive_folder_map_or_exit(config):
         config['partner_folder_mapping'][folder['name']] = folder['id']
 
 
-def _push_files_to_google(config, partner_filenames):
+def _push_files_to_google(config, partner_filenames, workers=1):
     """
     Copy the file to Google drive for this partner
 
@@ -274,22 +388,34 @@ def _push_files_to_google(config, partner_filenames):
             failed_partners.append(partner)
 
     if failed_partners:
+        _close_reports(partner_filenames.values())
         FAIL(ERR_BAD_CONFIG, 'These partners have retiring learners, but no Drive folder: {}'.format(failed_partners))
 
-    file_ids = {}
-    drive = DriveApi(config['google_secrets_file'])
-    for partner in partner_filenames:
+    # The Drive client is not thread-safe, so each worker thread builds and reuses its own.
+    thread_local = threading.local()
+
+    def _upload(partner):
+        if not hasattr(thread_local, 'drive'):
+            thread_local.drive = DriveApi(config['google_secrets_file'])
         # This is populated on the fly in _config_drive_folder_map_or_exit
         folder_id = config['partner_folder_mapping'][partner]
-        file_id = None
-        with open(partner_filenames[partner], 'rb') as f:
-            try:
-                drive_filename = os.path.basename(partner_filenames[partner])
-                LOG('Attempting to upload {} to {} Drive folder.'.format(drive_filename, partner))
-                file_id = drive.create_file_in_folder(folder_id, drive_filename, f, "text/csv")
-            except Exception as exc:  # pylint: disable=broad-except
-                FAIL_EXCEPTION(ERR_DRIVE_UPLOAD, 'Drive upload failed for: {}'.format(drive_filename), exc)
-        file_ids[partner] = file_id
+        with _open_report(partner_filenames[partner]) as (drive_filename, f):
+            LOG('Attempting to upload {} to {} Drive folder.'.format(drive_filename, partner))
+            return thread_local.drive.create_file_in_folder(folder_id, drive_filename, f, "text/csv")
+
+    file_ids, errors = _run_for_partners(_upload, list(partner_filenames), workers)
+
+    if workers > 1:
+        _log_partner_summary('Drive upload', file_ids, errors)
+
+    if errors:
+        # Uploaded reports are already closed, but those after the first failure with one worker are not.
+        _close_reports(partner_filenames.values())
+        partner = next(iter(errors))
+        report = partner_filenames[partner]
+        drive_filename = report.filename if isinstance(report, InMemoryReport) else os.path.basename(report)
+        FAIL_EXCEPTION(ERR_DRIVE_UPLOAD, 'Drive upload failed for: {}'.format(drive_filename), errors[partner])
+
     return file_ids
 
 
@@ -315,32 +441,53 @@ def _get_partner_emails(drive, config, partners=None):
     
     # Get unique folder IDs for the specified partners
     folder_ids = {config['partner_folder_mapping'][partner] for partner in partners}
-    
-    partner_folders_to_permissions = drive.list_permissions_for_files(
-        folder_ids,
-        fields='emailAddress',
-    )
+
+    partner_folders_to_permissions = _get_folder_permissions(drive, config, folder_ids)
     # Create a mapping of partners to a list of permissions dicts
     permissions = {
         partner: partner_folders_to_permissions[config['partner_folder_mapping'][partner]]
         for partner in partners
     }
     # Filter out denied addresses and flatten to just email addresses
+    is_denied = _denied_email_matcher(config['denied_notification_domains'])
     external_emails = {
-        partner: [
-            perm['emailAddress']
-            for perm in permissions[partner]
-            if not any(
-                perm['emailAddress'].lower().endswith(denied_domain.lower())
-                for denied_domain in config['denied_notification_domains']
-            )
-        ]
+        partner: [perm['emailAddress'] for perm in permissions[partner] if not is_denied(perm['emailAddress'])]
         for partner in permissions
     }
     
     return external_emails
 
 
+def _get_folder_permissions(drive, config, folder_ids):
+    """
+    Return the permissions of the given partner folders, listing each folder's permissions only once per run.
+
+    The listed permissions are kept in the config under FOLDER_PERMISSIONS_KEY, so that the upload notifications and
+    the expiring file warnings share them.
+
+    Args:
+        drive (DriveApi): Initialized Drive API client.
+        config (dict): Configuration dictionary for this run.
+        folder_ids (set): IDs of the partner folders.
+
+    Returns:
+        dict: Mapping of folder IDs to lists of permissions dicts.
+    """
+    folder_permissions = config.setdefault(FOLDER_PERMISSIONS_KEY, {})
+    unlisted_folder_ids = sorted(folder_id for folder_id in folder_ids if folder_id not in folder_permissions)
+    if unlisted_folder_ids:
+        folder_permissions.update(drive.list_permissions_for_files(unlisted_folder_ids, fields='emailAddress'))
+    return {folder_id: folder_permissions[folder_id] for folder_id in folder_ids}
+
+
+def _denied_email_matcher(denied_domains):
+    """
+    Return a function which checks whether an email address ends with one of the denied domains, ignoring case.
+    """
+    denied_suffixes = tuple(domain.lower() for domain in denied_domains)
+    return lambda email: email.lower().endswith(denied_suffixes)
+
+
 def _add_comments_to_files(config, partner_file_ids_dict):
     """
     Add comments to the uploaded csv files, triggering email notification.
@@ -423,22 +570,28 @@ def _check_and_notify_about_expiring_files(config, enable_overdue_file_notificat
     ))
     
     try:
-        drive = DriveApi(config['google_secrets_file'])
+        drive = DriveApi(config['google_secrets_file'], cache_file=config.get('drive_metadata_cache_file'))
         now = datetime.now(UTC)
         warning_threshold = now - timedelta(days=(retention_days - warning_days))
-        
+
         # Get external emails per partner using shared helper
         external_emails = _get_partner_emails(drive, config)
-        
+
+        # First gather the files old enough to need a warning across every partner, so that their existing
+        # comments can be listed in batches rather than one request per file.
+        # Mapping of partner to a list of (file_info, file_created) tuples.
+        candidates = OrderedDict()
+        # A file shared into more than one partner folder is only warned about for the first partner.
+        candidate_file_ids = set()
         for partner in config['partner_folder_mapping']:
             folder_id = config['partner_folder_mapping'][partner]
-            
+
             # Skip if no external POC (unless exempt)
             if not external_emails[partner]:
                 if partner not in config.get('exempted_partners', []):
                     LOG('WARNING: Partner "{}" has no POC for deletion warnings'.format(partner))
                 continue
-            
+
             try:
                 files = drive.walk_files(
                     folder_id,
@@ -446,14 +599,11 @@ def _check_and_notify_about_expiring_files(config, enable_overdue_file_notificat
                     recurse=False
                 )
 
-                pending_comments = []
-
+                partner_candidates = []
                 for file_info in files:
-                    filename = file_info.get('name', '')
-
                     created_time_str = file_info.get('createdTime')
                     if not created_time_str:
-                        LOG('WARNING: File {} has no creation time, skipping'.format(filename))
+                        LOG('WARNING: File {} has no creation time, skipping'.format(file_info.get('name', '')))
                         continue
 
                     file_created = parse(created_time_str)
@@ -463,69 +613,117 @@ def _check_and_notify_about_expiring_files(config, enable_overdue_file_notificat
                         file_created = file_created.astimezone(UTC)
 
                     if file_created <= warning_threshold:
-                        file_id = file_info.get('id')
-
-                        # First check if the file already has the deletion warning to avoid
-                        # duplicate comments on re-run.
-                        existing_comments = drive.list_comments_for_file(file_id, fields='content')
-                        has_warning = any(
-                            DELETION_WARNING_PHRASE in comment.get('content', '')
-                            for comment in existing_comments
-                        )
-
-                        if has_warning:
-                            LOG('File {} already has deletion warning, skipping'.format(filename))
-                            continue
-
-                        deletion_datetime = file_created + timedelta(days=retention_days)
-                        # Use total_seconds-based math to avoid .days flooring off-by-one
-                        seconds_until_deletion = (deletion_datetime - now).total_seconds()
-                        days_until_deletion = int(seconds_until_deletion / 86400)
-                        # deletion_datetime is already UTC; format as a UTC date
-                        deletion_date = deletion_datetime.strftime('%Y-%m-%d')
-
-                        if days_until_deletion <= 0:
-                            if enable_overdue_file_notification:
-                                LOG('File {} is past its retention period, queuing overdue notification'.format(filename))
-                                tag_string = ' '.join('+' + email for email in external_emails[partner])
-                                overdue_deletion_date = (now + timedelta(days=warning_days)).strftime('%Y-%m-%d')
-                                comment_content = DELETION_WARNING_MESSAGE_TEMPLATE.format(
-                                    tags=tag_string,
-                                    filename=filename,
-                                    days_until_deletion=warning_days,
-                                    deletion_date=overdue_deletion_date,
-                                )
-                                pending_comments.append((file_id, comment_content))
-                                LOG('Queuing overdue file notification for: {}'.format(filename))
-                            continue
-
-                        if days_until_deletion > warning_days:
-                            # File is older than warning_threshold but not yet in the warning window;
-                            # this shouldn't normally happen but guard against clock skew or config changes.
-                            LOG('File {} has {} days until deletion, outside warning window, skipping'.format(
-                                filename, days_until_deletion
+                        if file_info.get('id') in candidate_file_ids:
+                            LOG('File {} is also in another partner\'s folder, skipping for partner "{}"'.format(
+                                file_info.get('name', ''), partner
                             ))
                             continue
+                        candidate_file_ids.add(file_info.get('id'))
+                        partner_candidates.append((file_info, file_created))
+            except Exception as exc:  # pylint: disable=broad-except
+                LOG('WARNING: Error checking files for partner "{}": {}'.format(partner, exc))
+                continue
 
-                        tag_string = ' '.join('+' + email for email in external_emails[partner])
+            if partner_candidates:
+                candidates[partner] = partner_candidates
+
+        if not candidates:
+            return
+
+        def _pending_warnings(partner, partner_candidates, existing_comments):
+            """
+            Return the (file_id, comment content) deletion warnings still to be sent for a partner's files.
+            """
+            pending_comments = []
+            for file_info, file_created in partner_candidates:
+                file_id = file_info.get('id')
+                filename = file_info.get('name', '')
+
+                # Check whether the file already has the deletion warning to avoid duplicate comments on re-run.
+                has_warning = any(
+                    DELETION_WARNING_PHRASE in comment.get('content', '')
+                    for comment in existing_comments[file_id]
+                )
+                if has_warning:
+                    LOG('File {} already has deletion warning, skipping'.format(filename))
+                    continue
+
+                deletion_datetime = file_created + timedelta(days=retention_days)
+                # Use total_seconds-based math to avoid .days flooring off-by-one
+                seconds_until_deletion = (deletion_datetime - now).total_seconds()
+                days_until_deletion = int(seconds_until_deletion / 86400)
+                # deletion_datetime is already UTC; format as a UTC date
+                deletion_date = deletion_datetime.strftime('%Y-%m-%d')
+                tag_string = ' '.join('+' + email for email in external_emails[partner])
+
+                if days_until_deletion <= 0:
+                    if enable_overdue_file_notification:
+                        LOG('File {} is past its retention period, queuing overdue notification'.format(filename))
+                        overdue_deletion_date = (now + timedelta(days=warning_days)).strftime('%Y-%m-%d')
                         comment_content = DELETION_WARNING_MESSAGE_TEMPLATE.format(
                             tags=tag_string,
                             filename=filename,
-                            days_until_deletion=days_until_deletion,
-                            deletion_date=deletion_date
+                            days_until_deletion=warning_days,
+                            deletion_date=overdue_deletion_date,
                         )
                         pending_comments.append((file_id, comment_content))
-                        LOG('Queuing deletion warning for file: {} ({} days until deletion)'.format(
-                            filename, days_until_deletion
-                        ))
+                        LOG('Queuing overdue file notification for: {}'.format(filename))
+                    continue
+
+                if days_until_deletion > warning_days:
+                    # File is older than warning_threshold but not yet in the warning window;
+                    # this shouldn't normally happen but guard against clock skew or config changes.
+                    LOG('File {} has {} days until deletion, outside warning window, skipping'.format(
+                        filename, days_until_deletion
+                    ))
+                    continue
+
+                comment_content = DELETION_WARNING_MESSAGE_TEMPLATE.format(
+                    tags=tag_string,
+                    filename=filename,
+                    days_until_deletion=days_until_deletion,
+                    deletion_date=deletion_date
+                )
+                pending_comments.append((file_id, comment_content))
+                LOG('Queuing deletion warning for file: {} ({} days until deletion)'.format(
+                    filename, days_until_deletion
+                ))
+            return pending_comments
 
-                if pending_comments:
-                    drive.create_comments_for_files(pending_comments)
-                    LOG('Sent {} deletion warning(s) for partner "{}"'.format(len(pending_comments), partner))
+        try:
+            file_ids = [
+                file_info.get('id') for partner_candidates in candidates.values() for file_info, _ in partner_candidates
+            ]
+            existing_comments = drive.list_comments_for_files(file_ids, fields='content')
+            pending_by_partner = OrderedDict(
+                (partner, _pending_warnings(partner, partner_candidates, existing_comments))
+                for partner, partner_candidates in candidates.items()
+            )
+            pending_comments = [comment for comments in pending_by_partner.values() for comment in comments]
+            if pending_comments:
+                drive.create_comments_for_files(pending_comments)
+            for partner, partner_pending in pending_by_partner.items():
+                if partner_pending:
+                    LOG('Sent {} deletion warning(s) for partner "{}"'.format(len(partner_pending), partner))
+        except Exception as exc:  # pylint: disable=broad-except
+            # Fall back to one partner at a time, so an error only costs the partner it belongs to.  The comments are
+            # listed again first, so that files warned before the batch failed are not warned twice.
+            LOG('WARNING: Error sending deletion warnings for all partners at once: {}. Retrying per partner.'.format(
+                exc
+            ))
+            for partner, partner_candidates in candidates.items():
+                try:
+                    existing_comments = drive.list_comments_for_files(
+                        [file_info.get('id') for file_info, _ in partner_candidates],
+                        fields='content'
+                    )
+                    partner_pending = _pending_warnings(partner, partner_candidates, existing_comments)
+                    if partner_pending:
+                        drive.create_comments_for_files(partner_pending)
+                        LOG('Sent {} deletion warning(s) for partner "{}"'.format(len(partner_pending), partner))
+                except Exception as partner_exc:  # pylint: disable=broad-except
+                    LOG('WARNING: Error sending deletion warnings for partner "{}": {}'.format(partner, partner_exc))
 
-            except Exception as exc:  # pylint: disable=broad-except
-                LOG('WARNING: Error checking files for partner "{}": {}'.format(partner, exc))
-                
     except Exception as exc:  # pylint: disable=broad-except
         LOG('WARNING: Error in deletion warning check: {}. Continuing with report generation.'.format(exc))
 
@@ -543,6 +741,16 @@ def _check_and_notify_about_expiring_files(config, enable_overdue_file_notificat
     '--output_dir',
     help='The local directory that the script will write the reports to.'
 )
+@click.option(
+    '--in_memory',
+    is_flag=True,
+    help=(
+        'Build the reports in memory and stream them directly to Drive instead of writing them to output_dir, '
+        'which is then not required. Reports larger than {} MB spill to a temporary file.'.format(
+            IN_MEMORY_REPORT_MAX_BYTES // (1024 * 1024)
+        )
+    ),
+)
 @click.option(
     '--comments/--no_comments',
     default=True,
@@ -580,7 +788,28 @@ def _check_and_notify_about_expiring_files(config, enable_overdue_file_notificat
     ),
     show_default=True,
 )
-def generate_report(config_file, google_secrets_file, output_dir, comments, age_in_days, deletion_warning_days, enable_check_expiring_files, enable_overdue_file_notification):
+@click.option(
+    '--drive_cache_file',
+    default=None,
+    help=(
+        'Optional path to a local cache of Drive folder listings, kept between runs. Partner folders are then '
+        'only re-listed where the Drive changes feed shows something changed (overrides config file value).'
+    ),
+)
+@click.option(
+    '--workers',
+    type=click.IntRange(min=1),
+    default=1,
+    help=(
+        'Number of partner reports to write and upload to Drive concurrently. Values above {0} are '
+        'reduced to {0} to stay within Drive write quotas.'.format(MAX_DRIVE_UPLOAD_WORKERS)
+    ),
+    show_default=True,
+)
+def generate_report(
+        config_file, google_secrets_file, output_dir, in_memory, comments, age_in_days, deletion_warning_days,
+        enable_check_expiring_files, enable_overdue_file_notification, drive_cache_file, workers
+):
     """
     Retrieves a JWT token as the retirement service learner, then performs the reporting process as that user.
 
@@ -601,7 +830,9 @@ def generate_report(config_file, google_secrets_file, output_dir, comments, age_
             FAIL(ERR_NO_SECRETS, 'No secrets file passed in.')
 
         # The Jenkins DSL is supposed to create this path for us
-        if not output_dir or not os.path.exists(output_dir):
+        if in_memory:
+            output_dir = None
+        elif not output_dir or not os.path.exists(output_dir):
             FAIL(ERR_NO_OUTPUT_DIR, 'No output_dir passed in or path does not exist.')
 
         config = CONFIG_WITH_DRIVE_OR_EXIT(config_file, google_secrets_file)
@@ -611,6 +842,8 @@ def generate_report(config_file, google_secrets_file, output_dir, comments, age_
             config['age_in_days'] = age_in_days
         if deletion_warning_days is not None:
             config['deletion_warning_days'] = deletion_warning_days
+        if drive_cache_file is not None:
+            config['drive_metadata_cache_file'] = drive_cache_file
         
         SETUP_LMS_OR_EXIT(config)
         _config_drive_folder_map_or_exit(config)
@@ -622,10 +855,11 @@ def generate_report(config_file, google_secrets_file, output_dir, comments, age_
         report_data, all_usernames = _get_orgs_and_learners_or_exit(config)
         # If no usernames were returned, then no reports need to be generated.
         if all_usernames:
-            partner_filenames = _generate_report_files_or_exit(config, report_data, output_dir)
+            workers = min(workers, MAX_DRIVE_UPLOAD_WORKERS)
+            partner_filenames = _generate_report_files_or_exit(config, report_data, output_dir, workers)
 
             # All files generated successfully, now push them to Google
-            report_file_ids = _push_files_to_google(config, partner_filenames)
+            report_file_ids = _push_files_to_google(config, partner_filenames, workers)
 
             if comments:
                 # All files uploaded successfully, now add comments to them to trigger notifications
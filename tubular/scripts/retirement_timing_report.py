@@ -0,0 +1,155 @@
+#! /usr/bin/env python3
+"""
+Command-line script to summarize the retirement state timings written by retire_one_learner.py --timings_file
+
+For each service (or retirement state), reports the number of state runs, errors and retries, the p50/p95/p99 and
+total duration, and for the whole batch the number of learners and the learners retired per hour.
+"""
+
+from collections import defaultdict
+from functools import partial
+from os import path
+import csv
+import json
+import logging
+import math
+import sys
+
+import click
+
+# Add top-level module path to sys.path before importing tubular code.
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from tubular.scripts.helpers import _fail, _fail_exception, _log
+
+SCRIPT_SHORTNAME = 'Retirement Timings'
+
+# Return codes for various fail cases
+ERR_READING_TIMINGS = -1
+ERR_NO_TIMINGS = -2
+
+LOG = partial(_log, SCRIPT_SHORTNAME)
+FAIL = partial(_fail, SCRIPT_SHORTNAME)
+FAIL_EXCEPTION = partial(_fail_exception, SCRIPT_SHORTNAME)
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+PERCENTILES = (50, 95, 99)
+REPORT_HEADERS = ['count', 'errors', 'retries'] + ['p{}'.format(p) for p in PERCENTILES] + ['total']
+
+
+def _percentile(sorted_values, percent):
+    """
+    Return the nearest-rank percentile of a sorted, non-empty list of values.
+    """
+    rank = max(1, int(math.ceil(percent / 100 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+def _read_timings_or_exit(timings_files):
+    """
+    Read the retirement state timing records from the given JSON lines files.
+    """
+    timings = []
+    try:
+        for timings_file in timings_files:
+            with open(timings_file) as timings_f:
+                for line in timings_f:
+                    record = json.loads(line) if line.strip() else {}
+                    if record.get('type') == 'retirement_state':
+                        timings.append(record)
+    except Exception as exc:  # pylint: disable=broad-except
+        FAIL_EXCEPTION(ERR_READING_TIMINGS, 'Unexpected error reading timings!', exc)
+    if not timings:
+        FAIL(ERR_NO_TIMINGS, 'No retirement state timings found in {}'.format(', '.join(timings_files)))
+    return timings
+
+
+def summarize_timings(timings, group_by='service'):
+    """
+    Summarize retirement state timing records.
+
+    Arguments:
+        timings (list of dict): records written by retire_one_learner.py
+        group_by (str): record key to group the records by, "service" or "state"
+
+    Returns:
+        dict mapping each group to a dict with the REPORT_HEADERS keys
+    """
+    groups = defaultdict(list)
+    for record in timings:
+        groups[record[group_by]].append(record)
+
+    summary = {}
+    for group, records in groups.items():
+        durations = sorted(record['duration_seconds'] for record in records)
+        group_summary = {
+            'count': len(records),
+            'errors': sum(1 for record in records if record['outcome'] != 'success'),
+            'retries': sum(record.get('retries', 0) for record in records),
+            'total': sum(durations),
+        }
+        for percent in PERCENTILES:
+            group_summary['p{}'.format(percent)] = _percentile(durations, percent)
+        summary[group] = group_summary
+    return summary
+
+
+def _learners_per_hour(timings):
+    """
+    Return the number of learners in the timing records, and how many were retired per hour of wall clock time.
+    """
+    learners = len({record['user_id'] for record in timings})
+    elapsed = max(record['end'] for record in timings) - min(record['start'] for record in timings)
+    return learners, learners * 3600 / elapsed if elapsed > 0 else None
+
+
+@click.command("timing_report")
+@click.option(
+    '--timings_file',
+    multiple=True,
+    required=True,
+    help='JSON lines file written by retire_one_learner.py --timings_file. Can be given more than once.'
+)
+@click.option(
+    '--group_by',
+    type=click.Choice(['service', 'state']),
+    default='service',
+    help='Summarize the timings per service, or per retirement state.'
+)
+@click.option(
+    '--output_file',
+    help='Optional CSV file to also write the summary to.'
+)
+def timing_report(timings_file, group_by, output_file):
+    """
+    Reports the duration percentiles, errors and retries of retirement states, to find the slowest services.
+    """
+    timings = _read_timings_or_exit(timings_file)
+    summary = summarize_timings(timings, group_by)
+
+    # Slowest groups first, since those are the ones worth looking at.
+    rows = [
+        [group] + [summary[group][header] for header in REPORT_HEADERS]
+        for group in sorted(summary, key=lambda group: summary[group]['total'], reverse=True)
+    ]
+    LOG('{:<40} {:>7} {:>7} {:>7} {:>9} {:>9} {:>9} {:>11}'.format(group_by, *REPORT_HEADERS))
+    for row in rows:
+        LOG('{:<40} {:>7} {:>7} {:>7} {:>9.2f} {:>9.2f} {:>9.2f} {:>11.2f}'.format(*row))
+
+    learners, per_hour = _learners_per_hour(timings)
+    LOG('{} state runs for {} learners, {} learners per hour'.format(
+        len(timings), learners, '{:.1f}'.format(per_hour) if per_hour is not None else 'unknown'
+    ))
+
+    if output_file:
+        with open(output_file, 'w') as output_f:
+            writer = csv.writer(output_f)
+            writer.writerow([group_by] + REPORT_HEADERS)
+            writer.writerows(rows)
+
+
+if __name__ == '__main__':
+    # pylint: disable=unexpected-keyword-arg, no-value-for-parameter
+    timing_report(auto_envvar_prefix='RETIREMENT')
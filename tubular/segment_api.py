@@ -10,6 +10,8 @@ import requests
 from simplejson.errors import JSONDecodeError
 from six import text_type
 
+from tubular.utils.instrumentation import http_hooks, record_retry
+
 # Maximum number of tries on Segment API calls
 MAX_TRIES = 4
 
@@ -35,6 +37,7 @@ def _backoff_handler(details):
     Simple logging handler for when timeout backoff occurs.
     """
     LOG.error('Trying again in {wait:0.1f} seconds after {tries} tries calling {target}'.format(**details))
+    record_retry('segment', details['target'].__name__, details['wait'])
 
     # Log the text response from any HTTPErrors, if possible
     try:
@@ -108,7 +111,7 @@ class SegmentApi:
             "Authorization": "Bearer {}".format(self.auth_token),
             "Content-Type": "application/json"
         }
-        resp = requests.post(self.base_url + url, json=params, headers=headers)
+        resp = requests.post(self.base_url + url, json=params, headers=headers, hooks=http_hooks('segment'))
         resp.raise_for_status()
         return resp
 
@@ -123,7 +126,7 @@ class SegmentApi:
         headers = {
             "Authorization": "Bearer {}".format(self.auth_token)
         }
-        resp = requests.get(self.base_url + url, headers=headers)
+        resp = requests.get(self.base_url + url, headers=headers, hooks=http_hooks('segment'))
         resp.raise_for_status()
         return resp
 
@@ -143,6 +146,8 @@ class SegmentApi:
     def _send_regulation_request(self, params):
         """
         Make the call to the Segment Regulate API, cleanly report any errors
+
+        :return: The Segment regulation id of the queued request.
         """
         resp_json = ""
 
@@ -152,6 +157,7 @@ class SegmentApi:
                 resp_json = resp.json()
                 bulk_user_delete_id = resp_json['regulate_id']
                 LOG.info('Bulk user regulation queued. Id: {}'.format(bulk_user_delete_id))
+                return bulk_user_delete_id
             except JSONDecodeError:
                 resp_json = resp.text
                 raise
@@ -230,7 +236,9 @@ class SegmentApi:
         :param learners: List of learner dicts returned from LMS, should contain all we need to retire this learner.
         :param chunk_size: How many learners should be retired in this batch.
         :param beginning_idx: Index into learners where this batch should start.
+        :return: List of the Segment regulation ids queued, one per chunk.
         """
+        regulation_ids = []
         curr_idx = beginning_idx
         while curr_idx < len(learners):
             start_idx = curr_idx
@@ -255,7 +263,7 @@ class SegmentApi:
                     'Attempting to delete too many user values (%s) at once in bulk request - decrease chunk_size.',
                     len(learner_vals)
                 )
-                return
+                return regulation_ids
 
             params = {
                 "regulation_type": "Suppress_With_Delete",
@@ -265,10 +273,12 @@ class SegmentApi:
                 }
             }
 
-            self._send_regulation_request(params)
+            regulation_ids.append(self._send_regulation_request(params))
 
             curr_idx += chunk_size
 
+        return regulation_ids
+
     def get_bulk_delete_status(self, bulk_delete_id):
         """
         Queries the status of a previously submitted bulk delete request.
@@ -4,6 +4,7 @@ import logging
 import requests
 
 from tubular.utils.retry import retry
+from tubular.utils.instrumentation import http_hooks
 
 SLACK_API_URL = "https://slack.com"
 NOTIFICATION_POST = "/api/chat.postMessage"
@@ -40,7 +41,8 @@ def submit_slack_message(auth_token, channels, message):
         }
         response = requests.post(post_url,
                                  data=arguments,
-                                 headers=headers
+                                 headers=headers,
+                                 hooks=http_hooks('slack')
                                  )
         if response.status_code not in (200, 201, 204):
             raise SlackMessageSendFailure(
@@ -4,6 +4,8 @@ Test the bulk_delete_segment_users.py script
 """
 
 
+import os
+
 from click.testing import CliRunner
 from mock import patch
 
@@ -12,6 +14,7 @@ from tubular.scripts.bulk_delete_segment_users import (
     ERR_BAD_CONFIG,
     ERR_NO_CSV_FILE,
     ERR_DELETING_USERS,
+    ERR_BAD_LEDGER,
     bulk_delete_segment_users
 )
 from tubular.tests.retirement_helpers import fake_config_file, FAKE_ORGS
@@ -19,12 +22,15 @@ from tubular.tests.retirement_helpers import fake_config_file, FAKE_ORGS
 
 TEST_CONFIG_YML_NAME = 'test_config.yml'
 TEST_RETIRED_USERS_CSV_NAME = 'test_users_to_delete.yml'
+TEST_LEDGER_NAME = TEST_RETIRED_USERS_CSV_NAME + '.ledger'
 
 
-def _call_script(expect_success=True, config_orgs=None, learners_to_delete=None):
+def _call_script(
+        expect_success=True, config_orgs=None, learners_to_delete=None, chunk_size=None, ledger_lines=None
+):
     """
     Call the retired learner script with generic, temporary config files and specified learners.
-    Returns the CliRunner.invoke results.
+    Returns the CliRunner.invoke results and the resulting ledger file contents.
     """
     if config_orgs is None:
         config_orgs = FAKE_ORGS
@@ -37,7 +43,11 @@ def _call_script(expect_success=True, config_orgs=None, learners_to_delete=None)
         if learners_to_delete:
             with open(TEST_RETIRED_USERS_CSV_NAME, 'w') as users_f:
                 for learner in learners_to_delete:
-                    users_f.write(','.join(learner))
+                    users_f.write(','.join(learner) + '\n')
+
+        if ledger_lines:
+            with open(TEST_LEDGER_NAME, 'w') as ledger_f:
+                ledger_f.write(''.join(ledger_lines))
 
         cmd_args = [
             '--config_file',
@@ -45,6 +55,8 @@ def _call_script(expect_success=True, config_orgs=None, learners_to_delete=None)
             '--retired_users_csv',
             TEST_RETIRED_USERS_CSV_NAME,
         ]
+        if chunk_size:
+            cmd_args += ['--chunk_size', chunk_size]
 
         result = runner.invoke(
             bulk_delete_segment_users,
@@ -57,16 +69,21 @@ def _call_script(expect_success=True, config_orgs=None, learners_to_delete=None)
         if expect_success:
             assert result.exit_code == 0
 
-    return result
+        ledger = None
+        if os.path.exists(TEST_LEDGER_NAME):
+            with open(TEST_LEDGER_NAME, 'r') as ledger_f:
+                ledger = ledger_f.read()
+
+    return result, ledger
 
 
 @patch('tubular.segment_api.SegmentApi.delete_and_suppress_learners')
 def test_successful_deletion(*args):
     mock_delete_learners = args[0]
 
-    mock_delete_learners.return_value = None
+    mock_delete_learners.return_value = ['fake_regulation_id']
 
-    _call_script(
+    _, ledger = _call_script(
         learners_to_delete=[
             ['1', '14', 'test_username1', 'fake_ecom_id1']
         ]
@@ -74,6 +91,72 @@ def test_successful_deletion(*args):
 
     # Make sure we tried to delete the learners.
     assert mock_delete_learners.call_count == 1
+    learners = mock_delete_learners.call_args[0][0]
+    assert learners[0]['user']['id'] == '14'
+    assert learners[0]['original_username'] == 'test_username1'
+    assert ledger.splitlines() == ['0,1,fake_regulation_id']
+
+
+@patch('tubular.segment_api.SegmentApi.delete_and_suppress_learners')
+def test_deletion_in_chunks(*args):
+    mock_delete_learners = args[0]
+    mock_delete_learners.side_effect = [['reg_1'], ['reg_2'], ['reg_3']]
+
+    _, ledger = _call_script(
+        learners_to_delete=[[str(i), str(i), 'user{}'.format(i), 'ecom{}'.format(i)] for i in range(5)],
+        chunk_size=2
+    )
+
+    assert [len(call[0][0]) for call in mock_delete_learners.call_args_list] == [2, 2, 1]
+    assert ledger.splitlines() == ['0,2,reg_1', '2,2,reg_2', '4,1,reg_3']
+
+
+@patch('tubular.segment_api.SegmentApi.delete_and_suppress_learners')
+def test_resume_from_ledger(*args):
+    mock_delete_learners = args[0]
+    mock_delete_learners.return_value = ['reg_3']
+
+    _, ledger = _call_script(
+        learners_to_delete=[[str(i), str(i), 'user{}'.format(i), 'ecom{}'.format(i)] for i in range(5)],
+        chunk_size=2,
+        ledger_lines=['0,2,reg_1\n', '2,2,reg_2\n']
+    )
+
+    # Only the final, unsubmitted row should be sent.
+    assert mock_delete_learners.call_count == 1
+    learners = mock_delete_learners.call_args[0][0]
+    assert [learner['original_username'] for learner in learners] == ['user4']
+    assert ledger.splitlines() == ['0,2,reg_1', '2,2,reg_2', '4,1,reg_3']
+
+
+@patch('tubular.segment_api.SegmentApi.delete_and_suppress_learners')
+def test_failure_keeps_completed_chunks_in_ledger(*args):
+    mock_delete_learners = args[0]
+    mock_delete_learners.side_effect = [['reg_1'], Exception('Unknown error.')]
+
+    result, ledger = _call_script(
+        expect_success=False,
+        learners_to_delete=[[str(i), str(i), 'user{}'.format(i), 'ecom{}'.format(i)] for i in range(4)],
+        chunk_size=2
+    )
+
+    assert result.exit_code == ERR_DELETING_USERS
+    assert ledger.splitlines() == ['0,2,reg_1']
+
+
+@patch('tubular.segment_api.SegmentApi.delete_and_suppress_learners')
+def test_bad_ledger(*args):
+    mock_delete_learners = args[0]
+
+    result, _ = _call_script(
+        expect_success=False,
+        learners_to_delete=[['1', '2', 'test1', 'test2']],
+        ledger_lines=['this,is,bad\n']
+    )
+
+    assert result.exit_code == ERR_BAD_LEDGER
+    assert 'Malformed line 1' in result.output
+    assert mock_delete_learners.call_count == 0
 
 
 @patch('tubular.segment_api.SegmentApi.delete_and_suppress_learners')
@@ -81,10 +164,11 @@ def test_unknown_error(*args):
     mock_delete_learners = args[0]
     mock_delete_learners.side_effect = Exception('Unknown error.')
 
-    result = _call_script(expect_success=False, learners_to_delete=[['1', '2', 'test1', 'test2']])
+    result, ledger = _call_script(expect_success=False, learners_to_delete=[['1', '2', 'test1', 'test2']])
     print(result.output)
     assert result.exit_code == ERR_DELETING_USERS
     assert 'Unexpected error occurred' in result.output
+    assert ledger is None
 
 
 def test_no_config():
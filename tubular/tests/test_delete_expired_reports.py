@@ -74,16 +74,19 @@ def test_successful_report_deletion(*args):
             'id': 'folder1',
             'name': '{}.csv'.format(file_prefix),
             'createdTime': test_created_date,
+            'mimeType': 'text/csv',
         },
         {
             'id': 'folder2',
             'name': '{}_foo.csv'.format(file_prefix),
             'createdTime': test_created_date,
+            'mimeType': 'text/csv',
         },
         {
             'id': 'folder3',
             'name': '{}___bar.csv'.format(file_prefix),
             'createdTime': test_created_date,
+            'mimeType': 'text/csv',
         },
     ]
     mock_delete_files.return_value = None
@@ -91,8 +94,8 @@ def test_successful_report_deletion(*args):
 
     result = _call_script()
 
-    # Make sure the files were listed (twice: once for deletion, once for non-CSV reporting)
-    assert mock_walk_files.call_count == 2
+    # Make sure the files were listed, in a single walk
+    assert mock_walk_files.call_count == 1
 
     # Make sure we tried to delete the files
     assert mock_delete_files.call_count == 1
@@ -101,29 +104,32 @@ def test_successful_report_deletion(*args):
 
 
 @patch('tubular.google_api.DriveApi.__init__')
-@patch('tubular.google_api.DriveApi.walk_files')
+@patch('tubular.google_api.DriveApi._list_children')
 @patch('tubular.google_api.DriveApi.delete_files')
 def test_deletion_report_no_matching_files(*args):
     mock_delete_files = args[0]
-    mock_walk_files = args[1]
+    mock_list_children = args[1]
     mock_driveapi = args[2]
 
     test_created_date = '2018-07-13T22:21:45.600275+00:00'
-    mock_walk_files.return_value = [
+    mock_list_children.return_value = [
         {
             'id': 'folder1',
             'name': 'not_this.csv',
             'createdTime': test_created_date,
+            'mimeType': 'text/csv',
         },
         {
             'id': 'folder2',
             'name': 'or_this.csv',
             'createdTime': test_created_date,
+            'mimeType': 'text/csv',
         },
         {
             'id': 'folder3',
             'name': 'foo.csv',
             'createdTime': test_created_date,
+            'mimeType': 'text/csv',
         },
     ]
     mock_delete_files.return_value = None
@@ -131,8 +137,8 @@ def test_deletion_report_no_matching_files(*args):
 
     result = _call_script()
 
-    # Make sure the files were listed (twice: once for deletion, once for non-CSV reporting)
-    assert mock_walk_files.call_count == 2
+    # Make sure the files were listed, in a single query, and filtered by prefix
+    assert mock_list_children.call_count == 1
 
     # Make sure we did *not* try to delete the files - nothing to delete.
     assert mock_delete_files.call_count == 0
@@ -422,6 +422,32 @@ class TestEC2(unittest.TestCase):
         self.assertEqual(len([asg for asg in asgs if asg['AutoScalingGroupName'] == asg_name1]), 1)
         self.assertEqual(len([asg for asg in asgs if asg['AutoScalingGroupName'] == asg_name2]), 0)
 
+    @mock_autoscaling
+    @mock_ec2
+    def test_cached_asg_inventory(self):
+        edp = EDP("foo", "bar", "baz")
+        edp_tags = {"environment": "foo", "deployment": "bar", "play": "baz"}
+        create_asg_with_tags("asg-old", dict(edp_tags, **{ec2.ASG_DELETE_TAG_KEY: "2016-05-18T18:19:46.144884"}))
+        create_asg_with_tags("asg-current", edp_tags)
+        create_asg_with_tags("asg-other", {"environment": "foo", "deployment": "bar", "play": "qux"})
+
+        with mock.patch("tubular.ec2.get_all_autoscale_groups", wraps=ec2.get_all_autoscale_groups) as mock_get:
+            with ec2.cached_asg_inventory():
+                self.assertEqual(ec2.asgs_for_edp(edp), ["asg-current"])
+                self.assertEqual(sorted(ec2.asgs_for_edp(edp, filter_asgs_pending_delete=False)),
+                                 ["asg-current", "asg-old"])
+                self.assertEqual([asg['AutoScalingGroupName'] for asg in ec2.get_asgs_pending_delete()], ["asg-old"])
+                self.assertEqual(mock_get.call_count, 1)
+
+                # Tagging an ASG lists them again.
+                ec2.tag_asg_for_deletion("asg-current", seconds_until_delete_delta=0)
+                self.assertEqual(ec2.asgs_for_edp(edp), [])
+                self.assertEqual(ec2.asgs_for_edp(edp), [])
+
+            self.assertEqual(ec2.asgs_for_edp(edp), [])
+        # The first inventory, tag_asg_for_deletion, the inventory after tagging, and the call outside the block.
+        self.assertEqual(mock_get.call_count, 4)
+
     def test_create_tag_for_asg_deletion(self):
         asg_name = "test-asg-tags"
         tag = ec2.create_tag_for_asg_deletion(asg_name, 1)
@@ -2,12 +2,15 @@
 Tests for tubular.git_repo.GitRepo
 """
 
+import os
+import shutil
+import tempfile
 from unittest import TestCase
 import ddt
-from git import GitCommandError, Repo
+from git import Actor, GitCommandError, Repo
 from mock import patch, MagicMock
 
-from tubular.git_repo import LocalGitAPI, InvalidGitRepoURL, extract_repo_name
+from tubular.git_repo import LocalGitAPI, InvalidGitRepoURL, MergeConflict, extract_repo_name, update_mirror
 
 
 @ddt.ddt
@@ -66,6 +69,52 @@ class GitRepoTestCase(TestCase):
             LocalGitAPI.clone('git@github.com:edx/tubular.git', 'bar').merge_branch('foo', 'bar')
             mock_rmtree.assert_called_once_with('tubular')
 
+    @patch('tubular.git_repo.update_mirror', autospec=True)
+    @patch('tubular.git_repo.Repo', autospec=True)
+    def test_clone_partial_shallow_mirror(self, mock_repo, mock_update_mirror):
+        """
+        Tests cloning with a mirror cache, a partial clone filter and a depth.
+        """
+        mirror_cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, mirror_cache_dir)
+        mock_update_mirror.return_value = os.path.join(mirror_cache_dir, 'tubular-0123456789ab.git')
+        LocalGitAPI.clone(
+            'git@github.com:edx/tubular.git', 'bar', mirror_cache_dir=mirror_cache_dir, filter_spec='blob:none',
+            depth=10
+        )
+
+        mock_update_mirror.assert_called_once_with('git@github.com:edx/tubular.git', mirror_cache_dir)
+        mock_repo.clone_from.assert_called_once_with(
+            'git@github.com:edx/tubular.git', to_path='tubular', branch='bar',
+            reference=mock_update_mirror.return_value, dissociate=True, filter='blob:none', depth=10,
+            no_single_branch=True,
+        )
+
+    def test_update_mirror(self):
+        """
+        Tests creating a mirror and then fetching new commits into it.
+        """
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir)
+        origin = Repo.init(os.path.join(work_dir, 'origin.git'))
+        author = Actor('Test', 'test@example.com')
+        origin.index.commit('First', author=author, committer=author)
+        mirror_cache_dir = os.path.join(work_dir, 'mirrors')
+
+        mirror_path = update_mirror(origin.working_dir, mirror_cache_dir)
+        self.assertEqual(Repo(mirror_path).head.commit.hexsha, origin.head.commit.hexsha)
+
+        origin.index.commit('Second', author=author, committer=author)
+        self.assertEqual(update_mirror(origin.working_dir, mirror_cache_dir), mirror_path)
+        self.assertEqual(Repo(mirror_path).head.commit.hexsha, origin.head.commit.hexsha)
+
+        # Clones from the mirror do not depend on its objects.
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(work_dir)
+        clone = LocalGitAPI.clone(origin.working_dir, mirror_cache_dir=mirror_cache_dir).repo
+        self.assertEqual(clone.head.commit.hexsha, origin.head.commit.hexsha)
+        self.assertFalse(os.path.exists(os.path.join(clone.git_dir, 'objects', 'info', 'alternates')))
+
     def test_octopus_merge(self):
         mock_repo = MagicMock(spec=Repo)
         api = LocalGitAPI(mock_repo)
@@ -82,6 +131,70 @@ class GitRepoTestCase(TestCase):
         mock_repo.git.merge.assert_not_called()
         self.assertEqual(sha, mock_repo.head.commit.hexsha)
 
+    def _repo_with_branches(self, branch_lines):
+        """
+        Create a repo whose master branch has a file of 8 lines, and a branch per item of ``branch_lines``
+        changing the line with that index.
+
+        Returns:
+            tuple(LocalGitAPI, list): the repo, and the head SHAs of the branches
+        """
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir)
+        repo = Repo.init(work_dir)
+        with repo.config_writer() as config:
+            config.set_value('user', 'name', 'Test')
+            config.set_value('user', 'email', 'test@example.com')
+        author = Actor('Test', 'test@example.com')
+        path = os.path.join(work_dir, 'file.txt')
+
+        def commit(lines, message):
+            with open(path, 'w') as file_:
+                file_.write('\n'.join(lines) + '\n')
+            repo.index.add([path])
+            return repo.index.commit(message, author=author, committer=author).hexsha
+
+        base_lines = ['line {}'.format(index) for index in range(8)]
+        commit(base_lines, 'Base')
+        repo.git.branch('-M', 'master')
+        shas = []
+        for index, line in enumerate(branch_lines):
+            repo.git.checkout('master', b='branch{}'.format(index))
+            lines = list(base_lines)
+            lines[line] = 'branch {}'.format(index)
+            shas.append(commit(lines, 'Branch {}'.format(index)))
+        repo.git.checkout('master')
+        return LocalGitAPI(repo), shas
+
+    def test_merge_bisecting_conflicts(self):
+        # The second and fifth branches change the same lines as branches before them.
+        api, shas = self._repo_with_branches([0, 0, 2, 4, 2, 6])
+
+        with self.assertRaises(MergeConflict) as context:
+            api.merge_bisecting_conflicts('master', shas)
+        self.assertEqual(context.exception.commitish, shas[1])
+
+        merge_sha, excluded = api.merge_bisecting_conflicts('master', shas, exclude_conflicts=True)
+
+        self.assertEqual(excluded, [shas[1], shas[4]])
+        self.assertEqual(merge_sha, api.get_head_sha(branch='master'))
+        for index, sha in enumerate(shas):
+            self.assertEqual(api.repo.is_ancestor(sha, merge_sha), sha not in excluded, index)
+
+    def test_merge_bisecting_conflicts_clean(self):
+        api, shas = self._repo_with_branches([0, 2, 4])
+        merge_sha, excluded = api.merge_bisecting_conflicts('master', shas)
+
+        self.assertEqual(excluded, [])
+        for sha in shas:
+            self.assertTrue(api.repo.is_ancestor(sha, merge_sha))
+
+    def test_merge_bisecting_conflicts_missing_commit(self):
+        # Only conflicts are left out; a head which was never fetched still fails the merge.
+        api, shas = self._repo_with_branches([0, 2])
+        with self.assertRaises(GitCommandError):
+            api.merge_bisecting_conflicts('master', shas + ['0' * 40], exclude_conflicts=True)
+
     @ddt.data(
         ('https://github.com/openedx/edx-platform.git', 'edx-platform'),
         ('https://github.com/edx-ops/secret_repo.git', 'secret_repo'),
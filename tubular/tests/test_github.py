@@ -2,12 +2,16 @@
 Tests for tubular.github_api.GitHubAPI
 """
 
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from hashlib import sha1
+import os
+import tempfile
 
 from unittest import TestCase
 import ddt
 from mock import patch, Mock
+import requests
+from requests.structures import CaseInsensitiveDict
 
 from github import GithubException, Github
 from github import UnknownObjectException
@@ -32,6 +36,7 @@ from tubular.github_api import (
     GitHubAPI,
     InvalidPullRequestError,
     GitTagMismatchError,
+    PullRequestShaCache,
 )
 
 # SHA1 is hash function designed to be difficult to reverse.
@@ -327,6 +332,52 @@ class GitHubApiTestCase(TestCase):
                 assert result[0] == end_status
                 assert result[1] == url_dict
 
+    @patch('tubular.github_api.sleep')
+    def test_watch_commit(self, mock_sleep):
+        self.api.watch_statuses = True
+        self.api.get_branch_protection_rules = Mock(return_value=['unit-tests', 'quality'])
+        self.repo_mock.url = 'https://api.github.com/repos/test-org/test-repo'
+        self.repo_mock._requester = Mock()  # pylint: disable=protected-access
+
+        def check_run(name, status, conclusion, started_at, completed_at=None):
+            """
+            REST data of a check run.
+            """
+            return {
+                'name': name, 'status': status, 'conclusion': conclusion, 'url': name + '.url',
+                'started_at': started_at, 'completed_at': completed_at,
+            }
+
+        started_at = (datetime.utcnow() - timedelta(seconds=30)).strftime('%Y-%m-%dT%H:%M:%SZ')
+        completed_at = (datetime.utcnow() + timedelta(seconds=60)).strftime('%Y-%m-%dT%H:%M:%SZ')
+        statuses = ({'etag': 'status-1'}, {'statuses': []})
+        suites = ({'etag': 'suites-1'}, {'check_suites': []})
+        unchanged = ({}, None)
+        responses = [
+            # Both checks are pending: the first took 90 seconds, so the second is expected to finish in 60.
+            statuses, suites, ({'etag': 'runs-1'}, {'check_runs': [
+                check_run('unit-tests', 'completed', 'success', started_at, completed_at),
+                check_run('quality', 'in_progress', None, started_at),
+            ]}),
+            # Nothing changed.
+            unchanged, unchanged, unchanged,
+            # The second check passed.
+            unchanged, unchanged, ({'etag': 'runs-2'}, {'check_runs': [
+                check_run('unit-tests', 'completed', 'success', started_at, completed_at),
+                check_run('quality', 'completed', 'success', started_at, completed_at),
+            ]}),
+        ]
+        self.repo_mock._requester.requestJsonAndCheck.side_effect = responses  # pylint: disable=protected-access
+
+        self.assertTrue(self.api.poll_for_commit_successful('deadbeef'))
+
+        self.assertEqual(mock_sleep.call_count, 2)
+        self.assertAlmostEqual(mock_sleep.call_args_list[0][0][0], 60, delta=2)
+        calls = self.repo_mock._requester.requestJsonAndCheck.call_args_list  # pylint: disable=protected-access
+        self.assertEqual(calls[0][0], ('GET', self.repo_mock.url + '/commits/deadbeef/status'))
+        self.assertEqual(calls[0][1]['headers'], {})
+        self.assertEqual(calls[5][1]['headers'], {'If-None-Match': 'runs-1'})
+
     @ddt.data(
         (
             None,
@@ -569,6 +620,153 @@ class GitHubApiTestCase(TestCase):
         for pull in pulls:
             self.assertIsInstance(pull, PullRequest)
 
+    @patch('github.Github.search_issues')
+    def test_get_pr_range_cached(self, mock_search_issues):
+        cache_dir = tempfile.mkdtemp()
+        self.api.pr_cache = PullRequestShaCache(os.path.join(cache_dir, 'prs.sqlite'))
+        self.addCleanup(self.api.pr_cache.close)
+
+        def commit_pulls(sha):
+            """
+            Stub the PRs associated with a commit: a master PR per 3 commits, and a PR to another branch.
+            """
+            return [
+                Mock(spec=PullRequest, number=SHA_MAP[sha] // 3, base=Mock(ref='master')),
+                Mock(spec=PullRequest, number=1000, base=Mock(ref='release')),
+            ]
+
+        commits = [Mock(spec=Commit, sha=sha) for sha in SHAS[:9]]
+        for commit in commits[:8]:
+            commit.get_pulls.return_value = commit_pulls(commit.sha)
+        # The lookup of the last commit fails, so it is searched for instead.
+        commits[8].get_pulls.side_effect = GithubException(500, 'error', None)
+        mock_search_issues.return_value = [Mock(spec=Issue, number=50, repository=self.repo_mock)]
+        self.repo_mock.compare.return_value = Mock(spec=Comparison, commits=commits + commits[:2])
+        self.repo_mock.get_pull = Mock(side_effect=lambda number: Mock(spec=PullRequest, number=number))
+
+        pulls = self.api.get_pr_range('abc', '123')
+
+        self.assertEqual(
+            sorted(pull.number for pull in pulls),
+            sorted({SHA_MAP[sha] // 3 for sha in SHAS[:8]} | {50})
+        )
+        self.assertEqual(mock_search_issues.call_count, 1)
+        self.assertIn(SHAS[8][:10], mock_search_issues.call_args[0][0])
+        self.repo_mock.get_pull.assert_called_once_with(50)
+
+        # A later run over the same range only looks up the uncached commit, and gets the cached PRs by number.
+        for commit in commits:
+            commit.get_pulls.reset_mock()
+        mock_search_issues.reset_mock()
+        self.repo_mock.get_pull.reset_mock()
+
+        pulls = self.api.get_pr_range('abc', '123')
+
+        self.assertEqual(
+            sorted(pull.number for pull in pulls),
+            sorted({SHA_MAP[sha] // 3 for sha in SHAS[:8]} | {50})
+        )
+        for commit in commits[:8]:
+            commit.get_pulls.assert_not_called()
+        commits[8].get_pulls.assert_called_once_with()
+        self.assertEqual(
+            self.repo_mock.get_pull.call_count,
+            len({SHA_MAP[sha] // 3 for sha in SHAS[:8]}) + 1
+        )
+        self.assertEqual(
+            self.api.pr_cache.get('test-org/test-repo', [SHAS[0], SHAS[8]]),
+            {SHAS[0]: [SHA_MAP[SHAS[0]] // 3]}
+        )
+
+    @patch('github.Github.search_issues')
+    def test_find_approved_not_closed_prs(self, mock_search_issues):
+        mock_search_issues.return_value = [Mock(spec=Issue, number=number) for number in (7, 3, 5, 1)]
+        self.repo_mock.get_pull.side_effect = lambda number: Mock(spec=PullRequest, number=number)
+
+        pulls = list(self.api.find_approved_not_closed_prs('release', max_workers=3))
+
+        self.assertEqual([pull.number for pull in pulls], [7, 3, 5, 1])
+        self.assertEqual(self.repo_mock.get_pull.call_count, 4)
+        self.assertIn('base:release', mock_search_issues.call_args[0][0])
+
+    @staticmethod
+    def _graphql_commit(sha, status_state, suite_conclusion, run_conclusion):
+        """
+        GraphQL CommitValidations data of a commit with a status, a check suite and a check run.
+        """
+        return {
+            'oid': sha,
+            'status': {'contexts': [{'context': 'ci/status', 'state': status_state, 'targetUrl': 'status.url'}]},
+            'checkSuites': {'nodes': [{
+                'app': {'name': 'App'},
+                'conclusion': suite_conclusion,
+                'url': 'suite.url',
+                'checkRuns': {'nodes': [{'name': 'unit-tests', 'conclusion': run_conclusion, 'url': 'run.url'}]},
+            }]},
+        }
+
+    def test_get_commits_validation_results(self):
+        self.api.get_branch_protection_rules = Mock(return_value=['unit-tests', 'quality'])
+        # pylint: disable=protected-access
+        self.repo_mock._requester = Mock()
+        self.repo_mock._requester.graphql_query.return_value = ({}, {'data': {'repository': {
+            'c0': self._graphql_commit(SHAS[0], 'SUCCESS', 'SUCCESS', 'SUCCESS'),
+            'c1': self._graphql_commit(SHAS[1], 'PENDING', None, 'FAILURE'),
+        }}})
+
+        results = self.api.get_commits_validation_results(SHAS[:2])
+
+        self.assertEqual(results, {
+            SHAS[0]: {
+                'ci/status': ('success', 'status.url'),
+                'unit-tests': ('success', 'run.url'),
+                'quality': ('pending', None),
+            },
+            SHAS[1]: {
+                'ci/status': ('pending', 'status.url'),
+                'unit-tests': ('failure', 'run.url'),
+                'quality': ('pending', None),
+            },
+        })
+        # Both commits are fetched in one query.
+        query, variables = self.repo_mock._requester.graphql_query.call_args[0]
+        self.assertIn('c1: object(oid: $c1)', query)
+        self.assertEqual(variables, {'owner': 'test-org', 'name': 'test-repo', 'c0': SHAS[0], 'c1': SHAS[1]})
+
+    def test_check_combined_status_pull_request_graphql(self):
+        self.api.use_graphql = True
+        # pylint: disable=protected-access
+        self.repo_mock._requester = Mock()
+        self.repo_mock._requester.graphql_query.return_value = ({}, {'data': {'repository': {
+            'p0': {
+                'number': 42,
+                'title': 'A PR',
+                'state': 'OPEN',
+                'baseRefName': 'master',
+                'mergeable': 'MERGEABLE',
+                'headRefOid': SHAS[0],
+                'commits': {'nodes': [{'commit': self._graphql_commit(SHAS[0], 'SUCCESS', 'SUCCESS', 'SUCCESS')}]},
+            },
+        }}})
+
+        successful, statuses = self.api.check_combined_status_pull_request(42)
+
+        self.assertTrue(successful)
+        self.assertEqual(statuses, {'ci/status': 'status.url success'})
+        self.repo_mock.get_pull.assert_not_called()
+        self.repo_mock._requester.graphql_query.assert_called_once()
+
+    def test_branch_protection_rules_cached(self):
+        del self.api.get_branch_protection_rules
+        self.repo_mock.default_branch = 'master'
+        self.repo_mock.get_branch.return_value = Mock(
+            spec=Branch, raw_data={'protection': {'required_status_checks': {'contexts': ['unit-tests']}}}
+        )
+
+        self.assertEqual(self.api.get_branch_protection_rules(), ['unit-tests'])
+        self.assertEqual(self.api.get_branch_protection_rules(), ['unit-tests'])
+        self.repo_mock.get_branch.assert_called_once_with('master')
+
     @ddt.data(
         ('Deployed to PROD', [':+1:', ':+1:', ':ship: :it:'], True, IssueComment),
         ('Deployed to stage', ['wahoo', 'want BLT', 'Deployed, to PROD'], False, IssueComment),
@@ -594,6 +792,99 @@ class GitHubApiTestCase(TestCase):
         else:
             self.assertEqual(result, expected_result)
 
+    @ddt.data(
+        # Our last comment is the message, even though a later comment by someone else is not.
+        ([('bot', 'Deployed to PROD'), ('human', ':+1:')], None),
+        # An older comment of ours is the message, even though our latest comment is a different message.
+        ([('bot', 'Deployed to PROD'), ('bot', 'Rolled back'), ('human', ':+1:')], None),
+        # Someone else's comment with the message does not count.
+        ([('bot', 'Deployed to stage'), ('human', 'Deployed to PROD')], IssueComment),
+        # Only the most recent comments are checked.
+        ([('bot', 'Deployed to PROD')] + [('human', ':+1:')] * github_api.RECENT_COMMENTS_TO_CHECK, IssueComment),
+    )
+    @ddt.unpack
+    def test_message_pull_request_bot_comments_only(self, existing_comments, expected_result):
+        self.api.user = Mock(return_value=Mock(spec=NamedUser, login='bot'))
+        comments = [
+            Mock(spec=IssueComment, body=body, user=Mock(spec=NamedUser, login=login))
+            for login, body in existing_comments
+        ]
+        self.repo_mock.get_pull.return_value = Mock(
+            spec=PullRequest,
+            get_issue_comments=Mock(return_value=Mock(reversed=reversed(comments))),
+            create_issue_comment=lambda message: Mock(spec=IssueComment, body=message),
+        )
+
+        result = self.api.message_pull_request(1, 'Deployed to PROD', 'Deployed to PROD', bot_comments_only=True)
+
+        if expected_result:
+            self.assertIsInstance(result, expected_result)
+        else:
+            self.assertIsNone(result)
+
+    def test_http_cache(self):
+        cache_dir = tempfile.mkdtemp()
+
+        def get(status, headers, body='', token='token abc123'):
+            """
+            Make a GET request with a new cached connection, returning its response and the request headers sent.
+            """
+            response = requests.Response()
+            response.status_code = status
+            response.headers = CaseInsensitiveDict(headers)
+            response._content = body.encode('utf-8')  # pylint: disable=protected-access
+            connection = github_api.CachingHTTPSConnection('api.github.com', cache_dir=cache_dir)
+            connection.session = Mock(get=Mock(return_value=response))
+            connection.request('GET', '/repos/test-org/test-repo', None, {'Authorization': token})
+            return connection.getresponse(), connection.session.get.call_args[1]['headers']
+
+        response, request_headers = get(200, {'ETag': '"v1"', 'X-RateLimit-Remaining': '10'}, '{"name": "test-repo"}')
+        self.assertEqual((response.status, response.read()), (200, '{"name": "test-repo"}'))
+        self.assertNotIn('If-None-Match', request_headers)
+
+        # An unchanged resource is served from the cache, with the fresh rate limit headers.
+        response, request_headers = get(304, {'ETag': '"v1"', 'X-RateLimit-Remaining': '9'})
+        self.assertEqual(request_headers['If-None-Match'], '"v1"')
+        self.assertEqual((response.status, response.read()), (200, '{"name": "test-repo"}'))
+        self.assertEqual(response.headers['X-RateLimit-Remaining'], '9')
+
+        # The cached response is still served if another process prunes its file meanwhile.
+        with patch('tubular.github_api.os.utime', side_effect=FileNotFoundError):
+            response, _ = get(304, {'ETag': '"v1"'})
+        self.assertEqual((response.status, response.read()), (200, '{"name": "test-repo"}'))
+
+        # Another token's requests are not answered from this token's cache.
+        _, request_headers = get(200, {}, '{}', token='token def456')
+        self.assertNotIn('If-None-Match', request_headers)
+
+        # Unused responses are pruned.
+        github_api.prune_http_cache(cache_dir, max_age_days=-1)
+        self.assertEqual(os.listdir(cache_dir), [])
+
+    def test_http_cache_installed(self):
+        cache_dir = os.path.join(tempfile.mkdtemp(), 'github')
+        with patch.object(Github, 'get_organization'), patch.object(Github, 'get_repo'):
+            api = GitHubAPI('test-org', 'test-repo', token='abc123', http_cache_dir=cache_dir)
+        requester = api.github_connection.requester
+        self.assertIs(
+            requester._Requester__connectionClass.func,  # pylint: disable=protected-access
+            github_api.CachingHTTPSConnection
+        )
+        self.assertTrue(os.path.isdir(cache_dir))
+
+    @patch('tubular.github_api.sleep')
+    def test_rate_limit_budget(self, mock_sleep):
+        requester = Mock(rate_limiting=(500, 5000), rate_limiting_resettime=datetime.now().timestamp() + 60)
+        budget = github_api.RateLimitBudget(Mock(spec=Github, requester=requester), reserve=100)
+
+        budget.wait()
+        mock_sleep.assert_not_called()
+
+        requester.rate_limiting = (100, 5000)
+        budget.wait()
+        self.assertAlmostEqual(mock_sleep.call_args[0][0], 61, delta=2)
+        self.assertEqual(requester.rate_limiting, (5000, 5000))
+
     def test_message_pr_does_not_exist(self):
         with patch.object(self.repo_mock, 'get_pull', side_effect=UnknownObjectException(404, '', {})):
             self.assertRaises(InvalidPullRequestError, self.api.message_pull_request, 3, 'test', 'test')
@@ -621,7 +912,8 @@ class GitHubApiTestCase(TestCase):
                         message=github_api.MessageType.stage.value,
                         extra_text=github_api.PR_ON_STAGE_DATE_EXTRA.format(date=deploy_date, extra_text='')
                     ),
-                    False
+                    False,
+                    bot_comments_only=False,
                 )
 
     @ddt.data(
@@ -646,5 +938,6 @@ class GitHubApiTestCase(TestCase):
                     message=message_type.value,
                     extra_text=extra_text
                 ),
-                force_message
+                force_message,
+                bot_comments_only=False,
             )
@@ -5,7 +5,10 @@ Test google API
 
 from datetime import datetime, timedelta
 import json
+import os
+import shutil
 import sys
+import tempfile
 import unittest
 from io import BytesIO
 
@@ -18,7 +21,7 @@ from pytz import UTC
 import six
 from six.moves import range  # use the range function introduced in python 3
 
-from googleapiclient.http import HttpMockSequence
+from googleapiclient.http import HttpMockSequence, MediaIoBaseUpload
 from tubular.google_api import BatchRequestError, DriveApi, FOLDER_MIMETYPE, GOOGLE_API_MAX_BATCH_SIZE
 
 # For info about this file, see tubular/tests/discovery-drive.json.README.rst
@@ -106,6 +109,62 @@ class TestDriveApi(unittest.TestCase):
         # since it was only passed in the last response.
         assert response == fake_file_id
 
+    @patch('tubular.google_api.service_account.Credentials.from_service_account_file', return_value=None)
+    def test_create_file_resumable_success(self, mock_from_service_account_file):  # pylint: disable=unused-argument
+        """
+        Test uploading a partially-read stream as a resumable upload.
+        """
+        fake_file_id = 'fake-file-id'
+        http_mock_sequence = HttpMockSequence([
+            # First, a request is made to the discovery API to construct a client object for Drive.
+            ({'status': '200'}, self.mock_discovery_response_content),
+            # Then, a request is made to start the resumable upload session.
+            ({'status': '200', 'location': 'https://www.googleapis.com/upload/fake-session'}, ''),
+            # Finally, the file contents are uploaded in a single chunk.
+            ({'status': '200'}, '{{"id": "{}"}}'.format(fake_file_id)),
+        ])
+        test_client = DriveApi('non-existent-secrets.json', http=http_mock_sequence)
+        file_stream = BytesIO('fake file contents'.encode('ascii'))
+        file_stream.read()
+        uploads = []
+
+        def _media_upload(*args, **kwargs):
+            uploads.append(MediaIoBaseUpload(*args, **kwargs))
+            return uploads[-1]
+
+        with patch('tubular.google_api.MediaIoBaseUpload', side_effect=_media_upload):
+            response = test_client.create_file_in_folder(
+                'fake-folder-id',
+                'Fake Filename',
+                file_stream,
+                'text/plain',
+                resumable=True,
+            )
+        assert response == fake_file_id
+        assert uploads[0].resumable()
+        # The whole stream is uploaded, not just what remained after the caller's read.
+        assert uploads[0].getbytes(0, uploads[0].size()) == b'fake file contents'
+
+    @patch('tubular.google_api.RESUMABLE_UPLOAD_THRESHOLD', 4)
+    @patch('tubular.google_api.service_account.Credentials.from_service_account_file', return_value=None)
+    def test_create_file_resumable_by_size(self, mock_from_service_account_file):  # pylint: disable=unused-argument
+        """
+        Test that only streams larger than the threshold are uploaded resumably by default.
+        """
+        http_mock_sequence = HttpMockSequence([
+            ({'status': '200'}, self.mock_discovery_response_content),
+            ({'status': '200'}, '{"id": "small-file-id"}'),
+            ({'status': '200', 'location': 'https://www.googleapis.com/upload/fake-session'}, ''),
+            ({'status': '200'}, '{"id": "large-file-id"}'),
+        ])
+        test_client = DriveApi('non-existent-secrets.json', http=http_mock_sequence)
+        with patch('tubular.google_api.MediaIoBaseUpload', wraps=MediaIoBaseUpload) as mock_media:
+            small_id = test_client.create_file_in_folder('fake-folder-id', 'small', BytesIO(b'abc'), 'text/plain')
+            large_id = test_client.create_file_in_folder('fake-folder-id', 'large', BytesIO(b'abcdef'), 'text/plain')
+        assert small_id == 'small-file-id'
+        assert large_id == 'large-file-id'
+        assert [call[1]['resumable'] for call in mock_media.call_args_list] == [False, True]
+
     @patch('tubular.google_api.service_account.Credentials.from_service_account_file', return_value=None)
     def test_delete_file_success(self, mock_from_service_account_file):  # pylint: disable=unused-argument
         """
@@ -241,11 +300,6 @@ ETag: "etag/sheep"\r\n\r\n
                 {'status': '200', 'content-type': 'application/json'},
                 json.dumps({'files': fake_files}, default=lambda x: x.isoformat()).encode('utf-8'),
             ),
-            # Then, get_non_csv_files makes another request to list all files.
-            (
-                {'status': '200', 'content-type': 'application/json'},
-                json.dumps({'files': fake_files}, default=lambda x: x.isoformat()).encode('utf-8'),
-            ),
         ])
         with patch.object(DriveApi, 'delete_files', return_value=None) as mock_delete_files:
             test_client = DriveApi('non-existent-secrets.json', http=http_mock_sequence)
@@ -253,6 +307,34 @@ ETag: "etag/sheep"\r\n\r\n
         # Verify that the correct files were requested to be deleted.
         mock_delete_files.assert_called_once_with(['fake-text-file-id-{}'.format(idx) for idx in range(2, 10, 2)])
 
+    @patch('tubular.google_api.service_account.Credentials.from_service_account_file', return_value=None)
+    def test_delete_files_older_than_query(self, mock_from_service_account_file):  # pylint: disable=unused-argument
+        """
+        The age criterion is sent in the listing query, and expired files of other types or prefixes are not deleted.
+        """
+        delete_before = datetime(2020, 1, 2, 3, 4, 5, tzinfo=UTC)
+        created_time = '2019-12-01T00:00:00.000Z'
+        listed = [
+            {'id': 'folder', 'name': 'subfolder', 'mimeType': FOLDER_MIMETYPE, 'createdTime': '2020-06-01T00:00:00Z'},
+            {'id': 'csv', 'name': "o'brien_report.csv", 'mimeType': 'text/csv', 'createdTime': created_time},
+            {'id': 'txt', 'name': "o'brien_report.txt", 'mimeType': 'text/plain', 'createdTime': created_time},
+            {'id': 'word', 'name': "report_o'brien.csv", 'mimeType': 'text/csv', 'createdTime': created_time},
+        ]
+        test_client = DriveApi('non-existent-secrets.json', http=HttpMockSequence([
+            ({'status': '200'}, self.mock_discovery_response_content),
+        ]))
+        with patch.object(test_client, '_list_children', side_effect=[listed, []]) as mock_list:
+            with patch.object(DriveApi, 'delete_files', return_value=None) as mock_delete_files:
+                test_client.delete_files_older_than('top', delete_before, mimetype='text/csv', prefix="o'brien")
+        mock_delete_files.assert_called_once_with(['csv'])
+        self.assertEqual(mock_list.call_count, 2)
+        self.assertEqual(
+            mock_list.call_args_list[0][0][2],
+            "( mimeType = '{}' or (createdTime < '2020-01-02T03:04:05') ) and ".format(
+                FOLDER_MIMETYPE
+            )
+        )
+
     @patch('tubular.google_api.service_account.Credentials.from_service_account_file', return_value=None)
     def test_walk_files_multi_page_all_types(self, mock_from_service_account_file):  # pylint: disable=unused-argument
         """
@@ -478,6 +560,188 @@ ETag: "etag/sheep"\r\n\r\n
             del fake_folder['mimeType']
         six.assertCountEqual(self, response, fake_folders)
 
+    @patch('tubular.google_api.service_account.Credentials.from_service_account_file', return_value=None)
+    # pylint: disable=unused-argument
+    def test_walk_files_combines_sibling_folders(self, mock_from_service_account_file):
+        """
+        Sibling folders are listed together in a single query, and duplicate results are only returned once.
+        """
+        fake_folders = [
+            {'id': 'fake-folder-id-{}'.format(idx), 'name': 'fake-folder-name-{}'.format(idx),
+             'mimeType': FOLDER_MIMETYPE}
+            for idx in range(3)
+        ]
+        fake_csv_files = [
+            {'id': 'fake-csv-file-id-{}'.format(idx), 'name': 'fake-csv-file-name-{}'.format(idx),
+             'mimeType': 'application/csv'}
+            for idx in range(4)
+        ]
+        http_mock_sequence = HttpMockSequence([
+            ({'status': '200'}, self.mock_discovery_response_content),
+            # The top level folder contains three folders.
+            (
+                {'status': '200', 'content-type': 'application/json'},
+                json.dumps({'files': fake_folders}).encode('utf-8'),
+            ),
+            # All three folders are listed by one query.  A file with two parents is returned twice.
+            (
+                {'status': '200', 'content-type': 'application/json'},
+                json.dumps({'files': fake_csv_files + fake_csv_files[:1]}).encode('utf-8'),
+            ),
+        ])
+        test_client = DriveApi('non-existent-secrets.json', http=http_mock_sequence)
+        list_children = test_client._list_children  # pylint: disable=protected-access
+        with patch.object(test_client, '_list_children', wraps=list_children) as mock_list:
+            response = test_client.iter_files('fake-folder-id', mimetype='application/csv')
+            # Results are generated lazily.
+            mock_list.assert_not_called()
+            response = list(response)
+        assert [call[0][0] for call in mock_list.call_args_list] == [
+            ['fake-folder-id'],
+            ['fake-folder-id-0', 'fake-folder-id-1', 'fake-folder-id-2'],
+        ]
+        for fake_file in fake_csv_files:
+            del fake_file['mimeType']
+        six.assertCountEqual(self, response, fake_csv_files)
+
+    @patch('tubular.google_api.WALK_FILES_MAX_PARENTS_PER_QUERY', 2)
+    @patch('tubular.google_api.service_account.Credentials.from_service_account_file', return_value=None)
+    def test_walk_files_concurrent(self, mock_from_service_account_file):  # pylint: disable=unused-argument
+        """
+        Each level of folders is split into groups which are listed concurrently.
+        """
+        tree = {
+            'top': [{'id': 'folder-{}'.format(idx), 'name': 'f', 'mimeType': FOLDER_MIMETYPE} for idx in range(5)],
+        }
+        for idx in range(5):
+            tree['folder-{}'.format(idx)] = [{'id': 'file-{}'.format(idx), 'name': 'n', 'mimeType': 'text/csv'}]
+
+        def _fake_list_children(parent_ids, fields, mimetype_clause='', http=None):  # pylint: disable=unused-argument
+            return [item for parent_id in parent_ids for item in tree[parent_id]]
+
+        test_client = DriveApi('non-existent-secrets.json', http=HttpMockSequence([
+            ({'status': '200'}, self.mock_discovery_response_content),
+        ]))
+        with patch.object(test_client, '_list_children', side_effect=_fake_list_children) as mock_list:
+            response = test_client.walk_files('top', mimetype='text/csv', workers=3)
+        six.assertCountEqual(
+            self, [item['id'] for item in response], ['file-{}'.format(idx) for idx in range(5)]
+        )
+        six.assertCountEqual(self, [call[0][0] for call in mock_list.call_args_list], [
+            ['top'], ['folder-0', 'folder-1'], ['folder-2', 'folder-3'], ['folder-4'],
+        ])
+
+    @patch('tubular.google_api.service_account.Credentials.from_service_account_file', return_value=None)
+    def test_walk_files_metadata_cache(self, mock_from_service_account_file):  # pylint: disable=unused-argument
+        """
+        A second walk with the same cache file only fetches the changes made since the first walk.
+        """
+        subfolder = {'id': 'sub-id', 'name': 'sub', 'mimeType': FOLDER_MIMETYPE, 'parents': ['top-id']}
+        old_file = {'id': 'old-id', 'name': 'old.csv', 'mimeType': 'text/csv', 'parents': ['sub-id'],
+                    'createdTime': '2018-01-01T00:00:00Z'}
+        top_file = {'id': 'top-file-id', 'name': 'top.txt', 'mimeType': 'text/plain', 'parents': ['top-id'],
+                    'createdTime': '2018-01-01T00:00:00Z'}
+        new_file = {'id': 'new-id', 'name': 'new.csv', 'mimeType': 'text/csv', 'parents': ['sub-id'],
+                    'createdTime': '2018-02-01T00:00:00Z'}
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        cache_file = os.path.join(cache_dir, 'drive_cache.json')
+
+        first_run = HttpMockSequence([
+            ({'status': '200'}, self.mock_discovery_response_content),
+            # No page token is cached yet, so one is fetched before listing anything.
+            ({'status': '200', 'content-type': 'application/json'}, b'{"startPageToken": "token-1"}'),
+            # Every child is listed, regardless of the mimetype walked for.
+            (
+                {'status': '200', 'content-type': 'application/json'},
+                json.dumps({'files': [subfolder, top_file]}).encode('utf-8'),
+            ),
+            (
+                {'status': '200', 'content-type': 'application/json'},
+                json.dumps({'files': [old_file]}).encode('utf-8'),
+            ),
+        ])
+        test_client = DriveApi('non-existent-secrets.json', cache_file=cache_file, http=first_run)
+        response = test_client.walk_files('top-id', 'id, name, createdTime', mimetype='text/csv')
+        assert response == [{'id': 'old-id', 'name': 'old.csv', 'createdTime': '2018-01-01T00:00:00Z'}]
+
+        second_run = HttpMockSequence([
+            ({'status': '200'}, self.mock_discovery_response_content),
+            # Only the changes feed is read: a new file was added and the top level file was deleted.
+            (
+                {'status': '200', 'content-type': 'application/json'},
+                json.dumps({
+                    'changes': [
+                        {'fileId': 'new-id', 'removed': False, 'file': new_file},
+                        {'fileId': 'top-file-id', 'removed': True},
+                    ],
+                    'newStartPageToken': 'token-2',
+                }).encode('utf-8'),
+            ),
+        ])
+        test_client = DriveApi('non-existent-secrets.json', cache_file=cache_file, http=second_run)
+        response = test_client.walk_files('top-id', 'id, name, mimeType')
+        six.assertCountEqual(self, response, [
+            {'id': 'sub-id', 'name': 'sub', 'mimeType': FOLDER_MIMETYPE},
+            {'id': 'old-id', 'name': 'old.csv', 'mimeType': 'text/csv'},
+            {'id': 'new-id', 'name': 'new.csv', 'mimeType': 'text/csv'},
+        ])
+        with open(cache_file) as f:
+            assert json.load(f)['page_token'] == 'token-2'
+
+    @patch('tubular.google_api.service_account.Credentials.from_service_account_file', return_value=None)
+    # pylint: disable=unused-argument
+    def test_walk_files_metadata_cache_expired_token(self, mock_from_service_account_file):
+        """
+        A cache whose changes can't be listed is cleared, and the walk lists the folders from Drive.
+        """
+        fresh_file = {'id': 'fresh-id', 'name': 'fresh.csv', 'mimeType': 'text/csv', 'parents': ['top-id']}
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        cache_file = os.path.join(cache_dir, 'drive_cache.json')
+        with open(cache_file, 'w') as f:
+            json.dump({
+                'page_token': 'expired-token',
+                'folders': {'top-id': {'stale-id': {'id': 'stale-id', 'name': 'stale.csv', 'mimeType': 'text/csv'}}},
+            }, f)
+
+        http_mock_sequence = HttpMockSequence([
+            ({'status': '200'}, self.mock_discovery_response_content),
+            ({'status': '404'}, b'{"error": {"code": 404, "message": "Invalid page token"}}'),
+            ({'status': '200', 'content-type': 'application/json'}, b'{"startPageToken": "token-1"}'),
+            (
+                {'status': '200', 'content-type': 'application/json'},
+                json.dumps({'files': [fresh_file]}).encode('utf-8'),
+            ),
+        ])
+        test_client = DriveApi('non-existent-secrets.json', cache_file=cache_file, http=http_mock_sequence)
+        assert test_client.walk_files('top-id', 'id, name') == [{'id': 'fresh-id', 'name': 'fresh.csv'}]
+        with open(cache_file) as f:
+            contents = json.load(f)
+        assert contents['page_token'] == 'token-1'
+        assert list(contents['folders']['top-id']) == ['fresh-id']
+
+    @patch('tubular.google_api.service_account.Credentials.from_service_account_file', return_value=None)
+    # pylint: disable=unused-argument
+    def test_walk_files_metadata_cache_uncached_fields(self, mock_from_service_account_file):
+        """
+        Walks asking for fields the cache does not hold bypass it.
+        """
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        http_mock_sequence = HttpMockSequence([
+            ({'status': '200'}, self.mock_discovery_response_content),
+            (
+                {'status': '200', 'content-type': 'application/json'},
+                json.dumps({'files': [{'id': 'a', 'size': '10', 'mimeType': 'text/csv'}]}).encode('utf-8'),
+            ),
+        ])
+        test_client = DriveApi(
+            'non-existent-secrets.json', cache_file=os.path.join(cache_dir, 'cache.json'), http=http_mock_sequence
+        )
+        assert test_client.walk_files('top-id', 'id, size') == [{'id': 'a', 'size': '10'}]
+        assert not os.path.exists(os.path.join(cache_dir, 'cache.json'))
+
     @patch('tubular.google_api.service_account.Credentials.from_service_account_file', return_value=None)
     def test_comment_files_success(self, mock_from_service_account_file):  # pylint: disable=unused-argument
         """
@@ -596,6 +860,68 @@ ETag: "etag/pony{idx}"\r\n\r\n{{"id": "fake-comment-id{idx}"}}
             },
         )
 
+    @patch('tubular.google_api.service_account.Credentials.from_service_account_file', return_value=None)
+    def test_comment_files_adaptive_batch_size(self, mock_from_service_account_file):
+        """
+        Batches shrink after requests are throttled, and grow back after clean batches.
+        """
+        # pylint: disable=unused-argument,protected-access
+        def _batch_response(statuses):
+            parts = [
+                '''--batch_foobarbaz
+Content-Type: application/http
+Content-Transfer-Encoding: binary
+Content-ID: <response + {idx}>
+
+HTTP/1.1 {status}
+ETag: "etag/pony{idx}"\r\n\r\n{{"id": "fake-comment-id{idx}"}}
+'''.format(idx=idx, status=status)
+                for idx, status in statuses
+            ]
+            return '\n'.join(parts) + '--batch_foobarbaz--'
+
+        batch_headers = {'status': '200', 'content-type': 'multipart/mixed; boundary="batch_foobarbaz"'}
+        http_mock_sequence = HttpMockSequence([
+            ({'status': '200'}, self.mock_discovery_response_content),
+            # First batch of 4: two requests are throttled, so the batch size is halved.
+            (batch_headers, _batch_response([(0, '200 OK'), (1, '200 OK'), (2, '429 Too Many'), (3, '429 Too Many')])),
+            # The two throttled requests are retried cleanly, so the batch size grows by one.
+            (batch_headers, _batch_response([(2, '200 OK'), (3, '200 OK')])),
+            # The remaining three requests fit in one batch.
+            (batch_headers, _batch_response([(0, '200 OK'), (1, '200 OK'), (2, '200 OK')])),
+        ])
+        fake_file_ids = ['fake-file-id{}'.format(n) for n in range(7)]
+        test_client = DriveApi('non-existent-secrets.json', max_batch_size=4, http=http_mock_sequence)
+        with patch('tubular.google_api._backoff_handler'):
+            resp = test_client.create_comments_for_files(list(zip(fake_file_ids, cycle(['some comment message']))))
+        six.assertCountEqual(self, resp, fake_file_ids)
+        self.assertEqual(
+            [(attempt.size, attempt.throttled) for attempt in test_client._batch_sizer.attempts],
+            [(4, 2), (2, 0), (3, 0)],
+        )
+        summary = test_client._batch_sizer.summary()
+        self.assertEqual((summary['batches'], summary['requests'], summary['throttled']), (3, 9, 2))
+
+    @patch('tubular.google_api.service_account.Credentials.from_service_account_file', return_value=None)
+    def test_batch_with_retry_concurrent(self, mock_from_service_account_file):  # pylint: disable=unused-argument
+        """
+        With batch_workers > 1, batches are sent concurrently and all of their responses are collected.
+        """
+        test_client = DriveApi('non-existent-secrets.json', batch_workers=3, http=HttpMockSequence([
+            ({'status': '200'}, self.mock_discovery_response_content),
+        ]))
+        requests = ['request-{}'.format(n) for n in range(25)]
+
+        def _fake_send(batch_requests, http=None):  # pylint: disable=unused-argument
+            return {request: request.upper() for request in batch_requests}
+
+        with patch.object(test_client, '_send_batch_with_retry', side_effect=_fake_send) as mock_send:
+            responses = test_client._batch_with_retry(requests)  # pylint: disable=protected-access
+        self.assertEqual(responses, {request: request.upper() for request in requests})
+        six.assertCountEqual(
+            self, [len(call[0][0]) for call in mock_send.call_args_list], [GOOGLE_API_MAX_BATCH_SIZE] * 2 + [5]
+        )
+
     @patch('tubular.google_api.service_account.Credentials.from_service_account_file', return_value=None)
     def test_comment_files_with_nonexistent_file(self, mock_from_service_account_file):  # pylint: disable=unused-argument
         """
@@ -667,6 +993,64 @@ ETag: "etag/sheep"\r\n\r\n{"id": "fake-comment-id1"}
         with self.assertRaises(ValueError):
             test_client.create_comments_for_files(list(zip(fake_file_ids, cycle(['some comment message']))))
 
+    @patch('tubular.google_api.service_account.Credentials.from_service_account_file', return_value=None)
+    def test_list_comments_for_files(self, mock_from_service_account_file):  # pylint: disable=unused-argument
+        """
+        Test listing comments for several files in a batch, with individual fallbacks for extra pages and failures.
+        """
+        fake_file_ids = ['fake-file-id0', 'fake-file-id1', 'fake-file-id2']
+        batch_response = b'''--batch_foobarbaz
+Content-Type: application/http
+Content-Transfer-Encoding: binary
+Content-ID: <response + 0>
+
+HTTP/1.1 200 OK
+Content-Type: application/json
+ETag: "etag/pony"\r\n\r\n{"comments": [{"content": "first comment"}]}
+
+--batch_foobarbaz
+Content-Type: application/http
+Content-Transfer-Encoding: binary
+Content-ID: <response + 1>
+
+HTTP/1.1 200 OK
+Content-Type: application/json
+ETag: "etag/sheep"\r\n\r\n{"comments": [{"content": "page one"}], "nextPageToken": "fake-next-page-token"}
+
+--batch_foobarbaz
+Content-Type: application/http
+Content-Transfer-Encoding: binary
+Content-ID: <response + 2>
+
+HTTP/1.1 404 NOT FOUND
+Content-Type: application/json
+ETag: "etag/bird"\r\n\r\n{"error": {"code": 404, "message": "File not found: fake-file-id2."}}
+--batch_foobarbaz--'''
+        http_mock_sequence = HttpMockSequence([
+            # First, a request is made to the discovery API to construct a client object for Drive.
+            ({'status': '200'}, self.mock_discovery_response_content),
+            # Then, the first page of comments for all files is requested in one batch.
+            ({'status': '200', 'content-type': 'multipart/mixed; boundary="batch_foobarbaz"'}, batch_response),
+            # The file with more pages is listed individually from the start.
+            (
+                {'status': '200', 'content-type': 'application/json'},
+                json.dumps({'comments': [{'content': 'page one'}], 'nextPageToken': 'token'}).encode('utf-8'),
+            ),
+            (
+                {'status': '200', 'content-type': 'application/json'},
+                json.dumps({'comments': [{'content': 'page two'}]}).encode('utf-8'),
+            ),
+            # The file which failed in the batch is listed individually, and is not found.
+            ({'status': '404'}, json.dumps({'error': {'code': 404, 'message': 'Not found'}}).encode('utf-8')),
+        ])
+        test_client = DriveApi('non-existent-secrets.json', http=http_mock_sequence)
+        resp = test_client.list_comments_for_files(fake_file_ids, fields='content')
+        assert resp == {
+            'fake-file-id0': [{'content': 'first comment'}],
+            'fake-file-id1': [{'content': 'page one'}, {'content': 'page two'}],
+            'fake-file-id2': [],
+        }
+
     @patch('tubular.google_api.service_account.Credentials.from_service_account_file', return_value=None)
     def test_list_permissions_success(self, mock_from_service_account_file):  # pylint: disable=unused-argument
         """
@@ -776,51 +1160,6 @@ ETag: "etag/bird"\r\n\r\n{
             assert sum('Successfully processed request' in msg for msg in captured_logs.output) == 2
             assert sum('Error processing request' in msg for msg in captured_logs.output) == 1
 
-    @patch('tubular.google_api.service_account.Credentials.from_service_account_file', return_value=None)
-    def test_get_non_csv_files_filters_correctly(self, mock_from_service_account_file):  # pylint: disable=unused-argument
-        """
-        Test that get_non_csv_files returns non-CSV files and excludes CSV files and folders.
-        """
-        http_mock_sequence = HttpMockSequence([
-            ({'status': '200'}, self.mock_discovery_response_content),
-        ])
-        test_client = DriveApi('non-existent-secrets.json', http=http_mock_sequence)
-        
-        # Mock walk_files to return mixed file types
-        mock_files = [
-            {'id': 'file1', 'name': 'report.csv', 'mimeType': 'text/csv'},
-            {'id': 'file2', 'name': 'document.pdf', 'mimeType': 'application/pdf'},
-            {'id': 'folder1', 'name': 'MyFolder', 'mimeType': FOLDER_MIMETYPE},
-            {'id': 'file3', 'name': 'image.png', 'mimeType': 'image/png'},
-        ]
-        
-        with patch.object(test_client, 'walk_files', return_value=mock_files):
-            result = test_client.get_non_csv_files('test-folder-id', 'text/csv')
-        
-        # Should return only the PDF and PNG files, excluding CSV and folder
-        self.assertEqual(len(result), 2)
-        self.assertEqual(result[0]['name'], 'document.pdf')
-        self.assertEqual(result[1]['name'], 'image.png')
-
-    @patch('tubular.google_api.service_account.Credentials.from_service_account_file', return_value=None)
-    def test_get_non_csv_files_calls_walk_files(self, mock_from_service_account_file):  # pylint: disable=unused-argument
-        """
-        Test that get_non_csv_files calls walk_files with the correct folder ID.
-        """
-        http_mock_sequence = HttpMockSequence([
-            ({'status': '200'}, self.mock_discovery_response_content),
-        ])
-        test_client = DriveApi('non-existent-secrets.json', http=http_mock_sequence)
-        
-        with patch.object(test_client, 'walk_files', return_value=[]) as mock_walk:
-            test_client.get_non_csv_files('my-folder-id', 'application/pdf')
-            mock_walk.assert_called_once_with(
-                'my-folder-id',
-                file_fields='id, name, mimeType, createdTime',
-                mimetype=None,
-                recurse=True
-            )
-
     @patch('tubular.google_api.service_account.Credentials.from_service_account_file', return_value=None)
     def test_list_comments_single_page(self, mock_from_service_account_file):  # pylint: disable=unused-argument
         """
@@ -39,6 +39,7 @@ class TestHubspot(unittest.TestCase):
     def _mock_get_vid(self, req_mock, status_code):
         req_mock.get(
             hubspot_api.GET_VID_FROM_EMAIL_URL_TEMPLATE.format(
+                base_url=hubspot_api.HUBSPOT_BASE_URL,
                 email=self.test_learner['original_email']
             ),
             json={'vid': self.test_vid},
@@ -48,6 +49,7 @@ class TestHubspot(unittest.TestCase):
     def _mock_delete(self, req_mock, status_code):
         req_mock.delete(
             hubspot_api.DELETE_USER_FROM_VID_TEMPLATE.format(
+                base_url=hubspot_api.HUBSPOT_BASE_URL,
                 vid=self.test_vid
             ),
             json={},
@@ -0,0 +1,165 @@
+"""
+Tests of the instrumentation of outbound HTTP calls.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+import requests
+import requests_mock
+
+from tubular.utils import instrumentation
+from tubular.utils.retry import retry
+
+
+class FakeSink:
+    """
+    Sink which keeps the recorded events.
+    """
+    def __init__(self):
+        self.events = []
+
+    def record(self, event):
+        self.events.append(event)
+
+
+class TestInstrumentation(unittest.TestCase):
+    """
+    Tests of the HTTP hooks, retry recording and sinks.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.sink = FakeSink()
+        instrumentation.set_sink(self.sink)
+        self.addCleanup(instrumentation.set_sink, None)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+    def test_endpoint_name(self):
+        self.assertEqual(
+            instrumentation.endpoint_name('https://lms.invalid/api/user/v1/accounts/1234/retire?x=1'),
+            'lms.invalid/api/user/v1/accounts/{id}/retire'
+        )
+        self.assertEqual(
+            instrumentation.endpoint_name('https://asgard.invalid/task/0123456789abcdef0123.json'),
+            'asgard.invalid/task/0123456789abcdef0123.json'
+        )
+        self.assertEqual(
+            instrumentation.endpoint_name('https://x.invalid/profiles/1b4e28ba-2fa1-11d2-883f-0016d3cca427'),
+            'x.invalid/profiles/{id}'
+        )
+
+    def test_http_hooks_record_response(self):
+        with requests_mock.Mocker() as mocker:
+            mocker.post('https://api.invalid/users/42/delete', text='{"ok": true}', status_code=201)
+            requests.post(
+                'https://api.invalid/users/42/delete', json={'a': 1}, hooks=instrumentation.http_hooks('braze')
+            )
+
+        self.assertEqual(len(self.sink.events), 1)
+        event = self.sink.events[0]
+        self.assertEqual(event['type'], 'http')
+        self.assertEqual(event['client'], 'braze')
+        self.assertEqual(event['method'], 'POST')
+        self.assertEqual(event['endpoint'], 'api.invalid/users/{id}/delete')
+        self.assertEqual(event['status'], 201)
+        self.assertEqual(event['request_bytes'], len(b'{"a": 1}'))
+        self.assertEqual(event['response_bytes'], len(b'{"ok": true}'))
+
+    def test_no_sink(self):
+        instrumentation.set_sink(None)
+        with requests_mock.Mocker() as mocker:
+            mocker.get('https://api.invalid/', text='ok')
+            response = requests.get('https://api.invalid/', hooks=instrumentation.http_hooks('slack'))
+        self.assertEqual(response.text, 'ok')
+        instrumentation.record_retry('slack', 'send_message', 1)
+        self.assertEqual(self.sink.events, [])
+
+    def test_failing_sink(self):
+        sink = mock.Mock()
+        sink.record.side_effect = OSError('disk full')
+        instrumentation.set_sink(sink)
+        with requests_mock.Mocker() as mocker:
+            mocker.get('https://api.invalid/', text='ok')
+            response = requests.get('https://api.invalid/', hooks=instrumentation.http_hooks('slack'))
+        self.assertEqual(response.text, 'ok')
+
+    def test_retry_decorator_records_retries(self):
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) == 1:
+                raise ValueError('first attempt fails')
+            return 'done'
+
+        with mock.patch.dict(os.environ, {'TUBULAR_RETRY_ENABLED': 'true'}):
+            self.assertEqual(retry(attempts=1, delay_seconds=0)(flaky)(), 'done')
+        self.assertEqual(len(self.sink.events), 1)
+        event = self.sink.events[0]
+        self.assertEqual(event['type'], 'retry')
+        self.assertEqual(event['client'], 'test_instrumentation')
+        self.assertEqual(event['endpoint'], 'flaky')
+
+    def test_backoff_recorder(self):
+        def delete_user():
+            pass
+
+        retries = instrumentation.retry_count()
+        instrumentation.backoff_recorder('hubspot')({'target': delete_user, 'wait': 2.5, 'tries': 1})
+        self.assertEqual(instrumentation.retry_count(), retries + 1)
+        self.assertEqual(self.sink.events[0]['client'], 'hubspot')
+        self.assertEqual(self.sink.events[0]['endpoint'], 'delete_user')
+        self.assertEqual(self.sink.events[0]['wait_seconds'], 2.5)
+
+    def test_json_lines_sink(self):
+        path = os.path.join(self.tmp_dir, 'http.jsonl')
+        instrumentation.set_sink(instrumentation.sink_from_spec('jsonl:' + path))
+        instrumentation.record_retry('edx_api', 'retire', 1)
+        instrumentation.record_retry('edx_api', 'retire', 2)
+        with open(path) as events_file:
+            events = [json.loads(line) for line in events_file]
+        self.assertEqual([event['wait_seconds'] for event in events], [1, 2])
+
+    def test_statsd_sink(self):
+        sink = instrumentation.sink_from_spec('statsd:localhost:9125')
+        self.assertEqual(sink.address, ('localhost', 9125))
+        with mock.patch.object(sink, '_socket') as mock_socket:
+            sink.record({
+                'type': 'http', 'client': 'edx_api', 'method': 'GET', 'endpoint': 'lms.invalid/api/{id}',
+                'status': 200, 'seconds': 0.25, 'request_bytes': 0, 'response_bytes': 10,
+            })
+        payload = mock_socket.sendto.call_args[0][0].decode('utf-8')
+        self.assertIn('tubular.http.edx_api.lms.invalid.api._id_.200.latency:250.0|ms', payload.split('\n'))
+        self.assertIn('tubular.http.edx_api.lms.invalid.api._id_.bytes_received:10|c', payload.split('\n'))
+
+    def test_prometheus_textfile_sink(self):
+        path = os.path.join(self.tmp_dir, 'http.prom')
+        with mock.patch.object(instrumentation.atexit, 'register'):
+            sink = instrumentation.PrometheusTextfileSink(path, write_interval=3600)
+        for seconds in (0.07, 3):
+            sink.record({
+                'type': 'http', 'client': 'asgard', 'method': 'GET', 'endpoint': 'asgard.invalid/task',
+                'status': 200, 'seconds': seconds, 'request_bytes': 5, 'response_bytes': 10,
+            })
+        sink.record({'type': 'retry', 'client': 'asgard', 'endpoint': 'wait_for_task', 'wait_seconds': 1})
+        sink.write()
+        with open(path) as metrics_file:
+            lines = metrics_file.read().splitlines()
+
+        labels = 'client="asgard",method="GET",endpoint="asgard.invalid/task",status="200"'
+        self.assertIn('tubular_http_request_duration_seconds_bucket{{{},le="0.05"}} 0'.format(labels), lines)
+        self.assertIn('tubular_http_request_duration_seconds_bucket{{{},le="0.1"}} 1'.format(labels), lines)
+        self.assertIn('tubular_http_request_duration_seconds_bucket{{{},le="+Inf"}} 2'.format(labels), lines)
+        self.assertIn('tubular_http_request_duration_seconds_count{{{}}} 2'.format(labels), lines)
+        self.assertIn('tubular_http_sent_bytes_total{client="asgard",endpoint="asgard.invalid/task"} 10', lines)
+        self.assertIn('tubular_http_retries_total{client="asgard",endpoint="wait_for_task"} 1', lines)
+
+    def test_unknown_sink(self):
+        with self.assertRaises(ValueError):
+            instrumentation.sink_from_spec('carrier-pigeon:coop')
@@ -0,0 +1,259 @@
+"""
+Test the replace_usernames.py script
+"""
+
+import csv
+
+from click.testing import CliRunner
+from mock import patch
+import yaml
+
+from tubular.scripts.replace_usernames import replace_usernames
+
+TEST_CONFIG_FILENAME = 'test_config.yml'
+TEST_CSV_FILENAME = 'test_usernames.csv'
+TEST_LEDGER_FILENAME = 'test_usernames.ledger'
+RESULTS_FILENAME = 'username_replacement_results.csv'
+
+
+def _fake_replacement_method(failed_usernames=(), raise_for=None):
+    """
+    Return a fake replacement method which fails the given original usernames, and replaces the rest.  It raises
+    if sent the raise_for original username.
+    """
+    def replacement_method(username_mappings):
+        if any(raise_for in mapping for mapping in username_mappings):
+            raise Exception('Fake service failure')
+        response = {'successful_replacements': [], 'failed_replacements': []}
+        for mapping in username_mappings:
+            status = 'failed' if list(mapping.keys())[0] in failed_usernames else 'successful'
+            response['{}_replacements'.format(status)].append(mapping)
+        return response
+    return replacement_method
+
+
+def _call_script(mappings, extra_args=None, extra_config=None, ledger=None, earlier_results=None):
+    """
+    Call the username replacement script with the given mappings.
+
+    If ledger is given, it's written to a ledger file passed to the script, along with any earlier_results rows.
+
+    Returns:
+        tuple of the CliRunner.invoke result, the rows of the results CSV and the ledger file contents
+    """
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        extra_args = list(extra_args or [])
+        if ledger is not None:
+            with open(TEST_LEDGER_FILENAME, 'w') as ledger_f:
+                ledger_f.write(ledger)
+            extra_args += ['--ledger_file', TEST_LEDGER_FILENAME]
+        if earlier_results is not None:
+            with open(RESULTS_FILENAME, 'w') as results_f:
+                csv.writer(results_f).writerows(earlier_results)
+        with open(TEST_CONFIG_FILENAME, 'w') as config_f:
+            yaml.safe_dump(dict({
+                'client_id': 'bogus id',
+                'client_secret': 'supersecret',
+                'base_urls': {
+                    'lms': 'https://stage-edx-edxapp.edx.invalid/',
+                    'ecommerce': 'https://stage-edx-ecommerce.edx.invalid/',
+                    'discovery': 'https://stage-edx-discovery.edx.invalid/',
+                    'credentials': 'https://stage-edx-credentials.edx.invalid/',
+                },
+            }, **(extra_config or {})), config_f)
+        with open(TEST_CSV_FILENAME, 'w') as csv_f:
+            csv.writer(csv_f).writerows(mappings)
+
+        result = runner.invoke(
+            replace_usernames,
+            args=['--config_file', TEST_CONFIG_FILENAME, '--username_replacement_csv', TEST_CSV_FILENAME] + extra_args
+        )
+        print(result)
+        print(result.output)
+        with open(RESULTS_FILENAME) as results_f:
+            rows = list(csv.reader(results_f))
+        ledger_contents = None
+        if ledger is not None:
+            with open(TEST_LEDGER_FILENAME) as ledger_f:
+                ledger_contents = ledger_f.read()
+    return result, rows, ledger_contents
+
+
+def _patch_services(lms_failures=(), ecommerce_failures=(), forums_failures=(), lms_raise_for=None,
+                    ecommerce_raise_for=None):
+    """
+    Patch the service API clients with fake replacement methods which fail the given original usernames, or raise
+    for the given raise_for ones.
+    """
+    patchers = [
+        patch('tubular.edx_api.BaseApiClient.get_access_token', return_value='THIS_IS_A_JWT'),
+        patch(
+            'tubular.edx_api.LmsApi.replace_lms_usernames',
+            side_effect=_fake_replacement_method(lms_failures, lms_raise_for)
+        ),
+        patch('tubular.edx_api.LmsApi.replace_forums_usernames', side_effect=_fake_replacement_method(forums_failures)),
+        patch(
+            'tubular.edx_api.EcommerceApi.replace_usernames',
+            side_effect=_fake_replacement_method(ecommerce_failures, ecommerce_raise_for)
+        ),
+        patch('tubular.edx_api.DiscoveryApi.replace_usernames', side_effect=_fake_replacement_method()),
+        patch('tubular.edx_api.CredentialsApi.replace_usernames', side_effect=_fake_replacement_method()),
+    ]
+    return [patcher.start() for patcher in patchers], patchers
+
+
+def _run_with_services(mappings, script_kwargs=None, **failures):
+    """
+    Call the script with patched services.
+
+    Returns:
+        tuple of the script result, the results CSV rows, the ledger file contents and the mocks
+    """
+    mocks, patchers = _patch_services(**failures)
+    try:
+        result, rows, ledger = _call_script(mappings, **(script_kwargs or {}))
+    finally:
+        for patcher in patchers:
+            patcher.stop()
+    return result, rows, ledger, mocks
+
+
+def test_successful_replacement():
+    mappings = [['user{}'.format(n), 'new_user{}'.format(n)] for n in range(5)]
+    result, rows, _, mocks = _run_with_services(mappings)
+
+    assert result.exit_code == 0
+    assert rows[0] == ['Original Username', 'New Username', 'Status']
+    assert rows[1:] == [mapping + ['SUCCESS'] for mapping in mappings]
+    # Without a chunk size, each service is called once with every mapping.
+    lms_mock = mocks[1]
+    lms_mock.assert_called_once_with([{old: new} for old, new in mappings])
+
+
+def test_failures_stop_later_services():
+    mappings = [['user{}'.format(n), 'new_user{}'.format(n)] for n in range(4)]
+    result, rows, _, mocks = _run_with_services(mappings, lms_failures=['user0'], ecommerce_failures=['user1'])
+
+    assert result.exit_code == -1
+    assert sorted(rows[1:]) == [
+        ['user0', 'new_user0', 'FAILED'],
+        ['user1', 'new_user1', 'PARTIALLY FAILED'],
+        ['user2', 'new_user2', 'SUCCESS'],
+        ['user3', 'new_user3', 'SUCCESS'],
+    ]
+    # The replacement which failed in ecommerce is not sent on to the forums.
+    forums_mock = mocks[2]
+    forums_mock.assert_called_once_with([{'user2': 'new_user2'}, {'user3': 'new_user3'}])
+
+
+def test_concurrent_chunked_replacement():
+    mappings = [['user{}'.format(n), 'new_user{}'.format(n)] for n in range(10)]
+    result, rows, _, mocks = _run_with_services(
+        mappings,
+        script_kwargs={'extra_args': ['--chunk_size', '3', '--workers', '4']},
+        lms_failures=['user0'],
+        ecommerce_failures=['user4'],
+        forums_failures=['user7'],
+    )
+
+    assert result.exit_code == -1
+    expected_statuses = {'user0': 'FAILED', 'user4': 'PARTIALLY FAILED', 'user7': 'PARTIALLY FAILED'}
+    assert sorted(rows[1:]) == sorted(
+        [old, new, expected_statuses.get(old, 'SUCCESS')] for old, new in mappings
+    )
+    # Every service is called once per chunk.
+    for mock in mocks[1:]:
+        assert mock.call_count == 4
+    # With concurrent services, every service is sent the replacements which succeeded in LMS.
+    forums_mock = mocks[2]
+    assert {'user4': 'new_user4'} in [mapping for call in forums_mock.call_args_list for mapping in call[0][0]]
+
+
+def test_concurrent_service_raises():
+    mappings = [['user{}'.format(n), 'new_user{}'.format(n)] for n in range(6)]
+    result, rows, ledger, _ = _run_with_services(
+        mappings,
+        script_kwargs={'extra_args': ['--chunk_size', '2', '--workers', '2'], 'ledger': ''},
+        ecommerce_raise_for='user2',
+    )
+
+    # LMS already replaced the chunk's usernames, so they are partially failed rather than replayed on resume.
+    assert result.exit_code == -1
+    assert sorted(rows[1:]) == sorted(
+        [old, new, 'PARTIALLY FAILED' if old in ('user2', 'user3') else 'SUCCESS'] for old, new in mappings
+    )
+    assert sorted(ledger.splitlines()) == ['0,2,0,0', '2,2,2,0', '4,2,0,0']
+
+
+def test_concurrent_lms_raises():
+    mappings = [['user{}'.format(n), 'new_user{}'.format(n)] for n in range(4)]
+    result, rows, ledger, _ = _run_with_services(
+        mappings,
+        script_kwargs={'extra_args': ['--chunk_size', '2', '--workers', '2'], 'ledger': ''},
+        lms_raise_for='user0',
+    )
+
+    # The chunk in flight alongside the failed one is still recorded; the failed one is left for a resumed run.
+    assert result.exit_code == 1
+    assert rows[1:] == [['user2', 'new_user2', 'SUCCESS'], ['user3', 'new_user3', 'SUCCESS']]
+    assert ledger == '2,2,0,0\n'
+
+
+def test_per_service_chunk_sizes():
+    mappings = [['user{}'.format(n), 'new_user{}'.format(n)] for n in range(5)]
+    result, _, _, mocks = _run_with_services(mappings, script_kwargs={
+        'extra_args': ['--chunk_size', '4'],
+        'extra_config': {'chunk_sizes': {'ecommerce': 2}},
+    })
+
+    assert result.exit_code == 0
+    lms_mock, ecommerce_mock = mocks[1], mocks[3]
+    assert [len(call[0][0]) for call in lms_mock.call_args_list] == [4, 1]
+    assert [len(call[0][0]) for call in ecommerce_mock.call_args_list] == [2, 2, 1]
+
+
+def test_ledger_records_chunks():
+    mappings = [['user{}'.format(n), 'new_user{}'.format(n)] for n in range(5)]
+    result, _, ledger, _ = _run_with_services(
+        mappings, script_kwargs={'extra_args': ['--chunk_size', '2'], 'ledger': ''}, ecommerce_failures=['user3']
+    )
+
+    assert result.exit_code == -1
+    assert ledger == '0,2,0,0\n2,2,1,0\n4,1,0,0\n'
+
+
+def test_ledger_resume():
+    mappings = [['user{}'.format(n), 'new_user{}'.format(n)] for n in range(6)]
+    earlier_results = [
+        ['Original Username', 'New Username', 'Status'],
+        ['user0', 'new_user0', 'SUCCESS'],
+        ['user1', 'new_user1', 'SUCCESS'],
+        ['user4', 'new_user4', 'SUCCESS'],
+    ]
+    result, rows, ledger, mocks = _run_with_services(mappings, script_kwargs={
+        'extra_args': ['--chunk_size', '5'],
+        'ledger': '0,2,0,0\n4,1,0,0\n',
+        'earlier_results': earlier_results,
+    })
+
+    assert result.exit_code == 0
+    # Only the rows missing from the ledger are replaced, in chunks of consecutive rows.
+    lms_mock = mocks[1]
+    assert [call[0][0] for call in lms_mock.call_args_list] == [
+        [{'user2': 'new_user2'}, {'user3': 'new_user3'}],
+        [{'user5': 'new_user5'}],
+    ]
+    assert rows == earlier_results + [
+        ['user2', 'new_user2', 'SUCCESS'], ['user3', 'new_user3', 'SUCCESS'], ['user5', 'new_user5', 'SUCCESS'],
+    ]
+    assert ledger == '0,2,0,0\n4,1,0,0\n2,2,0,0\n5,1,0,0\n'
+
+
+def test_ledger_resume_keeps_earlier_failures():
+    mappings = [['user{}'.format(n), 'new_user{}'.format(n)] for n in range(2)]
+    result, _, _, mocks = _run_with_services(mappings, script_kwargs={'ledger': '0,2,1,0\n'})
+
+    # Nothing is left to replace, but the earlier run's failures still fail the script.
+    assert result.exit_code == -1
+    assert not mocks[1].called
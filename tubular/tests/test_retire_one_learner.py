@@ -2,6 +2,8 @@
 Test the retire_one_learner.py script
 """
 
+import json
+
 from click.testing import CliRunner
 from mock import DEFAULT, patch
 
@@ -14,6 +16,7 @@ from tubular.scripts.retire_one_learner import (
     ERR_UNKNOWN_STATE,
     ERR_USER_AT_END_STATE,
     ERR_USER_IN_WORKING_STATE,
+    ERR_WHILE_RETIRING,
     retire_learner
 )
 from tubular.tests.retirement_helpers import (
@@ -416,3 +419,50 @@ def test_get_segment_id_error(*args, **kwargs):
     assert result.exit_code == ERR_SETUP_FAILED
     assert 'Unexpected error fetching Ecommerce tracking id!' in result.output
     assert test_exception_message in result.output
+
+
+@patch('tubular.edx_api.BaseApiClient.get_access_token')
+@patch.multiple(
+    'tubular.edx_api.LmsApi',
+    get_learner_retirement_state=DEFAULT,
+    update_learner_retirement_state=DEFAULT,
+    retirement_retire_forum=DEFAULT,
+    retirement_retire_mailings=DEFAULT,
+    retirement_unenroll=DEFAULT,
+    retirement_lms_retire=DEFAULT
+)
+def test_state_timings(*args, **kwargs):
+    username = 'test_username'
+
+    mock_get_access_token = args[0]
+    mock_get_retirement_state = kwargs['get_learner_retirement_state']
+    mock_unenroll = kwargs['retirement_unenroll']
+
+    mock_get_access_token.return_value = ('THIS_IS_A_JWT', None)
+    mock_get_retirement_state.return_value = get_fake_user_retirement(
+        original_username=username,
+        current_state_name='EMAIL_LISTS_COMPLETE'
+    )
+    mock_unenroll.side_effect = Exception('Unenrollment failed')
+
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open('test_config.yml', 'w') as f:
+            fake_config_file(f)
+        result = runner.invoke(retire_learner, args=[
+            '--username', username, '--config_file', 'test_config.yml', '--user_id', '9009',
+            '--timings_file', 'timings.jsonl',
+        ])
+        with open('timings.jsonl') as timings_f:
+            timings = [json.loads(line) for line in timings_f]
+
+    assert result.exit_code == ERR_WHILE_RETIRING
+    # Only the state which was run is recorded, with its outcome.
+    assert len(timings) == 1
+    assert timings[0]['user_id'] == '9009'
+    assert timings[0]['state'] == 'RETIRING_ENROLLMENTS'
+    assert timings[0]['service'] == 'LMS'
+    assert timings[0]['outcome'] == 'error'
+    assert 'Unenrollment failed' in timings[0]['error']
+    assert timings[0]['retries'] == 0
+    assert timings[0]['duration_seconds'] >= 0
@@ -4,15 +4,17 @@ Test the retire_one_learner.py script
 """
 
 
+from collections import OrderedDict
 import csv
 import os
+import tempfile
 import unicodedata
 from datetime import date, datetime, timedelta
 import time
 
 import pytest
 from click.testing import CliRunner
-from mock import DEFAULT, patch
+from mock import DEFAULT, Mock, patch
 from pytz import UTC
 from six import PY2, itervalues
 
@@ -21,6 +23,7 @@ from tubular.scripts.retirement_partner_report import (
     ERR_BAD_CONFIG,
     ERR_BAD_SECRETS,
     ERR_CLEANUP,
+    ERR_DRIVE_UPLOAD,
     ERR_FETCHING_LEARNERS,
     ERR_MISSING_POC,
     ERR_NO_CONFIG,
@@ -31,6 +34,7 @@ from tubular.scripts.retirement_partner_report import (
     ERR_UNKNOWN_ORG,
     ERR_DRIVE_LISTING,
     DELETION_WARNING_PHRASE,
+    InMemoryReport,
     LEARNER_CREATED_KEY,
     LEARNER_ORIGINAL_USERNAME_KEY,
     ORGS_CONFIG_FIELD_HEADINGS_KEY,
@@ -43,7 +47,11 @@ from tubular.scripts.retirement_partner_report import (
     generate_report,
     _generate_report_files_or_exit,  # pylint: disable=protected-access
     _get_orgs_and_learners_or_exit,  # pylint: disable=protected-access
+    _group_learners_by_partner_or_exit,  # pylint: disable=protected-access
     _check_and_notify_about_expiring_files,  # pylint: disable=protected-access
+    _get_partner_emails,  # pylint: disable=protected-access
+    _run_for_partners,  # pylint: disable=protected-access
+    _push_files_to_google,  # pylint: disable=protected-access
 )
 
 from tubular.tests.retirement_helpers import fake_config_file, fake_google_secrets_file, flatten_partner_list, FAKE_ORGS, TEST_PLATFORM_NAME
@@ -72,7 +80,8 @@ DEFAULT_FIELD_VALUES = {
 }
 
 
-def _call_script(expect_success=True, expected_num_rows=10, config_orgs=None, expected_fields=None, exempted_partners=None):
+def _call_script(expect_success=True, expected_num_rows=10, config_orgs=None, expected_fields=None, exempted_partners=None,
+                 extra_args=None):
     """
     Call the retired learner script with the given username and a generic, temporary config file.
     Returns the CliRunner.invoke results
@@ -101,7 +110,7 @@ def _call_script(expect_success=True, expected_num_rows=10, config_orgs=None, ex
                 TEST_GOOGLE_SECRETS_FILENAME,
                 '--output_dir',
                 tmp_output_dir
-            ]
+            ] + (extra_args or [])
         )
 
         print(result)
@@ -214,6 +223,48 @@ def test_report_generation_multiple_partners(*args, **kwargs):
     assert orgs['Org2X'] == orgs['Org2Xb']
 
 
+def test_group_learners_by_partner():
+    config = {
+        'org_partner_mapping': {
+            'org1': ['Org1X'],
+            'org2': ['Org2X', 'Org2Xb'],
+            'orgCustom': ['CustomX'],
+        }
+    }
+    learners = [
+        _fake_retirement_report_user(1, user_orgs=['org1', 'org2']),
+        _fake_retirement_report_user(2, user_orgs=['org2'], user_orgs_config=[TEST_ORGS_CONFIG[0]]),
+    ]
+
+    partners = _group_learners_by_partner_or_exit(config, learners)
+
+    assert sorted(partners) == ['CustomX', 'Org1X', 'Org2X', 'Org2Xb']
+    # Learners are shared by reference, not copied per partner.
+    assert partners['Org1X'][ORGS_CONFIG_LEARNERS_KEY][0] is learners[0]
+    assert partners['Org2X'][ORGS_CONFIG_LEARNERS_KEY] == learners
+    assert partners['CustomX'][ORGS_CONFIG_LEARNERS_KEY] == [learners[1]]
+    assert partners['Org1X'][ORGS_CONFIG_FIELD_HEADINGS_KEY] == DEFAULT_FIELD_HEADINGS
+    assert partners['CustomX'][ORGS_CONFIG_FIELD_HEADINGS_KEY] == TEST_ORGS_CONFIG[0][ORGS_CONFIG_FIELD_HEADINGS_KEY]
+    assert all(learner['deletion_completed'] == DELETION_TIME for learner in learners)
+
+
+def test_group_learners_by_partner_unknown_orgs(capsys):
+    config = {'org_partner_mapping': {'org1': ['Org1X']}}
+    learners = [
+        _fake_retirement_report_user(1, user_orgs=['org1', 'missingOrg']),
+        _fake_retirement_report_user(2, user_orgs_config=[TEST_ORGS_CONFIG[1]]),
+    ]
+
+    with pytest.raises(SystemExit) as exit_info:
+        _group_learners_by_partner_or_exit(config, learners)
+
+    assert exit_info.value.code == ERR_UNKNOWN_ORG
+    # Both the standard and custom orgs missing a mapping are reported together.
+    output = capsys.readouterr().out
+    assert 'missingOrg' in output
+    assert 'otherCustomOrg' in output
+
+
 @patch('tubular.google_api.DriveApi.__init__')
 @patch('tubular.google_api.DriveApi.create_file_in_folder')
 @patch('tubular.google_api.DriveApi.walk_files')
@@ -894,6 +945,221 @@ def test_google_unicode_folder_names(*args, **kwargs):
     assert 'All reports completed and uploaded to Google.' in result.output
 
 
+@patch('tubular.google_api.DriveApi.__init__')
+@patch('tubular.google_api.DriveApi.create_file_in_folder')
+@patch('tubular.google_api.DriveApi.walk_files')
+@patch('tubular.google_api.DriveApi.list_permissions_for_files')
+@patch('tubular.google_api.DriveApi.create_comments_for_files')
+@patch('tubular.edx_api.BaseApiClient.get_access_token')
+@patch.multiple(
+    'tubular.edx_api.LmsApi',
+    retirement_partner_report=DEFAULT,
+    retirement_partner_cleanup=DEFAULT
+)
+def test_successful_report_concurrent(*args, **kwargs):
+    mock_get_access_token = args[0]
+    mock_list_permissions = args[2]
+    mock_walk_files = args[3]
+    mock_create_files = args[4]
+    mock_driveapi = args[5]
+    mock_retirement_report = kwargs['retirement_partner_report']
+    mock_retirement_cleanup = kwargs['retirement_partner_cleanup']
+
+    partners = flatten_partner_list(FAKE_ORGS.values())
+    mock_get_access_token.return_value = ('THIS_IS_A_JWT', None)
+    mock_list_permissions.return_value = {
+        'folder' + partner: [{'emailAddress': 'some.contact@example.com'}] for partner in partners
+    }
+    mock_walk_files.return_value = [{'name': partner, 'id': 'folder' + partner} for partner in partners]
+    # Return the uploaded filename as the file id, since upload order is not deterministic.
+    mock_create_files.side_effect = lambda folder_id, filename, f, mimetype: 'id_' + filename
+    mock_driveapi.return_value = None
+    mock_retirement_report.return_value = _fake_retirement_report(user_orgs=list(FAKE_ORGS.keys()))
+
+    result = _call_script(extra_args=['--workers', '4'])
+
+    assert mock_create_files.call_count == 4
+    assert {call[0][0] for call in mock_create_files.call_args_list} == {'folder' + partner for partner in partners}
+    assert 'Drive upload summary: 4 succeeded, 0 failed.' in result.output
+    mock_retirement_cleanup.assert_called_once()
+
+
+@patch('tubular.google_api.DriveApi.__init__')
+@patch('tubular.google_api.DriveApi.create_file_in_folder')
+@patch('tubular.google_api.DriveApi.walk_files')
+@patch('tubular.edx_api.BaseApiClient.get_access_token')
+@patch.multiple(
+    'tubular.edx_api.LmsApi',
+    retirement_partner_report=DEFAULT,
+    retirement_partner_cleanup=DEFAULT
+)
+def test_concurrent_upload_failure(*args, **kwargs):
+    mock_get_access_token = args[0]
+    mock_walk_files = args[1]
+    mock_create_files = args[2]
+    mock_driveapi = args[3]
+    mock_retirement_report = kwargs['retirement_partner_report']
+    mock_retirement_cleanup = kwargs['retirement_partner_cleanup']
+
+    partners = flatten_partner_list(FAKE_ORGS.values())
+
+    def _fake_upload(folder_id, filename, f, mimetype):  # pylint: disable=unused-argument
+        if folder_id == 'folderOrg2X':
+            raise Exception('Fake upload failure')
+        return 'id_' + filename
+
+    mock_get_access_token.return_value = ('THIS_IS_A_JWT', None)
+    mock_walk_files.return_value = [{'name': partner, 'id': 'folder' + partner} for partner in partners]
+    mock_create_files.side_effect = _fake_upload
+    mock_driveapi.return_value = None
+    mock_retirement_report.return_value = _fake_retirement_report(user_orgs=list(FAKE_ORGS.keys()))
+
+    result = _call_script(expect_success=False, extra_args=['--workers', '4'])
+
+    # Every partner is still attempted, and the failure is reported per partner.
+    assert mock_create_files.call_count == 4
+    assert result.exit_code == ERR_DRIVE_UPLOAD
+    assert 'Drive upload summary: 3 succeeded, 1 failed.' in result.output
+    assert 'Org2X: FAILED (Fake upload failure)' in result.output
+    mock_retirement_cleanup.assert_not_called()
+
+
+@pytest.mark.parametrize('workers, expected_calls, expected_errors', [
+    (1, ['b', 'c'], ['c']),
+    (4, ['b', 'c', 'a', 'd'], ['c', 'd']),
+])
+def test_run_for_partners_failures(workers, expected_calls, expected_errors):
+    calls = []
+
+    def _partner_func(partner):
+        calls.append(partner)
+        if partner in ('c', 'd'):
+            raise ValueError(partner)
+        return partner.upper()
+
+    results, errors = _run_for_partners(_partner_func, ['b', 'c', 'a', 'd'], workers)
+
+    # One worker stops at the first failure; more keep going.  Errors are in partner order either way.
+    assert sorted(calls) == sorted(expected_calls)
+    assert list(errors) == expected_errors
+    assert results == {partner: partner.upper() for partner in expected_calls if partner not in expected_errors}
+
+
+def test_in_memory_reports_closed_on_generation_failure():
+    streams = []
+    spooled_temporary_file = tempfile.SpooledTemporaryFile
+
+    def _spooled(*args, **kwargs):
+        streams.append(spooled_temporary_file(*args, **kwargs))
+        return streams[-1]
+
+    config = {'partner_report_platform_name': 'fake_platform_name'}
+    learner = {LEARNER_ORIGINAL_USERNAME_KEY: 'unique_user'}
+    report_data = OrderedDict(
+        (partner, {ORGS_CONFIG_FIELD_HEADINGS_KEY: DEFAULT_FIELD_HEADINGS, ORGS_CONFIG_LEARNERS_KEY: learners})
+        for partner, learners in (('a', [learner]), ('b', [None]), ('c', [learner]))
+    )
+
+    with patch('tubular.scripts.retirement_partner_report.tempfile.SpooledTemporaryFile', side_effect=_spooled):
+        with pytest.raises(SystemExit) as exit_info:
+            _generate_report_files_or_exit(config, report_data, None, workers=4)
+
+    # The reports built for the other partners are closed along with the failed one.
+    assert exit_info.value.code == ERR_REPORTING
+    assert len(streams) == 3
+    assert all(stream.closed for stream in streams)
+
+
+@patch('tubular.google_api.DriveApi.__init__', return_value=None)
+@patch('tubular.google_api.DriveApi.create_file_in_folder', side_effect=Exception('Fake upload failure'))
+def test_in_memory_reports_closed_on_upload_failure(*args):
+    mock_create_files = args[0]
+    partners = ['a', 'b', 'c']
+    config = {
+        'google_secrets_file': TEST_GOOGLE_SECRETS_FILENAME,
+        'partner_folder_mapping': {partner: 'folder' + partner for partner in partners},
+    }
+    reports = OrderedDict(
+        (partner, InMemoryReport(partner + '.csv', tempfile.SpooledTemporaryFile())) for partner in partners
+    )
+
+    with pytest.raises(SystemExit) as exit_info:
+        _push_files_to_google(config, reports)
+
+    # One worker stops at the first failure, but the reports it never reached are closed too.
+    assert exit_info.value.code == ERR_DRIVE_UPLOAD
+    assert mock_create_files.call_count == 1
+    assert all(report.stream.closed for report in reports.values())
+
+
+@patch('tubular.google_api.DriveApi.__init__')
+@patch('tubular.google_api.DriveApi.create_file_in_folder')
+@patch('tubular.google_api.DriveApi.walk_files')
+@patch('tubular.google_api.DriveApi.list_permissions_for_files')
+@patch('tubular.google_api.DriveApi.create_comments_for_files')
+@patch('tubular.edx_api.BaseApiClient.get_access_token')
+@patch.multiple(
+    'tubular.edx_api.LmsApi',
+    retirement_partner_report=DEFAULT,
+    retirement_partner_cleanup=DEFAULT
+)
+def test_successful_report_in_memory(*args, **kwargs):
+    mock_get_access_token = args[0]
+    mock_list_permissions = args[2]
+    mock_walk_files = args[3]
+    mock_create_files = args[4]
+    mock_driveapi = args[5]
+    mock_retirement_report = kwargs['retirement_partner_report']
+    mock_retirement_cleanup = kwargs['retirement_partner_cleanup']
+
+    partners = flatten_partner_list(FAKE_ORGS.values())
+    uploaded = {}
+
+    def _fake_upload(folder_id, filename, f, mimetype):  # pylint: disable=unused-argument
+        uploaded[filename] = f.read().decode('utf-8')
+        return 'id_' + filename
+
+    mock_get_access_token.return_value = ('THIS_IS_A_JWT', None)
+    mock_list_permissions.return_value = {
+        'folder' + partner: [{'emailAddress': 'some.contact@example.com'}] for partner in partners
+    }
+    mock_walk_files.return_value = [{'name': partner, 'id': 'folder' + partner} for partner in partners]
+    mock_create_files.side_effect = _fake_upload
+    mock_driveapi.return_value = None
+    mock_retirement_report.return_value = _fake_retirement_report(user_orgs=list(FAKE_ORGS.keys()))
+
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open(TEST_CONFIG_YML_NAME, 'w') as config_f:
+            fake_config_file(config_f, FAKE_ORGS)
+        with open(TEST_GOOGLE_SECRETS_FILENAME, 'w') as secrets_f:
+            fake_google_secrets_file(secrets_f)
+
+        result = runner.invoke(
+            generate_report,
+            args=[
+                '--config_file', TEST_CONFIG_YML_NAME,
+                '--google_secrets_file', TEST_GOOGLE_SECRETS_FILENAME,
+                '--in_memory',
+            ]
+        )
+        print(result.output)
+
+        # Nothing but the config files was written to disk.
+        assert sorted(os.listdir('.')) == sorted([TEST_CONFIG_YML_NAME, TEST_GOOGLE_SECRETS_FILENAME])
+
+    assert result.exit_code == 0
+    assert sorted(uploaded) == sorted(
+        '{}_{}_{}_{}.csv'.format(REPORTING_FILENAME_PREFIX, TEST_PLATFORM_NAME, partner, date.today().isoformat())
+        for partner in partners
+    )
+    for content in uploaded.values():
+        rows = list(csv.DictReader(content.splitlines()))
+        assert len(rows) == 10
+        assert rows[0]['original_name'].startswith(UNICODE_NAME_CONSTANT)
+    mock_retirement_cleanup.assert_called_once()
+
+
 def test_file_content_custom_headings():
     runner = CliRunner()
     with runner.isolated_filesystem():
@@ -990,7 +1256,7 @@ def test_check_expiring_files_raises_when_warning_days_gte_retention():
 @patch('tubular.google_api.DriveApi.__init__')
 @patch('tubular.google_api.DriveApi.list_permissions_for_files')
 @patch('tubular.google_api.DriveApi.walk_files')
-@patch('tubular.google_api.DriveApi.list_comments_for_file')
+@patch('tubular.google_api.DriveApi.list_comments_for_files')
 @patch('tubular.google_api.DriveApi.create_comments_for_files')
 def test_check_expiring_files_skips_already_warned(*args):
     """Files that already have a deletion warning comment are skipped."""
@@ -1008,7 +1274,7 @@ def test_check_expiring_files_skips_already_warned(*args):
     mock_walk_files.return_value = [
         {'name': 'user_retirement_fakename_Org1X_2026-01-01.csv', 'id': 'file1', 'createdTime': old_time}
     ]
-    mock_list_comments.return_value = [{'content': 'This file will be automatically deleted soon'}]
+    mock_list_comments.return_value = {'file1': [{'content': 'This file will be automatically deleted soon'}]}
 
     config = _make_expiring_config()
     _check_and_notify_about_expiring_files(config)
@@ -1019,7 +1285,7 @@ def test_check_expiring_files_skips_already_warned(*args):
 @patch('tubular.google_api.DriveApi.__init__')
 @patch('tubular.google_api.DriveApi.list_permissions_for_files')
 @patch('tubular.google_api.DriveApi.walk_files')
-@patch('tubular.google_api.DriveApi.list_comments_for_file')
+@patch('tubular.google_api.DriveApi.list_comments_for_files')
 @patch('tubular.google_api.DriveApi.create_comments_for_files')
 def test_check_expiring_files_queues_warning_for_expiring_file(*args):
     """Deletion warning is posted for a file in the warning window with no prior warning."""
@@ -1037,7 +1303,7 @@ def test_check_expiring_files_queues_warning_for_expiring_file(*args):
     mock_walk_files.return_value = [
         {'name': 'user_retirement_fakename_Org1X_2026-01-01.csv', 'id': 'file1', 'createdTime': old_time}
     ]
-    mock_list_comments.return_value = []
+    mock_list_comments.return_value = {'file1': []}
 
     config = _make_expiring_config()
     _check_and_notify_about_expiring_files(config)
@@ -1051,6 +1317,122 @@ def test_check_expiring_files_queues_warning_for_expiring_file(*args):
     assert '+poc@example.com' in content
 
 
+@patch('tubular.google_api.DriveApi.__init__')
+@patch('tubular.google_api.DriveApi.list_permissions_for_files')
+@patch('tubular.google_api.DriveApi.walk_files')
+@patch('tubular.google_api.DriveApi.list_comments_for_files')
+@patch('tubular.google_api.DriveApi.create_comments_for_files')
+def test_check_expiring_files_batches_across_partners(*args):
+    """Existing comments for candidate files from every partner are listed in a single batched call."""
+    mock_create_comments = args[0]
+    mock_list_comments = args[1]
+    mock_walk_files = args[2]
+    mock_list_permissions = args[3]
+    mock_driveapi = args[4]
+
+    mock_driveapi.return_value = None
+    mock_list_permissions.return_value = {
+        'folder_Org1X': [{'emailAddress': 'poc1@example.com'}],
+        'folder_Org2X': [{'emailAddress': 'poc2@example.com'}],
+    }
+    old_time = (datetime.now(UTC) - timedelta(days=55)).strftime('%Y-%m-%dT%H:%M:%SZ')
+    new_time = datetime.now(UTC).strftime('%Y-%m-%dT%H:%M:%SZ')
+    mock_walk_files.side_effect = lambda folder_id, **kwargs: [
+        {'name': 'old_{}.csv'.format(folder_id), 'id': 'old_' + folder_id, 'createdTime': old_time},
+        {'name': 'new_{}.csv'.format(folder_id), 'id': 'new_' + folder_id, 'createdTime': new_time},
+    ]
+    mock_list_comments.return_value = {
+        'old_folder_Org1X': [{'content': 'This file will be automatically deleted soon'}],
+        'old_folder_Org2X': [],
+    }
+
+    config = _make_expiring_config()
+    config['partner_folder_mapping'] = {'Org1X': 'folder_Org1X', 'Org2X': 'folder_Org2X'}
+    _check_and_notify_about_expiring_files(config)
+
+    # Only old files are checked for comments, all in one call.
+    mock_list_comments.assert_called_once()
+    assert sorted(mock_list_comments.call_args[0][0]) == ['old_folder_Org1X', 'old_folder_Org2X']
+
+    mock_create_comments.assert_called_once()
+    posted_comments = mock_create_comments.call_args[0][0]
+    assert [file_id for file_id, _ in posted_comments] == ['old_folder_Org2X']
+    assert '+poc2@example.com' in posted_comments[0][1]
+
+
+@patch('tubular.google_api.DriveApi.__init__')
+@patch('tubular.google_api.DriveApi.list_permissions_for_files')
+@patch('tubular.google_api.DriveApi.walk_files')
+@patch('tubular.google_api.DriveApi.list_comments_for_files')
+@patch('tubular.google_api.DriveApi.create_comments_for_files')
+def test_check_expiring_files_falls_back_per_partner(*args):
+    """A file in two partner folders is only warned about once, and a failed batch is retried per partner."""
+    mock_create_comments = args[0]
+    mock_list_comments = args[1]
+    mock_walk_files = args[2]
+    mock_list_permissions = args[3]
+    mock_driveapi = args[4]
+
+    mock_driveapi.return_value = None
+    mock_list_permissions.return_value = {
+        'folder_Org1X': [{'emailAddress': 'poc1@example.com'}],
+        'folder_Org2X': [{'emailAddress': 'poc2@example.com'}],
+        'folder_Org3X': [{'emailAddress': 'poc3@example.com'}],
+    }
+    old_time = (datetime.now(UTC) - timedelta(days=55)).strftime('%Y-%m-%dT%H:%M:%SZ')
+    mock_walk_files.side_effect = lambda folder_id, **kwargs: [
+        {'name': 'old_{}.csv'.format(folder_id), 'id': 'old_' + folder_id, 'createdTime': old_time},
+        {'name': 'shared.csv', 'id': 'shared', 'createdTime': old_time},
+    ]
+    mock_list_comments.side_effect = lambda file_ids, **kwargs: {file_id: [] for file_id in file_ids}
+
+    def _create_comments(file_ids_and_content):
+        if len(file_ids_and_content) > 2 or any(file_id == 'old_folder_Org2X' for file_id, _ in file_ids_and_content):
+            raise Exception('Fake comment failure')
+        return {file_id: {} for file_id, _ in file_ids_and_content}
+
+    mock_create_comments.side_effect = _create_comments
+
+    config = _make_expiring_config()
+    config['partner_folder_mapping'] = OrderedDict(
+        [('Org1X', 'folder_Org1X'), ('Org2X', 'folder_Org2X'), ('Org3X', 'folder_Org3X')]
+    )
+    _check_and_notify_about_expiring_files(config)
+
+    batch_file_ids = [file_id for file_id, _ in mock_create_comments.call_args_list[0][0][0]]
+    assert batch_file_ids == ['old_folder_Org1X', 'shared', 'old_folder_Org2X', 'old_folder_Org3X']
+    # After the batch fails, each partner is handled on its own, and Org2X's failure does not stop Org3X.
+    partner_file_ids = [
+        [file_id for file_id, _ in call_args[0][0]] for call_args in mock_create_comments.call_args_list[1:]
+    ]
+    assert partner_file_ids == [['old_folder_Org1X', 'shared'], ['old_folder_Org2X'], ['old_folder_Org3X']]
+
+
+def test_get_partner_emails_lists_each_folder_once():
+    """Folder permissions are listed once per run, and denied domains are filtered regardless of case."""
+    drive = Mock()
+    drive.list_permissions_for_files.side_effect = [
+        {'folder_Org1X': [{'emailAddress': 'poc1@example.com'}, {'emailAddress': 'Staff@EDX.org'}]},
+        {'folder_Org2X': [{'emailAddress': 'poc2@example.com'}, {'emailAddress': 'other@edx.org.example.com'}]},
+    ]
+    config = _make_expiring_config()
+    config['partner_folder_mapping'] = {'Org1X': 'folder_Org1X', 'Org2X': 'folder_Org2X'}
+
+    assert _get_partner_emails(drive, config, partners=['Org1X']) == {'Org1X': ['poc1@example.com']}
+    assert _get_partner_emails(drive, config) == {
+        'Org1X': ['poc1@example.com'],
+        'Org2X': ['poc2@example.com', 'other@edx.org.example.com'],
+    }
+    assert _get_partner_emails(drive, config, partners=['Org2X']) == {
+        'Org2X': ['poc2@example.com', 'other@edx.org.example.com'],
+    }
+
+    # The second call only lists the folder not already listed, and the third lists nothing.
+    assert [call[0][0] for call in drive.list_permissions_for_files.call_args_list] == [
+        ['folder_Org1X'], ['folder_Org2X'],
+    ]
+
+
 @patch('tubular.google_api.DriveApi.__init__')
 @patch('tubular.google_api.DriveApi.list_permissions_for_files')
 @patch('tubular.google_api.DriveApi.walk_files')
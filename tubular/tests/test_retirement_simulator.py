@@ -0,0 +1,63 @@
+"""
+Tests of the local retirement simulator.
+"""
+
+import unittest
+
+import requests
+
+from tubular.braze_api import BrazeApi
+from tubular.edx_api import LmsApi
+from tubular.retirement_simulator import RetirementSimulator, ServiceProfile
+from tubular.salesforce_marketing_cloud_api import SalesforceMarketingCloudApi
+from tubular.segment_api import SegmentApi
+
+
+class TestRetirementSimulator(unittest.TestCase):
+    """
+    Tests the simulator by calling it with the real API clients.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.simulator = RetirementSimulator(profiles={
+            'amplitude': ServiceProfile(error_rate=1),
+            'hubspot': ServiceProfile(rate_limit=2),
+        }).start()
+        self.addCleanup(self.simulator.stop)
+        self.learner = self.simulator.add_learners(3)[1]
+        self.base_urls = self.simulator.base_urls()
+
+    def test_lms_retirement(self):
+        lms = LmsApi(self.base_urls['lms'], self.base_urls['lms'], 'id', 'secret')
+        username = self.learner['original_username']
+
+        queue = lms.learners_to_retire(['PENDING'], cool_off_days=0, limit=2)
+        self.assertEqual([learner['original_username'] for learner in queue], ['sim_user_1', 'sim_user_2'])
+
+        lms.update_learner_retirement_state(username, 'RETIRING_LMS', 'Starting')
+        lms.retirement_lms_retire(self.learner)
+        self.assertEqual(lms.get_learner_retirement_state(username)['current_state']['state_name'], 'RETIRING_LMS')
+        self.assertEqual(self.simulator.learner_states(), {'PENDING': 2, 'RETIRING_LMS': 1})
+
+    def test_vendors(self):
+        BrazeApi('key', 'instance', base_url=self.base_urls['braze']).delete_user(self.learner)
+        SalesforceMarketingCloudApi(
+            'id', 'secret', 'subdomain', base_url=self.base_urls['salesforce_marketing_cloud']
+        ).delete_user(self.learner)
+        SegmentApi(self.base_urls['segment'], 'token', 'workspace').delete_and_suppress_learner(self.learner)
+
+        self.assertEqual(self.simulator.request_counts[('braze', 201)], 1)
+        self.assertEqual(self.simulator.request_counts[('salesforce_marketing_cloud', 200)], 3)
+        self.assertEqual(self.simulator.request_counts[('segment', 200)], 1)
+
+    def test_errors_and_rate_limits(self):
+        response = requests.post(self.base_urls['amplitude'] + 'api/2/deletions/users', json={})
+        self.assertEqual(response.status_code, 500)
+
+        profile_url = self.base_urls['hubspot'] + 'contacts/v1/contact/email/a@b.invalid/profile'
+        statuses = [requests.get(profile_url).status_code for _ in range(4)]
+        self.assertEqual(statuses[:2], [200, 200])
+        self.assertIn(429, statuses[2:])
+
+        self.assertEqual(requests.get(self.simulator.url + '/not/simulated').status_code, 404)
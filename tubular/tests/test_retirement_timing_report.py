@@ -0,0 +1,90 @@
+"""
+Test the retirement_timing_report.py script
+"""
+
+import csv
+import json
+
+from click.testing import CliRunner
+
+from tubular.scripts.retirement_timing_report import (
+    ERR_NO_TIMINGS,
+    summarize_timings,
+    timing_report
+)
+
+
+def _timing(user_id, service, duration, state='RETIRING_LMS', start=0, outcome='success', retries=0):
+    """
+    Return a timing record as written by retire_one_learner.py.
+    """
+    return {
+        'type': 'retirement_state',
+        'user_id': user_id,
+        'state': state,
+        'service': service,
+        'method': 'retire',
+        'start': start,
+        'end': start + duration,
+        'duration_seconds': duration,
+        'retries': retries,
+        'outcome': outcome,
+        'error': None,
+    }
+
+
+def test_summarize_timings():
+    timings = [_timing(n, 'LMS', n) for n in range(1, 101)] + [
+        _timing(1, 'BRAZE', 2, outcome='error', retries=3),
+        _timing(2, 'BRAZE', 4),
+    ]
+
+    summary = summarize_timings(timings)
+
+    assert summary['LMS'] == {
+        'count': 100, 'errors': 0, 'retries': 0, 'p50': 50, 'p95': 95, 'p99': 99, 'total': 5050,
+    }
+    assert summary['BRAZE'] == {'count': 2, 'errors': 1, 'retries': 3, 'p50': 2, 'p95': 4, 'p99': 4, 'total': 6}
+
+    by_state = summarize_timings(timings, group_by='state')
+    assert list(by_state) == ['RETIRING_LMS']
+
+
+def test_timing_report():
+    timings = [
+        _timing(1, 'LMS', 10, start=0),
+        _timing(1, 'BRAZE', 30, state='RETIRING_BRAZE', start=10),
+        _timing(2, 'LMS', 20, start=1800),
+        _timing(2, 'BRAZE', 50, state='RETIRING_BRAZE', start=3550),
+    ]
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open('night1.jsonl', 'w') as timings_f:
+            timings_f.write(''.join(json.dumps(timing) + '\n' for timing in timings[:2]))
+        with open('night2.jsonl', 'w') as timings_f:
+            timings_f.write(json.dumps({'type': 'http', 'client': 'braze'}) + '\n')
+            timings_f.write(''.join(json.dumps(timing) + '\n' for timing in timings[2:]))
+        result = runner.invoke(timing_report, args=[
+            '--timings_file', 'night1.jsonl', '--timings_file', 'night2.jsonl', '--output_file', 'report.csv'
+        ])
+        with open('report.csv') as report_f:
+            rows = list(csv.reader(report_f))
+
+    print(result.output)
+    assert result.exit_code == 0
+    assert '4 state runs for 2 learners, 2.0 learners per hour' in result.output
+    assert rows[0] == ['service', 'count', 'errors', 'retries', 'p50', 'p95', 'p99', 'total']
+    # The slowest service comes first.
+    assert rows[1] == ['BRAZE', '2', '0', '0', '30', '50', '50', '80']
+    assert rows[2] == ['LMS', '2', '0', '0', '10', '20', '20', '30']
+
+
+def test_no_timings():
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open('empty.jsonl', 'w'):
+            pass
+        result = runner.invoke(timing_report, args=['--timings_file', 'empty.jsonl'])
+
+    assert result.exit_code == ERR_NO_TIMINGS
+    assert 'No retirement state timings found' in result.output
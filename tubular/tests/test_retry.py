@@ -2,8 +2,8 @@
 Tests of the code which retrys calls.
 """
 
+import asyncio
 import os
-import datetime
 import unittest
 
 import mock
@@ -53,42 +53,21 @@ class TestLifecycleManager(unittest.TestCase):
         self.assertFalse(manager.max_time_reached())
 
     def test_max_time_reached(self):
-        # Python built-in types are immutable so we can't use @mock.patch
-        curr_time = datetime.datetime.utcnow()
-
-        class NewDateTime(datetime.datetime):
-            """
-            Class to mock datetime.
-            """
-
-            @classmethod
-            def utcnow(cls):
-                """
-                Method to always return specific UTC datetime.
-                """
-                return curr_time
-
-        built_in_datetime = retry.datetime
-
-        # The instance of datetime becomes local to the module it's import in to. We must patch datetime using the
-        # module instance that is imported in to the ec2 module.
-        retry.datetime = NewDateTime
-
-        manager = retry.LifecycleManager(1, 1, 300)
-        # pylint: disable=protected-access
-        self.assertEqual(manager._max_datetime,
-                         curr_time + datetime.timedelta(0, 300))
-        self.assertFalse(manager.max_time_reached())
-
-        # set the expiration in the past and ensure that max_time_reached returns True
-        manager = retry.LifecycleManager(1, 1, -1)
-        # pylint: disable=protected-access
-        self.assertEqual(manager._max_datetime,
-                         curr_time + datetime.timedelta(0, -1))
-        self.assertTrue(manager.max_time_reached())
-
-        # restore the default functionality of retry.datetime
-        retry.datetime = built_in_datetime
+        curr_time = 1000.0
+        with mock.patch(retry.__name__ + '.time.monotonic', return_value=curr_time) as mock_monotonic:
+            manager = retry.LifecycleManager(1, 1, 300)
+            # pylint: disable=protected-access
+            self.assertEqual(manager._deadline, curr_time + 300)
+            self.assertFalse(manager.max_time_reached())
+
+            # move the monotonic clock past the deadline and ensure that max_time_reached returns True
+            mock_monotonic.return_value = curr_time + 301
+            self.assertTrue(manager.max_time_reached())
+
+            # set the expiration in the past and ensure that max_time_reached returns True
+            mock_monotonic.return_value = curr_time
+            manager = retry.LifecycleManager(1, 1, -1)
+            self.assertTrue(manager.max_time_reached())
 
     @data((True, True, True),
           (True, False, True),
@@ -160,3 +139,89 @@ class TestLifecycleManager(unittest.TestCase):
         with mock.patch(retry.__name__ + '.LifecycleManager.get_delay_time', lambda x: 0):
             manager = retry.LifecycleManager(2, 1, 500)
             self.assertEqual("success", manager.execute(mock_func, 'arg1', 'arg2'))
+
+    @data((1, None, [1, 1, 1, 1]),
+          (2, None, [1, 2, 4, 8]),
+          (2, 5, [1, 2, 4, 5]))
+    @unpack
+    def test_exponential_delay(self, backoff_factor, max_delay_seconds, expected_delays):
+        manager = retry.LifecycleManager(5, 1, None, backoff_factor=backoff_factor, max_delay_seconds=max_delay_seconds)
+        delays = []
+        for _ in expected_delays:
+            manager._current_attempt_number += 1  # pylint: disable=protected-access
+            delays.append(manager.get_delay_time())
+        self.assertEqual(delays, expected_delays)
+
+    def test_jitter(self):
+        manager = retry.LifecycleManager(5, 4, None, jitter=True)
+        with mock.patch(retry.__name__ + '.random.uniform', return_value=1.5) as mock_uniform:
+            self.assertEqual(manager.get_delay_time(), 1.5)
+        mock_uniform.assert_called_once_with(0, 4)
+
+    def test_backoff_factor_less_than_1(self):
+        self.assertRaises(retry.RetryException, retry.LifecycleManager, 1, 1, 1, backoff_factor=0.5)
+
+    def test_sleep_stops_at_max_time(self):
+        with mock.patch(retry.__name__ + '.time.monotonic', return_value=1000.0):
+            manager = retry.LifecycleManager(5, 60, 10)
+            with mock.patch(retry.__name__ + '.time.sleep') as mock_sleep:
+                manager.sleep()
+        mock_sleep.assert_called_once_with(10)
+
+    def test_execute_non_retryable_exception(self):
+        mock_func = mock.MagicMock()
+        mock_func.side_effect = [UniqueTestException, "success"]
+        mock_func.__name__ = 'TheMockTestFunction'
+        manager = retry.LifecycleManager(5, 0, None, retry_on=(ValueError,))
+        self.assertRaises(UniqueTestException, manager.execute, mock_func)
+        self.assertEqual(mock_func.call_count, 1)
+
+    def test_execute_retry_if_result(self):
+        mock_func = mock.MagicMock()
+        mock_func.side_effect = ['pending', 'pending', 'done']
+        mock_func.__name__ = 'TheMockTestFunction'
+        manager = retry.LifecycleManager(5, 0, None, retry_if_result=lambda result: result == 'pending')
+        self.assertEqual(manager.execute(mock_func), 'done')
+        self.assertEqual(mock_func.call_count, 3)
+
+        # Once the attempts run out, the last result is returned.
+        mock_func.side_effect = ['pending', 'pending', 'done']
+        manager = retry.LifecycleManager(1, 0, None, retry_if_result=lambda result: result == 'pending')
+        self.assertEqual(manager.execute(mock_func), 'pending')
+
+    @data(('120', 120), ('0', 0), ('Wed, 21 Oct 2015 07:28:00 GMT', 0), ('soon', None), (None, None))
+    @unpack
+    def test_retry_after_seconds(self, header, expected_seconds):
+        err = UniqueTestException()
+        err.response = mock.Mock(headers={'Retry-After': header} if header else {})
+        self.assertEqual(retry.retry_after_seconds(err), expected_seconds)
+
+    def test_execute_honors_retry_after(self):
+        err = UniqueTestException()
+        err.response = mock.Mock(headers={'Retry-After': '30'})
+        mock_func = mock.MagicMock()
+        mock_func.side_effect = [err, "success"]
+        mock_func.__name__ = 'TheMockTestFunction'
+        manager = retry.LifecycleManager(2, 1, None)
+        with mock.patch(retry.__name__ + '.time.sleep') as mock_sleep:
+            self.assertEqual(manager.execute(mock_func), "success")
+        mock_sleep.assert_called_once_with(30)
+
+    def test_retry_decorator_coroutine(self):
+        calls = []
+
+        async def flaky():
+            """
+            Coroutine which fails on its first call.
+            """
+            calls.append(1)
+            if len(calls) == 1:
+                raise UniqueTestException()
+            return 'success'
+
+        with mock.patch.dict(os.environ, {'TUBULAR_RETRY_ENABLED': 'true'}):
+            flaky = retry.retry(attempts=3, delay_seconds=0)(flaky)
+
+        self.assertTrue(asyncio.iscoroutinefunction(flaky))
+        self.assertEqual(asyncio.run(flaky()), 'success')
+        self.assertEqual(len(calls), 2)
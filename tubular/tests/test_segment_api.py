@@ -76,7 +76,7 @@ def test_bulk_delete_success(setup_regulation_api):  # pylint: disable=redefined
     mock_post.return_value = FakeResponse()
 
     learner = TEST_SEGMENT_CONFIG['learner']
-    segment.delete_and_suppress_learners(learner, 1000)
+    assert segment.delete_and_suppress_learners(learner, 1000) == [1]
 
     assert mock_post.call_count == 1
 
@@ -97,7 +97,7 @@ def test_bulk_delete_success(setup_regulation_api):  # pylint: disable=redefined
 
     url = TEST_SEGMENT_CONFIG['fake_base_url'] + BULK_REGULATE_URL.format(TEST_SEGMENT_CONFIG['fake_workspace'])
     mock_post.assert_any_call(
-        url, json=fake_json, headers=TEST_SEGMENT_CONFIG['headers']
+        url, json=fake_json, headers=TEST_SEGMENT_CONFIG['headers'], hooks=mock.ANY
     )
 
 
@@ -145,7 +145,7 @@ def test_bulk_unsuppress_success(setup_regulation_api):  # pylint: disable=redef
 
     url = TEST_SEGMENT_CONFIG['fake_base_url'] + BULK_REGULATE_URL.format(TEST_SEGMENT_CONFIG['fake_workspace'])
     mock_post.assert_any_call(
-        url, json=fake_json, headers=TEST_SEGMENT_CONFIG['headers']
+        url, json=fake_json, headers=TEST_SEGMENT_CONFIG['headers'], hooks=mock.ANY
     )
 
 
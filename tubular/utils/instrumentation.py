@@ -0,0 +1,334 @@
+"""
+Instrumentation of outbound HTTP calls.
+
+Clients pass `http_hooks('<client name>')` as the `hooks` argument of their `requests` calls, and report retries
+with `record_retry()`.  Each response and retry is recorded with the configured sink, if any.  The sink is set with
+`set_sink()`, or from the TUBULAR_HTTP_METRICS environment variable, which is one of:
+
+    jsonl:<path>            Append one JSON object per event to the file at <path>.
+    statsd:<host>[:<port>]  Send timings and counters to a StatsD server over UDP.
+    prometheus:<path>       Keep latency histograms and counters, and write them in the Prometheus text format to
+                            <path>, e.g. for the node exporter's textfile collector.
+
+Without a sink, the hooks do nothing.
+"""
+
+import atexit
+import json
+import logging
+import os
+import re
+import socket
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+LOG = logging.getLogger(__name__)
+
+HTTP_METRICS_ENV_VAR = 'TUBULAR_HTTP_METRICS'
+
+# Upper bounds, in seconds, of the latency histogram buckets kept by PrometheusTextfileSink.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# URL path segments which look like IDs are replaced with this, so that each endpoint is recorded under one name.
+ID_PLACEHOLDER = '{id}'
+ID_SEGMENT_RE = re.compile(
+    r'^(\d+|[0-9a-fA-F]{16,}|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12})$'
+)
+
+
+class JsonLinesSink:
+    """
+    Sink which appends each event to a file as a line of JSON.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, event):
+        """
+        Append the event to the file.
+        """
+        line = json.dumps(event, sort_keys=True) + '\n'
+        with self._lock:
+            with open(self.path, 'a') as events_file:
+                events_file.write(line)
+
+
+class StatsdSink:
+    """
+    Sink which sends each event to a StatsD server as timings and counters.
+    """
+    def __init__(self, host, port=8125, prefix='tubular.http'):
+        self.address = (host, int(port))
+        self.prefix = prefix
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def record(self, event):
+        """
+        Send the event's metrics.  Failures to send are ignored, since metrics must never break the caller.
+        """
+        name = '.'.join(_statsd_name_part(part) for part in (self.prefix, event['client'], event['endpoint']))
+        if event['type'] == 'http':
+            metrics = [
+                '{}.{}.latency:{:.1f}|ms'.format(name, event['status'], event['seconds'] * 1000),
+                '{}.{}.requests:1|c'.format(name, event['status']),
+                '{}.bytes_sent:{}|c'.format(name, event['request_bytes']),
+                '{}.bytes_received:{}|c'.format(name, event['response_bytes']),
+            ]
+        else:
+            metrics = [
+                '{}.retries:1|c'.format(name),
+                '{}.backoff:{:.1f}|ms'.format(name, event['wait_seconds'] * 1000),
+            ]
+        try:
+            self._socket.sendto('\n'.join(metrics).encode('utf-8'), self.address)
+        except OSError as exc:
+            LOG.debug('Could not send HTTP metrics to StatsD: {}'.format(exc))
+
+
+class PrometheusTextfileSink:
+    """
+    Sink which keeps latency histograms, byte counters and retry counters, and writes them to a Prometheus textfile.
+
+    The file is rewritten at most every `write_interval` seconds, and when the process exits.
+    """
+    def __init__(self, path, write_interval=10):
+        self.path = path
+        self.write_interval = write_interval
+        self._lock = threading.Lock()
+        self._last_write = 0
+        # Keyed by (client, method, endpoint, status).
+        self._bucket_counts = defaultdict(lambda: [0] * len(LATENCY_BUCKETS))
+        self._latency_sums = defaultdict(float)
+        self._request_counts = defaultdict(int)
+        # Keyed by (client, endpoint).
+        self._bytes_sent = defaultdict(int)
+        self._bytes_received = defaultdict(int)
+        self._retry_counts = defaultdict(int)
+        atexit.register(self.write)
+
+    def record(self, event):
+        """
+        Add the event to the metrics, and rewrite the file if it has not been written recently.
+        """
+        with self._lock:
+            if event['type'] == 'http':
+                key = (event['client'], event['method'], event['endpoint'], str(event['status']))
+                for index, upper_bound in enumerate(LATENCY_BUCKETS):
+                    if event['seconds'] <= upper_bound:
+                        self._bucket_counts[key][index] += 1
+                self._latency_sums[key] += event['seconds']
+                self._request_counts[key] += 1
+                self._bytes_sent[(event['client'], event['endpoint'])] += event['request_bytes']
+                self._bytes_received[(event['client'], event['endpoint'])] += event['response_bytes']
+            else:
+                self._retry_counts[(event['client'], event['endpoint'])] += 1
+            due = time.monotonic() - self._last_write >= self.write_interval
+        if due:
+            self.write()
+
+    def write(self):
+        """
+        Write all metrics to the file, replacing its previous contents atomically.
+        """
+        with self._lock:
+            lines = [
+                '# HELP tubular_http_request_duration_seconds Latency of outbound HTTP requests.',
+                '# TYPE tubular_http_request_duration_seconds histogram',
+            ]
+            for key, bucket_counts in sorted(self._bucket_counts.items()):
+                labels = _prometheus_labels(zip(('client', 'method', 'endpoint', 'status'), key))
+                for upper_bound, bucket_count in zip(LATENCY_BUCKETS, bucket_counts):
+                    lines.append('tubular_http_request_duration_seconds_bucket{{{},le="{}"}} {}'.format(
+                        labels, upper_bound, bucket_count
+                    ))
+                lines.append('tubular_http_request_duration_seconds_bucket{{{},le="+Inf"}} {}'.format(
+                    labels, self._request_counts[key]
+                ))
+                lines.append('tubular_http_request_duration_seconds_sum{{{}}} {}'.format(
+                    labels, self._latency_sums[key]
+                ))
+                lines.append('tubular_http_request_duration_seconds_count{{{}}} {}'.format(
+                    labels, self._request_counts[key]
+                ))
+            for metric, help_text, counts in (
+                    ('tubular_http_sent_bytes_total', 'Bytes sent in outbound HTTP requests.', self._bytes_sent),
+                    ('tubular_http_received_bytes_total', 'Bytes received in HTTP responses.', self._bytes_received),
+                    ('tubular_http_retries_total', 'Retries of outbound calls.', self._retry_counts),
+            ):
+                lines.append('# HELP {} {}'.format(metric, help_text))
+                lines.append('# TYPE {} counter'.format(metric))
+                for key, value in sorted(counts.items()):
+                    labels = _prometheus_labels(zip(('client', 'endpoint'), key))
+                    lines.append('{}{{{}}} {}'.format(metric, labels, value))
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as metrics_file:
+                metrics_file.write('\n'.join(lines) + '\n')
+            os.replace(tmp_path, self.path)
+            self._last_write = time.monotonic()
+
+
+def _statsd_name_part(value):
+    """
+    Make a value safe to use within a dotted StatsD metric name.
+    """
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', value.replace('/', '.').strip('.'))
+
+
+def _prometheus_labels(label_pairs):
+    """
+    Format (name, value) pairs as Prometheus labels.
+    """
+    return ','.join(
+        '{}="{}"'.format(name, value.replace('\\', '\\\\').replace('"', '\\"')) for name, value in label_pairs
+    )
+
+
+_SINK = None
+_SINK_CONFIGURED = False
+_SINK_LOCK = threading.Lock()
+
+# Number of retries recorded by each thread, whether or not there is a sink.
+_RETRY_COUNTS = threading.local()
+
+
+def sink_from_spec(spec):
+    """
+    Create a sink from a TUBULAR_HTTP_METRICS style specification, e.g. "jsonl:/tmp/http.jsonl".
+    """
+    kind, _, target = spec.partition(':')
+    if kind == 'jsonl' and target:
+        return JsonLinesSink(target)
+    if kind == 'statsd' and target:
+        host, _, port = target.partition(':')
+        return StatsdSink(host, port or 8125)
+    if kind == 'prometheus' and target:
+        return PrometheusTextfileSink(target)
+    raise ValueError('Unknown HTTP metrics sink "{}".'.format(spec))
+
+
+def set_sink(sink):
+    """
+    Set the sink which all HTTP events are recorded with.  None turns recording off.
+    """
+    global _SINK, _SINK_CONFIGURED  # pylint: disable=global-statement
+    with _SINK_LOCK:
+        _SINK = sink
+        _SINK_CONFIGURED = True
+
+
+def get_sink():
+    """
+    Return the configured sink, setting it up from the TUBULAR_HTTP_METRICS environment variable on first use.
+    """
+    global _SINK, _SINK_CONFIGURED  # pylint: disable=global-statement
+    if not _SINK_CONFIGURED:
+        with _SINK_LOCK:
+            if not _SINK_CONFIGURED:
+                spec = os.environ.get(HTTP_METRICS_ENV_VAR)
+                _SINK = sink_from_spec(spec) if spec else None
+                _SINK_CONFIGURED = True
+    return _SINK
+
+
+def endpoint_name(url):
+    """
+    Return the host and path of a URL, with any path segments which look like IDs replaced by a placeholder.
+    """
+    parts = urlsplit(url)
+    path = '/'.join(
+        ID_PLACEHOLDER if ID_SEGMENT_RE.match(segment) else segment for segment in parts.path.split('/')
+    )
+    return parts.netloc + path
+
+
+def _body_size(body):
+    """
+    Return the size in bytes of a prepared request body.
+    """
+    if body is None:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode('utf-8'))
+    if isinstance(body, bytes):
+        return len(body)
+    # Streamed bodies, e.g. file uploads, aren't measured.
+    return 0
+
+
+def _record(sink, event):
+    """
+    Record the event with the sink, never letting a failing sink break the caller.
+    """
+    try:
+        sink.record(event)
+    except Exception as exc:  # pylint: disable=broad-except
+        LOG.warning('Could not record HTTP metrics: {}'.format(exc))
+
+
+def _response_hook(client, response, *args, **kwargs):  # pylint: disable=unused-argument
+    """
+    requests response hook which records the response.
+    """
+    sink = get_sink()
+    if sink is None:
+        return
+    content_length = response.headers.get('Content-Length')
+    _record(sink, {
+        'type': 'http',
+        'timestamp': time.time(),
+        'client': client,
+        'method': response.request.method,
+        'endpoint': endpoint_name(response.request.url),
+        'status': response.status_code,
+        'seconds': response.elapsed.total_seconds(),
+        'request_bytes': _body_size(response.request.body),
+        'response_bytes': int(content_length) if content_length else len(response.content or b''),
+    })
+
+
+def http_hooks(client):
+    """
+    Return a `hooks` argument for requests calls, which records each response as made by the named client.
+    """
+    return {'response': [lambda response, *args, **kwargs: _response_hook(client, response, *args, **kwargs)]}
+
+
+def record_retry(client, target, wait_seconds):
+    """
+    Record that a call is about to be retried.
+
+    Arguments:
+        client (str): Name of the client making the call.
+        target (str): Name of the retried function or endpoint.
+        wait_seconds (float): How long the caller will wait before retrying.
+    """
+    _RETRY_COUNTS.count = retry_count() + 1
+    sink = get_sink()
+    if sink is None:
+        return
+    _record(sink, {
+        'type': 'retry',
+        'timestamp': time.time(),
+        'client': client,
+        'endpoint': target,
+        'wait_seconds': wait_seconds,
+    })
+
+
+def retry_count():
+    """
+    Return the number of retries recorded by the current thread so far.
+    """
+    return getattr(_RETRY_COUNTS, 'count', 0)
+
+
+def backoff_recorder(client):
+    """
+    Return an `on_backoff` handler for `backoff` decorators, which records each retry as made by the named client.
+    """
+    def on_backoff(details):
+        record_retry(client, details['target'].__name__, details['wait'])
+    return on_backoff
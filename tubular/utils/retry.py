@@ -3,29 +3,48 @@ Code used to retry calls that fail.
 """
 
 
+import asyncio
 import time
 import logging
 import os
+import random
 
+from email.utils import parsedate_to_datetime
 from functools import wraps
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
+
+from tubular.utils.instrumentation import record_retry
 
 MAX_ATTEMPTS = int(os.environ.get('RETRY_MAX_ATTEMPTS', 5))
-DELAY_SECONDS = os.environ.get('RETRY_DELAY_SECONDS', 5)
+DELAY_SECONDS = float(os.environ.get('RETRY_DELAY_SECONDS', 5))
 MAX_TIME_SECONDS = os.environ.get('RETRY_MAX_TIME_SECONDS', None)
+MAX_TIME_SECONDS = float(MAX_TIME_SECONDS) if MAX_TIME_SECONDS is not None else None
 
 LOG = logging.getLogger(__name__)
 
 
-def retry(attempts=MAX_ATTEMPTS, delay_seconds=DELAY_SECONDS, max_time_seconds=MAX_TIME_SECONDS):
+def retry(
+        attempts=MAX_ATTEMPTS, delay_seconds=DELAY_SECONDS, max_time_seconds=MAX_TIME_SECONDS, backoff_factor=1,
+        max_delay_seconds=None, jitter=False, retry_on=(Exception,), retry_if_result=None
+):
     """
     Decorator wraps a function that will attempt to "retry" the function if an exception is raised during execution.
      If no exception is raised, the return value of the wrapped function will be returned to the caller.
 
+    Coroutine functions are wrapped with a coroutine function which sleeps with asyncio between attempts.
+
     Arguments:
         attempts (int): Number of times to attempt the function
-        delay_seconds (int): time in seconds to delay between each attempt
-        max_time_seconds (int): Maximum time in seconds to attempt retrying this function
+        delay_seconds (float): time in seconds to delay before the second attempt
+        max_time_seconds (float): Maximum time in seconds to attempt retrying this function
+        backoff_factor (float): multiplier applied to the delay after each attempt. 1 keeps the delay fixed, 2 doubles
+            it each time.
+        max_delay_seconds (float): cap on the delay between attempts. Default: None, for no cap.
+        jitter (bool): True to wait a random time between 0 and the delay ("full jitter"), so that many callers
+            retrying at once spread their retries out.
+        retry_on (tuple of Exception classes): exceptions which are retried. Any other exception is raised at once.
+        retry_if_result (function): optional predicate called with the wrapped function's return value. A result it
+            returns True for is retried too, and returned as-is once the attempts run out.
 
     Returns:
         The return value of the wrapped function
@@ -40,35 +59,86 @@ def retry(attempts=MAX_ATTEMPTS, delay_seconds=DELAY_SECONDS, max_time_seconds=M
         if os.environ.get('TUBULAR_RETRY_ENABLED', "true").lower() == "false":
             return func_to_wrap
 
+        def lifecycle_manager():
+            """
+            Create a new lifecycle manager for one call of the wrapped function.
+            """
+            return LifecycleManager(
+                attempts, delay_seconds, max_time_seconds, backoff_factor=backoff_factor,
+                max_delay_seconds=max_delay_seconds, jitter=jitter, retry_on=retry_on, retry_if_result=retry_if_result
+            )
+
+        if asyncio.iscoroutinefunction(func_to_wrap):
+            @wraps(func_to_wrap)
+            async def coroutine_wrapper(*args, **kwargs):
+                """
+                Coroutine function to wrap the coroutine function which is retried.
+                """
+                return await lifecycle_manager().execute_async(func_to_wrap, *args, **kwargs)
+            return coroutine_wrapper
+
         @wraps(func_to_wrap)
         def function_wrapper(*args, **kwargs):
             """
             Function to wrap the function which is retried.
             """
-            return LifecycleManager(attempts, delay_seconds, max_time_seconds).execute(func_to_wrap, *args, **kwargs)
+            return lifecycle_manager().execute(func_to_wrap, *args, **kwargs)
         return function_wrapper
     return retry_decorator
 
 
+def retry_after_seconds(err):
+    """
+    Return the number of seconds a server asked us to wait with a Retry-After header on the error's response.
+
+    Arguments:
+        err (Exception): An exception, such as a requests.HTTPError, which may have a `response` attribute.
+
+    Returns:
+        float: seconds to wait, or None if the error has no usable Retry-After header
+    """
+    response = getattr(err, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    retry_after = headers.get('Retry-After')
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    # Otherwise it is an HTTP date.
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
 class LifecycleManager:
     """
     Manages the lifecycle of a function to be retried using the retry wrapper: tubular.utils.retry.retry
     """
 
-    def __init__(self, max_attempts, delay_seconds, max_time_seconds):
+    def __init__(
+            self, max_attempts, delay_seconds, max_time_seconds, backoff_factor=1, max_delay_seconds=None,
+            jitter=False, retry_on=(Exception,), retry_if_result=None
+    ):
         """
         Create a lifecycle manager. Validates arguments.
 
-        TODO: Allow caller to specify a list of exceptions that can be checked for and return if any of those are raised
-        TODO: Allow caller to pass in a validation function that can be used to evaluate the return value of the wrapped
-              function
-        TODO: Exponential back off with a ceiling might be another nice feature.
-
         Arguments:
             max_attempts (int): number of times to attempt the wrapped function. Must be >= 1
-            delay_seconds (int): How long to delay between calls to the wrapped function. Must be >= 0
-            max_time_seconds (int): maximum number of seconds to keep attempting to call this function. Default: None
+            delay_seconds (float): How long to delay before the second call to the wrapped function. Must be >= 0
+            max_time_seconds (float): maximum number of seconds to keep attempting to call this function.
+                                     Default: None
                                      When None the method will continue to be called until max_attempts is reached.
+            backoff_factor (float): multiplier applied to the delay after each attempt. Must be >= 1
+            max_delay_seconds (float): cap on the delay between attempts. Default: None, for no cap.
+            jitter (bool): True to delay a random time between 0 and the computed delay.
+            retry_on (tuple of Exception classes): exceptions which are retried.
+            retry_if_result (function): optional predicate which returns True for return values to retry.
         """
         if max_attempts < 1:
             raise RetryException(
@@ -78,19 +148,30 @@ class LifecycleManager:
             raise RetryException(
                 "Must specify a delay_seconds number greater than or equal to 0. Value: {0}".format(delay_seconds))
 
-        if max_time_seconds is not None and max_time_seconds > delay_seconds:
+        if backoff_factor < 1:
+            raise RetryException(
+                "Must specify a backoff_factor number greater than or equal to 1. Value: {0}".format(backoff_factor))
+
+        if max_time_seconds is not None and max_time_seconds < delay_seconds:
             LOG.warning(
-                "max_time_seconds {0} is greater than delay_seconds {1}. "
+                "max_time_seconds {0} is less than delay_seconds {1}. "
                 "This will cause this method to only be attempted once".format(
                     max_time_seconds, delay_seconds
                 )
             )
 
         self._current_attempt_number = 0
-        self._max_datetime = datetime.utcnow() + timedelta(0, max_time_seconds) if max_time_seconds else None
-        # pylint: disable=round-builtin
-        self.max_attempts = round(max_attempts)
-        self.delay_seconds = round(delay_seconds)
+        # The deadline is on the monotonic clock, so that changes to the system clock don't shorten or extend it.
+        self._deadline = time.monotonic() + max_time_seconds if max_time_seconds is not None else None
+        self.max_attempts = int(max_attempts)
+        self.delay_seconds = delay_seconds
+        self.backoff_factor = backoff_factor
+        self.max_delay_seconds = max_delay_seconds
+        self.jitter = jitter
+        self.retry_on = retry_on
+        self.retry_if_result = retry_if_result
+        # Delay requested by the server for the last failure, if any.
+        self._retry_after = None
 
     def max_attempts_reached(self):
         """
@@ -100,26 +181,61 @@ class LifecycleManager:
         """
         return self._current_attempt_number > self.max_attempts
 
+    def remaining_seconds(self):
+        """
+        Returns:
+            float: seconds left until the max_time is reached, or None if no max_time was set
+        """
+        if self._deadline is None:
+            return None
+        return self._deadline - time.monotonic()
+
     def max_time_reached(self):
         """
         Returns:
             bool: True if the maximum runtime of the retry has been met or exceeded
                   False if the max_time was not set or if the max time has not yet been reached
         """
-        return self._max_datetime and self._max_datetime - datetime.utcnow() < timedelta(0, 0, 0)
+        remaining = self.remaining_seconds()
+        return remaining is not None and remaining < 0
 
     def get_delay_time(self):
         """
         Returns:
-            int: seconds to delay
+            float: seconds to delay before the next attempt.  This is the exponential backoff delay for the current
+                attempt, capped and jittered as configured, but at least any Retry-After the server asked for.
+        """
+        delay = self.delay_seconds * self.backoff_factor ** max(0, self._current_attempt_number - 1)
+        if self.max_delay_seconds is not None:
+            delay = min(delay, self.max_delay_seconds)
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        if self._retry_after is not None:
+            delay = max(delay, self._retry_after)
+        return delay
+
+    def _sleep_time(self):
+        """
+        Returns:
+            float: seconds to delay, cut short so as not to sleep past the max_time
+        """
+        delay = self.get_delay_time()
+        remaining = self.remaining_seconds()
+        if remaining is not None:
+            delay = max(0, min(delay, remaining))
+        return delay
+
+    def sleep(self, seconds=None):
+        """
+        Sleep this lifecycle manager, for the given number of seconds or else the computed delay.
         """
-        return self.delay_seconds
+        time.sleep(self._sleep_time() if seconds is None else seconds)
 
-    def sleep(self):
+    async def sleep_async(self, seconds=None):
         """
-        Sleep this lifecycle manager
+        Sleep this lifecycle manager without blocking the event loop.
         """
-        time.sleep(self.get_delay_time())
+        await asyncio.sleep(self._sleep_time() if seconds is None else seconds)
 
     def done(self):
         """
@@ -129,6 +245,53 @@ class LifecycleManager:
         """
         return self.max_attempts_reached() or self.max_time_reached()
 
+    def _start_attempt(self, func_to_retry):
+        """
+        Count and log a new attempt at calling the function.
+        """
+        self._current_attempt_number += 1
+        self._retry_after = None
+        LOG.debug("Attempting function: {0} try number: {1}".format(
+            func_to_retry.__name__,
+            self._current_attempt_number
+        ))
+
+    def _should_retry_error(self, func_to_retry, err):
+        """
+        Log an exception raised by the function, and return whether it should be retried.
+        """
+        LOG.warning(
+            "Error executing function {0}, Exception type: {1} Message: {2}".format(
+                func_to_retry.__name__, err.__class__, err
+            ))
+        if not isinstance(err, self.retry_on):
+            return False
+        self._retry_after = retry_after_seconds(err)
+        return True
+
+    def _should_retry_result(self, func_to_retry, result):
+        """
+        Return whether a value returned by the function should be retried.
+        """
+        if self.retry_if_result is None or not self.retry_if_result(result):
+            return False
+        LOG.warning("Retrying function {0} due to its result: {1}".format(func_to_retry.__name__, result))
+        return True
+
+    def _retry_delay(self, func_to_retry):
+        """
+        Compute the delay before the next attempt, and record the retry.
+        """
+        seconds = self._sleep_time()
+        record_retry(func_to_retry.__module__.rsplit('.', 1)[-1], func_to_retry.__name__, seconds)
+        return seconds
+
+    def _should_sleep(self):
+        """
+        Return whether there will be another attempt to sleep before.
+        """
+        return not self.max_attempts_reached() and not self.max_time_reached()
+
     def execute(self, func_to_retry, *args, **kwargs):
         """
         Execute the wrapped function retrying the specified number of attempts.
@@ -143,23 +306,43 @@ class LifecycleManager:
 
         """
         while not self.done():
+            self._start_attempt(func_to_retry)
             try:
-                self._current_attempt_number += 1
-                LOG.debug("Attempting function: {0} try number: {1}".format(
-                    func_to_retry.__name__,
-                    self._current_attempt_number
-                ))
                 result = func_to_retry(*args, **kwargs)
-                break
+                if not self._should_retry_result(func_to_retry, result):
+                    break
+            except Exception as err:  # pylint: disable=broad-except
+                result = err
+                if not self._should_retry_error(func_to_retry, err):
+                    break
+
+            if self._should_sleep():
+                self.sleep(self._retry_delay(func_to_retry))
+
+        if isinstance(result, Exception):
+            raise result
+
+        return result
+
+    async def execute_async(self, func_to_retry, *args, **kwargs):
+        """
+        Execute the wrapped coroutine function retrying the specified number of attempts.
+
+        The same as execute(), but awaits the function and sleeps without blocking the event loop.
+        """
+        while not self.done():
+            self._start_attempt(func_to_retry)
+            try:
+                result = await func_to_retry(*args, **kwargs)
+                if not self._should_retry_result(func_to_retry, result):
+                    break
             except Exception as err:  # pylint: disable=broad-except
-                LOG.warning(
-                    "Error executing function {0}, Exception type: {1} Message: {2}".format(
-                        func_to_retry.__name__, err.__class__, err
-                    ))
                 result = err
+                if not self._should_retry_error(func_to_retry, err):
+                    break
 
-            if not self.max_attempts_reached() and not self.max_time_reached():
-                self.sleep()
+            if self._should_sleep():
+                await self.sleep_async(self._retry_delay(func_to_retry))
 
         if isinstance(result, Exception):
             raise result